@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+"""
+Benchmark FileReader throughput and peak memory for every supported format,
+and DataViewer per-frame scroll latency on the Agg backend.
+
+Results are written as JSON, so that runs against different releases can be compared, e.g.
+
+    python -m benchmarks.run --shape 64,512,512 --output bench.json
+"""
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from argparse import ArgumentParser
+
+import numpy as np
+
+from smalldataviewer import DataViewer, FileReader, __version__
+from smalldataviewer.ext import h5py, z5py, imageio
+
+logger = logging.getLogger("benchmarks")
+
+INTERNAL_PATH = "volume"
+
+PERCENTILES = (50, 90, 99)
+
+
+def synthetic_volume(shape, dtype, seed=0):
+    """Random volume with some large-scale structure, so that it is not trivially compressible"""
+    rng = np.random.RandomState(seed)
+    dtype = np.dtype(dtype)
+    z, y, x = np.meshgrid(
+        *(np.linspace(0, 4 * np.pi, n) for n in shape), indexing="ij"
+    )
+    smooth = (np.sin(z) + np.sin(y) + np.sin(x) + 3) / 6
+    noisy = 0.8 * smooth + 0.2 * rng.random_sample(shape)
+    if dtype.kind in "iu":
+        info = np.iinfo(dtype)
+        return (info.min + noisy * (info.max - info.min)).astype(dtype)
+    if dtype.kind == "b":
+        return noisy > 0.5
+    return noisy.astype(dtype)
+
+
+def write_hdf5(path, array, chunks):
+    with h5py.File(path, "w") as f:
+        f.create_dataset(INTERNAL_PATH, data=array, chunks=chunks)
+
+
+def _write_z5(path, array, chunks, use_zarr_format):
+    with z5py.File(path, use_zarr_format=use_zarr_format) as f:
+        ds = f.create_dataset(
+            INTERNAL_PATH, shape=array.shape, dtype=array.dtype, chunks=chunks
+        )
+        ds[:] = array
+
+
+def write_n5(path, array, chunks):
+    _write_z5(path, array, chunks, False)
+
+
+def write_zarr(path, array, chunks):
+    _write_z5(path, array, chunks, True)
+
+
+def write_npy(path, array, chunks):
+    np.save(path, array)
+
+
+def write_npz(path, array, chunks):
+    np.savez(path, **{INTERNAL_PATH: array})
+
+
+def write_npz_compressed(path, array, chunks):
+    np.savez_compressed(path, **{INTERNAL_PATH: array})
+
+
+def write_json(path, array, chunks):
+    with open(path, "w") as f:
+        json.dump({INTERNAL_PATH: array.tolist()}, f)
+
+
+def write_tiff(path, array, chunks):
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message=".*_tifffile")
+        imageio.mimwrite(path, array)
+
+
+def write_raw(path, array, chunks):
+    array.tofile(path)
+    return {"dtype": array.dtype.str, "volume_shape": array.shape}
+
+
+def write_sequence(path, array, chunks):
+    os.mkdir(path)
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message=".*_tifffile")
+        for idx, plane in enumerate(array):
+            imageio.imwrite(os.path.join(path, "slice_{:04d}.tiff".format(idx)), plane)
+
+
+# name: (file extension, or None for a directory, whether internal_path is needed, writer, required module)
+# writers return any FileReader options needed to read the file back, e.g. the dtype and shape of a raw file
+FORMATS = {
+    "hdf5": ("hdf5", True, write_hdf5, h5py),
+    "n5": ("n5", True, write_n5, z5py),
+    "zarr": ("zarr", True, write_zarr, z5py),
+    "npy": ("npy", False, write_npy, None),
+    "npz": ("npz", True, write_npz, None),
+    "npz-compressed": ("npz", True, write_npz_compressed, None),
+    "json": ("json", True, write_json, None),
+    "tiff": ("tiff", False, write_tiff, imageio),
+    "raw": ("raw", False, write_raw, None),
+    "sequence": (None, False, write_sequence, imageio),
+}
+
+
+def str_to_ints(s):
+    return tuple(int(item.strip()) for item in s.split(","))
+
+
+def percentiles(values):
+    values = np.asarray(values) * 1000
+    out = {"p{}".format(q): float(np.percentile(values, q)) for q in PERCENTILES}
+    out["mean"] = float(values.mean())
+    out["max"] = float(values.max())
+    return out
+
+
+def measure(fn, repeats):
+    """Call ``fn`` ``repeats`` times, returning the wall time of each call and the peak memory traced by any"""
+    times = []
+    peak = 0
+    for _ in range(repeats):
+        tracemalloc.start()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return times, peak
+
+
+def bench_read(reader, nbytes, repeats):
+    """Throughput and peak memory of ``FileReader.read``"""
+    times, peak = measure(reader.read, repeats)
+    best = min(times)
+    return {
+        "seconds": times,
+        "mb_per_second": nbytes / best / 1024 ** 2,
+        "peak_memory_mb": peak / 1024 ** 2,
+        "peak_memory_ratio": peak / nbytes,
+    }
+
+
+class ScrollEvent(object):
+    def __init__(self, button):
+        self.button = button
+
+
+def bench_scroll(viewer, frames):
+    """Per-frame latency of scrolling forwards through ``frames`` slices (and back, at the end of the volume)"""
+    times = []
+    button = "up"
+    for _ in range(frames):
+        if viewer.idx == viewer.slices - 1:
+            button = "down"
+        elif viewer.idx == 0:
+            button = "up"
+        start = time.perf_counter()
+        viewer._onscroll(ScrollEvent(button))
+        times.append(time.perf_counter() - start)
+    out = percentiles(times)
+    info = viewer.cache_info()
+    out["cache"] = None if info is None else info._asdict()
+    return out
+
+
+def bench_format(name, array, chunks, tmpdir, repeats, frames):
+    ext, needs_path, writer, module = FORMATS[name]
+    if module is not None and not module:
+        return {"skipped": "backend not installed"}
+
+    path = os.path.join(tmpdir, name if ext is None else "{}.{}".format(name, ext))
+    start = time.perf_counter()
+    reader_kwargs = writer(path, array, chunks) or dict()
+    result = {"write_seconds": time.perf_counter() - start}
+
+    internal_path = INTERNAL_PATH if needs_path else None
+    reader = FileReader(path, internal_path=internal_path, **reader_kwargs)
+    result["read"] = bench_read(reader, array.nbytes, repeats)
+
+    import matplotlib.pyplot as plt
+
+    for lazy in (False, True):
+        viewer = DataViewer.from_file(
+            path, internal_path=internal_path, lazy=lazy, **reader_kwargs
+        )
+        try:
+            result["scroll_lazy" if lazy else "scroll"] = bench_scroll(viewer, frames)
+        finally:
+            viewer.close()
+            plt.close(viewer.fig)
+    return result
+
+
+def metadata(args):
+    return {
+        "smalldataviewer": __version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "shape": args.shape,
+        "dtype": args.dtype,
+        "chunks": args.chunks,
+        "repeats": args.repeats,
+        "frames": args.frames,
+    }
+
+
+def main(argv=None):
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--shape",
+        type=str_to_ints,
+        default=(64, 256, 256),
+        help="Volume shape (default 64,256,256)",
+    )
+    parser.add_argument("--dtype", default="uint8", help="Volume dtype (default uint8)")
+    parser.add_argument(
+        "--chunks",
+        type=str_to_ints,
+        default=(8, 64, 64),
+        help="Chunk shape for chunked formats (default 8,64,64)",
+    )
+    parser.add_argument(
+        "--formats",
+        nargs="+",
+        choices=sorted(FORMATS),
+        default=sorted(FORMATS),
+        help="Formats to benchmark (default all)",
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=3, help="Reads per format (default 3)"
+    )
+    parser.add_argument(
+        "--frames", type=int, default=100, help="Scroll events per viewer (default 100)"
+    )
+    parser.add_argument(
+        "-o", "--output", help="Write JSON results here rather than to stdout"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    import matplotlib.pyplot as plt
+
+    plt.switch_backend("agg")
+
+    array = synthetic_volume(args.shape, args.dtype)
+    chunks = tuple(min(c, n) for c, n in zip(args.chunks, args.shape))
+    results = {"meta": metadata(args), "formats": dict()}
+    tmpdir = tempfile.mkdtemp(prefix="sdv-bench-")
+    try:
+        for name in args.formats:
+            logger.info("Benchmarking %s", name)
+            try:
+                results["formats"][name] = bench_format(
+                    name, array, chunks, tmpdir, args.repeats, args.frames
+                )
+            except Exception as e:
+                logger.exception("Benchmark of %s failed", name)
+                results["formats"][name] = {"error": repr(e)}
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -31,7 +31,6 @@ setup(
     install_requires=[
         'numpy>=1.7.1',
         'matplotlib>=3.0',
-        'mpl_colors',
     ],
     extras_require=extras_require,
     author='Chris L Barnes',
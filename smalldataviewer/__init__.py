@@ -1,5 +1,8 @@
 from smalldataviewer.version import __version__, __version_info__
 from smalldataviewer.files import FileReader
+from smalldataviewer.lazy import LazyArray
 from smalldataviewer.viewer import DataViewer
+from smalldataviewer.ortho import OrthoViewer
+from smalldataviewer.multi import MultiViewer
 
-__all__ = ["FileReader", "DataViewer"]
+__all__ = ["FileReader", "DataViewer", "OrthoViewer", "MultiViewer", "LazyArray"]
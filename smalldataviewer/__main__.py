@@ -1,9 +1,8 @@
 import logging
+import os
+import sys
 
-from matplotlib import pyplot as plt
-from mpl_colors import LabelColorMap
-
-from smalldataviewer import DataViewer, __version__
+from smalldataviewer.version import __version__
 
 
 def str_to_ints(s):
@@ -13,11 +12,124 @@ def str_to_ints(s):
     return values
 
 
+def str_to_volume_shape(s):
+    """As ``str_to_ints``, but a dimension may be ``?`` (or -1) to be inferred"""
+    return str_to_ints(s.replace("?", "-1"))
+
+
+def _overlay_action(label):
+    from argparse import Action
+
+    class OverlayAction(Action):
+        def __call__(self, parser, namespace, values, option_string=None):
+            if len(values) > 2:
+                parser.error(
+                    "{} takes a path and optionally an internal path".format(option_string)
+                )
+            overlays = list(getattr(namespace, self.dest) or [])
+            overlays.append((values[0], values[1] if len(values) > 1 else None, label))
+            setattr(namespace, self.dest, overlays)
+
+    return OverlayAction
+
+
+def add_raw_arguments(parser):
+    """Arguments describing data in formats which do not record their type or shape"""
+    parser.add_argument(
+        "--dtype",
+        help="Data type (e.g. uint8, float32) of formats which do not record one: "
+        "required for raw files (.raw, .bin), and inferred from the values of JSON files if not given.",
+    )
+    parser.add_argument(
+        "--volume-shape",
+        type=str_to_volume_shape,
+        help="Shape of the whole volume in a raw file, in C order, "
+        'in the form "<scroll>,<vertical>,<horizontal>". One dimension may be "?", to be inferred from the file size '
+        '(or -1, given as e.g. --volume-shape=-1,40,50).',
+    )
+    parser.add_argument(
+        "--byte-order",
+        choices=["little", "big", "native"],
+        help="Byte order of a raw file (default native)",
+    )
+    parser.add_argument(
+        "--header-bytes",
+        type=int,
+        default=0,
+        help="Number of bytes to skip at the start of a raw file (default 0)",
+    )
+
+
+def add_disk_cache_arguments(parser):
+    parser.add_argument(
+        "--disk-cache",
+        nargs="?",
+        const="",
+        metavar="DIR",
+        help="Cache decoded image stacks and JSON volumes on disk, so that opening them again is fast. "
+        "Default directory $SMALLDATAVIEWER_CACHE_DIR or ~/.cache/smalldataviewer.",
+    )
+    parser.add_argument(
+        "--disk-cache-size",
+        type=int,
+        default=10240,
+        help="Size in MiB beyond which the least recently used volumes are deleted from the disk cache "
+        "(default 10240)",
+    )
+
+
+def disk_cache_from_args(parsed_args):
+    if parsed_args.disk_cache is None:
+        return None
+    from smalldataviewer.diskcache import DiskCache
+
+    return DiskCache(
+        parsed_args.disk_cache or None, parsed_args.disk_cache_size * 1024 ** 2
+    )
+
+
+def reader_options_from_args(parsed_args):
+    """FileReader options given by the arguments of ``add_raw_arguments`` and ``add_disk_cache_arguments``"""
+    return dict(
+        dtype=parsed_args.dtype,
+        volume_shape=parsed_args.volume_shape,
+        byte_order=parsed_args.byte_order,
+        header_bytes=parsed_args.header_bytes,
+        disk_cache=disk_cache_from_args(parsed_args),
+    )
+
+
+def shared_cache_from_args(parsed_args):
+    if parsed_args.shared_cache is None:
+        return None
+    from smalldataviewer.sharedcache import SharedSliceCache, shared_cache_available
+
+    if not shared_cache_available():
+        logging.getLogger(__name__).warning(
+            "--shared-cache requires python 3.8 or later on a POSIX system, ignoring it"
+        )
+        return None
+    return SharedSliceCache(parsed_args.shared_cache * 1024 ** 2)
+
+
 def _main():
     from argparse import ArgumentParser
 
-    parser = ArgumentParser()
-    parser.add_argument("path", help="Path to file containing a 3D dataset")
+    # unless there is a file to view called "export"
+    if sys.argv[1:2] == ["export"] and not os.path.exists("export"):
+        from smalldataviewer.export import main
+
+        return main(sys.argv[2:])
+
+    parser = ArgumentParser(
+        epilog="To render slices to images without a display, "
+        "see `smalldataviewer export --help`"
+    )
+    parser.add_argument(
+        "path",
+        help="Path to file containing a 3D dataset; or to a directory of 2D image files, "
+        "or a quoted glob pattern matching them, read as slices in natural sort order",
+    )
     parser.add_argument(
         "--version",
         action="version",
@@ -57,15 +169,169 @@ def _main():
         type=str_to_ints,
         help='3D shape of ROI in pixels, in the form "<scroll>,<vertical>,<horizontal>"',
     )
+    parser.add_argument(
+        "--step",
+        type=str_to_ints,
+        help="Read only every n-th voxel of the ROI along each dimension, "
+        'in the form "<scroll>,<vertical>,<horizontal>", e.g. "4,4,4" to preview a large volume. '
+        "Only the voxels needed are read, where the format allows.",
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=int,
+        help="Budget in MiB for reading the ROI into memory. If it would be exceeded, the file is read "
+        "as with --lazy if the format allows, and otherwise with the smallest --step which fits the budget.",
+    )
     parser.add_argument(
         "-v", "--verbose", action="count", help="Increase logging verbosity"
     )
     parser.add_argument(
         "-l", "--label", action="store_true",
-        help="Whether to treat images as a label volume"
+        help="Whether to treat images as a label volume: each label is given a random colour, "
+        "and hovering shows the label ID"
+    )
+    parser.add_argument(
+        "--boundaries",
+        action="store_true",
+        help="With --label, draw the boundaries between labels",
+    )
+    parser.add_argument(
+        "--lazy",
+        action="store_true",
+        help="Read slices from the file as they are displayed, rather than reading the whole ROI "
+        "into memory first. Slices are read in the background, showing a low-resolution preview "
+        "meanwhile where one is cheap to read. JSON and compressed npz files are always read eagerly.",
+    )
+    add_raw_arguments(parser)
+    add_disk_cache_arguments(parser)
+    parser.add_argument(
+        "--overlay",
+        nargs="+",
+        metavar=("PATH", "INTERNAL_PATH"),
+        dest="overlays",
+        action=_overlay_action(False),
+        help="Another volume of the same shape to show with the first, scrolled in lockstep, "
+        "with its own internal path if needed. May be given several times. "
+        "Slices of all volumes are read concurrently.",
+    )
+    parser.add_argument(
+        "--overlay-label",
+        nargs="+",
+        metavar=("PATH", "INTERNAL_PATH"),
+        dest="overlays",
+        action=_overlay_action(True),
+        help="As --overlay, for a label volume, which is transparent where it is 0",
+    )
+    parser.add_argument(
+        "--tile",
+        action="store_true",
+        help="Show overlaid volumes side by side, with linked zoom and pan, rather than over each other",
+    )
+    parser.add_argument(
+        "--alpha",
+        type=float,
+        default=0.5,
+        help="Opacity of overlaid volumes drawn over the first (default 0.5)",
+    )
+    parser.add_argument(
+        "--shared-cache",
+        type=int,
+        metavar="SIZE",
+        help="Cache decoded volumes (or, with --lazy, slices) in up to SIZE MiB of shared memory, "
+        "so that other smalldataviewer processes of the same user on this machine which open the same data "
+        "map them rather than decoding them again. Memory-mapped formats (npy, raw) are not cached.",
+    )
+    parser.add_argument(
+        "--ortho",
+        action="store_true",
+        help="Show three orthogonal planes through a shared cursor, rather than scrolling through dimension 0. "
+        "Scroll over a panel to move through it, click to move the cursor.",
+    )
+    parser.add_argument(
+        "--projection",
+        choices=["max", "min", "mean", "sum"],
+        help="Show a projection of the whole volume along --projection-axis as a single image, "
+        "read in chunk-aligned blocks by one thread per CPU. "
+        "With --slab, how to project the slab instead (max, min or mean; default max).",
+    )
+    parser.add_argument(
+        "--projection-axis",
+        type=int,
+        choices=[0, 1, 2],
+        default=0,
+        help="Dimension to project along with --projection (default 0)",
+    )
+    parser.add_argument(
+        "--slab",
+        type=int,
+        default=1,
+        help="Show a projection of this many slices around the current one while scrolling (default 1). "
+        "Change it with the [ and ] keys, and the projection with the m key.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Time each stage of reading and displaying slices, and print a summary on exit",
+    )
+    parser.add_argument(
+        "-c",
+        "--contrast",
+        choices=["minmax", "percentile"],
+        help="Set colour limits from statistics of the whole volume, computed in the background: "
+        "between its minimum and maximum, or its 0.5th and 99.5th percentiles. "
+        "Statistics are saved alongside the file for reuse.",
+    )
+    parser.add_argument(
+        "--no-save-stats",
+        action="store_true",
+        help="Do not save volume statistics computed for --contrast alongside the file",
+    )
+    parser.add_argument(
+        "--no-lod",
+        action="store_true",
+        help="Always display slices at full resolution, rather than at a level of detail "
+        "matching the size of the window",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of workers with which to decode image stacks (e.g. multi-page TIFFs) "
+        "and directories of images in parallel (default 1). 0 uses one per CPU.",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        help="Memory budget in MiB for caching slices read lazily (default 256). "
+        "Cache statistics are logged at exit with -v.",
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=4,
+        help="Number of slices to read ahead in the background while scrolling lazily (default 4)",
+    )
+    parser.add_argument(
+        "--chunk-cache",
+        type=int,
+        default=256,
+        help="Memory budget in MiB for decompressed chunks of HDF5, N5 and zarr datasets read lazily, "
+        "which are read in whole chunk-aligned slabs (default 256). 0 disables slab reads.",
+    )
+    parser.add_argument(
+        "--hdf5-cache",
+        type=int,
+        help="Size in MiB of HDF5's own raw chunk cache per dataset (default HDF5's default, 1MiB)",
     )
 
     parsed_args = parser.parse_args()
+    if parsed_args.slab > 1 and parsed_args.projection == "sum":
+        parser.error("--slab cannot be used with --projection sum")
+    if parsed_args.overlays and (
+        parsed_args.ortho or parsed_args.projection or parsed_args.slab > 1
+    ):
+        parser.error("--overlay cannot be used with --ortho, --projection or --slab")
 
     level = {
         None: logging.WARNING,
@@ -76,16 +342,150 @@ def _main():
 
     logging.basicConfig(level=level)
 
-    dv = DataViewer.from_file(
+    from smalldataviewer.profiling import Profiler
+
+    profiler = Profiler().start() if parsed_args.profile else None
+    try:
+        _show(parsed_args)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            print(profiler.report(), file=sys.stderr)
+
+
+def _show(parsed_args):
+    # deferred until after argument parsing, so that e.g. --help and --version are fast
+    from matplotlib import pyplot as plt
+
+    from smalldataviewer import DataViewer, OrthoViewer
+    from smalldataviewer.render import LabelRenderer
+
+    shared_cache = shared_cache_from_args(parsed_args)
+    common = dict(
         path=parsed_args.path,
         internal_path=parsed_args.internal_path,
         ftype=parsed_args.type,
         offset=parsed_args.offset,
         shape=parsed_args.shape,
         data_order=parsed_args.order,
-        cmap=LabelColorMap(8916) if parsed_args.label else None
+        cmap=LabelRenderer(boundaries=parsed_args.boundaries)
+        if parsed_args.label
+        else None,
+        lazy=parsed_args.lazy,
+        workers=parsed_args.workers or os.cpu_count(),
+        step=parsed_args.step,
+        shared_cache=shared_cache,
+        max_memory=None
+        if parsed_args.max_memory is None
+        else parsed_args.max_memory * 1024 ** 2,
+        chunk_cache_bytes=parsed_args.chunk_cache * 1024 ** 2,
+        hdf5_cache_bytes=None
+        if parsed_args.hdf5_cache is None
+        else parsed_args.hdf5_cache * 1024 ** 2,
+        **reader_options_from_args(parsed_args)
     )
+    cache_bytes = (
+        None if parsed_args.cache_size is None else parsed_args.cache_size * 1024 ** 2
+    )
+
+    # kept until the figures are closed, as matplotlib only holds weak references to the viewers' callbacks
+    viewer = None
+    if parsed_args.overlays:
+        viewer = _show_multi(parsed_args, common, cache_bytes)
+    elif parsed_args.projection is not None and parsed_args.slab <= 1:
+        _show_projection(parsed_args, common)
+    elif parsed_args.ortho:
+        if cache_bytes is not None:
+            common["cache_bytes"] = cache_bytes
+        viewer = OrthoViewer.from_file(**common)
+    else:
+        viewer = DataViewer.from_file(
+            cache_bytes=cache_bytes,
+            prefetch=parsed_args.prefetch,
+            lod=False if parsed_args.no_lod else None,
+            lod_method="mode" if parsed_args.label else "mean",
+            contrast=parsed_args.contrast,
+            save_stats=not parsed_args.no_save_stats,
+            slab=parsed_args.slab,
+            async_load=parsed_args.lazy,
+            projection=parsed_args.projection or "max",
+            **common
+        )
     plt.show()
+    if viewer is not None:
+        viewer.close()
+    if shared_cache is not None:
+        shared_cache.close()
+
+
+def _show_multi(parsed_args, common, cache_bytes):
+    from smalldataviewer import MultiViewer
+    from smalldataviewer.render import LabelRenderer
+
+    overlays = parsed_args.overlays
+    common = dict(common)
+    paths = [common.pop("path")] + [path for path, _, _ in overlays]
+    internal_paths = [common.pop("internal_path")] + [ipath for _, ipath, _ in overlays]
+    cmaps = [common.pop("cmap")] + [
+        LabelRenderer(boundaries=parsed_args.boundaries) if label else None
+        for _, _, label in overlays
+    ]
+    # the file type and raw layout describe the primary file, not the overlays
+    primary = {
+        name: common.pop(name)
+        for name in ("ftype", "dtype", "volume_shape", "byte_order", "header_bytes")
+    }
+    if cache_bytes is not None:
+        common["cache_bytes"] = cache_bytes
+    return MultiViewer.from_files(
+        paths,
+        internal_paths,
+        layout="tile" if parsed_args.tile else "overlay",
+        cmaps=cmaps,
+        alphas=[1.0] + [parsed_args.alpha] * len(overlays),
+        names=[os.path.basename(str(path).rstrip("/")) for path in paths],
+        prefetch=parsed_args.prefetch,
+        file_kwargs=[primary] + [dict() for _ in overlays],
+        **common
+    )
+
+
+def _show_projection(parsed_args, common):
+    from matplotlib import pyplot as plt
+
+    from smalldataviewer import FileReader
+    from smalldataviewer.files import pop_reader_kwargs
+    from smalldataviewer.projection import project
+
+    options = pop_reader_kwargs(dict(common))
+    # projections stream through the volume once, so slabs would not be reused
+    options["chunk_cache_bytes"] = 0
+    reader = FileReader(
+        common["path"],
+        offset=common["offset"],
+        shape=common["shape"],
+        internal_path=common["internal_path"],
+        **options
+    )
+    axis = parsed_args.projection_axis
+    with reader.open(common["ftype"]) as volume:
+        image = project(volume, parsed_args.projection, axis)
+        if image.ndim == 3 and image.dtype != volume.dtype:
+            # sums and means of colour channels: imshow takes floats in [0, 1]
+            image = image / max(float(image.max()), 1)
+
+    order = common["data_order"]
+    rows, cols = [dim for dim in order[:3] if dim != order[axis]]
+    cmap = common["cmap"]
+    if cmap is not None:
+        # a LabelRenderer
+        image = cmap(image)
+    fig, ax = plt.subplots(1, 1)
+    ax.imshow(image, cmap="gray", interpolation="nearest")
+    ax.set_title("{} projection along {}".format(parsed_args.projection, order[axis]))
+    ax.set_ylabel(rows)
+    ax.set_xlabel(cols)
+    return fig
 
 
 if __name__ == "__main__":
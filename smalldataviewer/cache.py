@@ -0,0 +1,350 @@
+import itertools
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+import numpy as np
+
+from smalldataviewer.lazy import normalise_key, indexed_shape
+from smalldataviewer.profiling import timed
+
+__all__ = ["SliceCache", "Prefetcher", "CacheInfo", "ChunkedDataset"]
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_BYTES = 256 * 1024 ** 2
+DEFAULT_CHUNK_CACHE_BYTES = 256 * 1024 ** 2
+
+CacheInfo = namedtuple(
+    "CacheInfo", ["hits", "misses", "currsize", "nbytes", "max_bytes"]
+)
+
+
+class SliceCache:
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        """
+        Thread-safe least-recently-used cache of arrays, bounded by their total size in bytes.
+
+        Parameters
+        ----------
+        max_bytes : int
+            Maximum total ``nbytes`` of the cached arrays. Arrays larger than this are not cached.
+        """
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        """Return the cached value for ``key``, counting a hit or a miss"""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Cache ``value``, evicting least recently used entries as necessary"""
+        nbytes = np.asarray(value).nbytes
+        if nbytes > self.max_bytes:
+            logger.debug(
+                "Not caching %s: %s bytes exceeds budget of %s", key, nbytes, self.max_bytes
+            )
+            return
+
+        with self._lock:
+            self._discard(key)
+            self._data[key] = value
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                self._discard(next(iter(self._data)))
+
+    def _discard(self, key):
+        try:
+            old = self._data.pop(key)
+        except KeyError:
+            return
+        self.nbytes -= np.asarray(old).nbytes
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def info(self):
+        """
+        Returns
+        -------
+        CacheInfo
+            Counts of hits and misses, and the current and maximum size of the cache
+        """
+        with self._lock:
+            return CacheInfo(
+                self.hits, self.misses, len(self._data), self.nbytes, self.max_bytes
+            )
+
+
+class Prefetcher:
+    def __init__(
+        self,
+        fetch,
+        n_items,
+        cache=None,
+        ahead=4,
+        behind=1,
+        workers=2,
+        namespace=None,
+        executor=None,
+    ):
+        """
+        Serve items from a cache, warming it in background threads with the items ahead of (and a few
+        behind) the most recently requested one.
+
+        Parameters
+        ----------
+        fetch : callable
+            Takes an integer index and returns an array
+        n_items : int
+            Indices are in ``range(n_items)``
+        cache : SliceCache, optional
+            Default a new SliceCache with the default byte budget
+        ahead : int
+            How many items to prefetch in the direction of travel (default 4)
+        behind : int
+            How many items to prefetch against the direction of travel (default 1)
+        workers : int
+            Number of background threads (default 2)
+        namespace : hashable, optional
+            If given, items are cached under ``(namespace, idx)`` rather than ``idx``,
+            so that several Prefetchers can share a cache
+        executor : concurrent.futures.Executor, optional
+            If given, reads are run there rather than in threads of this Prefetcher's own,
+            so that several Prefetchers can share a pool of threads; ``workers`` is ignored,
+            and the executor is not shut down by ``close``
+        """
+        self.fetch = fetch
+        self.n_items = n_items
+        self.cache = SliceCache() if cache is None else cache
+        self.ahead = ahead
+        self.behind = behind
+        self.namespace = namespace
+
+        self._futures = dict()
+        self._lock = threading.RLock()
+        self._owns_executor = executor is None
+        if executor is None and workers:
+            executor = ThreadPoolExecutor(max_workers=workers)
+        self._executor = executor
+
+    def _key(self, idx):
+        return idx if self.namespace is None else (self.namespace, idx)
+
+    def __getitem__(self, idx):
+        value = self.cache.get(self._key(idx))
+        if value is not None:
+            return value
+
+        with self._lock:
+            future = self._futures.get(idx)
+        if future is not None:
+            logger.debug("Waiting for in-flight prefetch of %s", idx)
+            try:
+                return future.result()
+            except (Exception, CancelledError):
+                pass
+
+        value = self.fetch(idx)
+        self.cache.put(self._key(idx), value)
+        return value
+
+    def get(self, idx):
+        """Item ``idx`` if it is cached, otherwise None"""
+        return self.cache.get(self._key(idx))
+
+    def request(self, idx):
+        """
+        Read item ``idx`` into the cache in the background, unless it is already being read.
+
+        Returns
+        -------
+        concurrent.futures.Future or None
+            Resolves to the item; None if there are no background threads
+        """
+        if self._executor is None:
+            return None
+        with self._lock:
+            future = self._futures.get(idx)
+            if future is None or future.cancelled():
+                future = self._executor.submit(self._fetch_into_cache, idx)
+                self._futures[idx] = future
+                future.add_done_callback(self._make_forget(idx, future))
+        return future
+
+    def window(self, idx, direction=1):
+        """Indices which should be prefetched given the current index and direction of travel"""
+        direction = 1 if direction >= 0 else -1
+        out = []
+        for offset in range(1, self.ahead + 1):
+            out.append(idx + offset * direction)
+        for offset in range(1, self.behind + 1):
+            out.append(idx - offset * direction)
+        return [i for i in out if 0 <= i < self.n_items]
+
+    def prefetch(self, idx, direction=1):
+        """
+        Schedule background reads of the window around ``idx``,
+        cancelling any pending reads outside of it (other than of ``idx`` itself).
+        """
+        if self._executor is None:
+            return
+
+        wanted = self.window(idx, direction)
+        wanted_set = set(wanted)
+        wanted_set.add(idx)
+        with self._lock:
+            for key, future in list(self._futures.items()):
+                if key not in wanted_set and future.cancel():
+                    logger.debug("Cancelled stale prefetch of %s", key)
+                    self._futures.pop(key, None)
+
+            for key in wanted:
+                if key in self._futures or self._key(key) in self.cache:
+                    continue
+                future = self._executor.submit(self._fetch_into_cache, key)
+                self._futures[key] = future
+                future.add_done_callback(self._make_forget(key, future))
+
+    def _fetch_into_cache(self, idx):
+        value = self.fetch(idx)
+        self.cache.put(self._key(idx), value)
+        return value
+
+    def _make_forget(self, key, future):
+        def forget(_):
+            with self._lock:
+                if self._futures.get(key) is future:
+                    del self._futures[key]
+            if not future.cancelled() and future.exception() is not None:
+                logger.warning("Prefetch of %s failed: %s", key, future.exception())
+
+        return forget
+
+    def close(self):
+        """Cancel pending prefetches and release the worker threads"""
+        if self._executor is None:
+            return
+        with self._lock:
+            for future in list(self._futures.values()):
+                future.cancel()
+            self._futures.clear()
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+        self._executor = None
+
+
+def _hashable_key(key):
+    return tuple(
+        (item.start, item.stop, item.step) if isinstance(item, slice) else item
+        for item in key
+    )
+
+
+# identities of ChunkedDatasets not given one, which unlike id() are never reused
+_dataset_ids = itertools.count()
+
+
+class ChunkedDataset:
+    def __init__(self, dataset, cache, chunks=None, name=None):
+        """
+        Array-like wrapper around a chunked dataset (e.g. HDF5, N5 or zarr) which reads whole
+        chunk-aligned slabs along dimension 0, and serves single planes from decompressed slabs in a cache.
+
+        Each chunk only needs to be decompressed once for all of the planes it contains,
+        so scrolling through consecutive planes costs roughly one read per slab rather than one per plane.
+        Reads spanning several planes, and slabs which would take more than half of the cache, go directly
+        to the dataset.
+
+        Parameters
+        ----------
+        dataset : array-like
+            Anything with ``shape``, ``dtype`` and a numpy-like basic slicing interface
+        cache : SliceCache
+            May be shared between several ChunkedDatasets
+        chunks : tuple of int, optional
+            Chunk shape of the dataset. Default ``dataset.chunks``.
+        name : hashable, optional
+            Stable identity of the dataset (e.g. its file and internal path) under which its slabs are cached,
+            so that datasets opened again share the slabs already read. Default unique to this ChunkedDataset.
+        """
+        self.dataset = dataset
+        self.shape = tuple(dataset.shape)
+        self.dtype = np.dtype(dataset.dtype)
+        self.chunks = tuple(dataset.chunks if chunks is None else chunks)
+        self.depth = self.chunks[0]
+        self.cache = cache
+        self.name = ("dataset", next(_dataset_ids)) if name is None else name
+
+        self._lock = threading.Lock()
+        self._slab_locks = dict()
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __getitem__(self, key):
+        key = normalise_key(key, self.ndim)
+        z, rest = key[0], key[1:]
+        if isinstance(z, slice):
+            return np.asarray(self.dataset[key])
+
+        z = range(self.shape[0])[z]
+        slab_idx, offset = divmod(z, self.depth)
+        slab = self._slab(slab_idx, rest)
+        if slab is None:
+            return np.asarray(self.dataset[key])
+        return slab[offset]
+
+    def _slab(self, slab_idx, rest):
+        """Planes ``rest`` of the slab ``slab_idx`` along dimension 0, or None if it is too large to cache"""
+        start = slab_idx * self.depth
+        stop = min(start + self.depth, self.shape[0])
+        plane_size = int(np.prod(indexed_shape(rest, self.shape[1:]), dtype=np.int64))
+        if (stop - start) * plane_size * self.dtype.itemsize > self.cache.max_bytes // 2:
+            return None
+
+        cache_key = (self.name, slab_idx, _hashable_key(rest))
+        with self._lock:
+            lock = self._slab_locks.setdefault(cache_key, threading.Lock())
+        # only one thread decompresses a given slab; any others wait for it to be cached
+        with lock:
+            slab = self.cache.get(cache_key)
+            if slab is None:
+                logger.debug("Reading slab %s:%s", start, stop)
+                with timed("chunks.slab") as timing:
+                    slab = np.asarray(self.dataset[(slice(start, stop),) + rest])
+                    timing.nbytes = slab.nbytes
+                self.cache.put(cache_key, slab)
+        with self._lock:
+            # threads already waiting hold the lock themselves; later ones find the slab in the cache
+            if self._slab_locks.get(cache_key) is lock:
+                del self._slab_locks[cache_key]
+        return slab
+
+    def info(self):
+        """CacheInfo of the slab cache"""
+        return self.cache.info()
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from smalldataviewer.stats import file_signature, stats_key
+
+__all__ = ["DiskCache", "default_cache_dir"]
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DISK_CACHE_BYTES = 10 * 1024 ** 3
+
+CACHE_SUFFIX = ".npy"
+
+
+def default_cache_dir():
+    """``$SMALLDATAVIEWER_CACHE_DIR``, or ``smalldataviewer`` in the user's cache directory"""
+    path = os.environ.get("SMALLDATAVIEWER_CACHE_DIR")
+    if path:
+        return path
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "smalldataviewer")
+
+
+class DiskCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_DISK_CACHE_BYTES):
+        """
+        Persistent cache of decoded volumes, for formats which are slow to decode (e.g. image stacks and JSON).
+
+        Each entry is an npy file, which is memory-mapped when it is read back, so a cached volume opens in
+        the time it takes to read its header, and planes along dimension 0 are contiguous on disk.
+        Entries are keyed by the path, size and modification time of the source file, and the ROI, internal path,
+        format and dtype it was read with, so they are not used if the file changes.
+        When the cache grows beyond ``max_bytes``, the least recently used entries are deleted.
+
+        Parameters
+        ----------
+        directory : str, optional
+            Default as given by ``default_cache_dir``
+        max_bytes : int
+            Total size of the entries to keep (default 10GiB)
+        """
+        self.directory = str(directory or default_cache_dir())
+        self.max_bytes = max_bytes
+
+    def key(self, reader, ftype=None):
+        """Key identifying the data read by a FileReader, or None if its file cannot be found"""
+        try:
+            signature = file_signature(reader.path)
+        except OSError:
+            return None
+        identity = [
+            os.path.abspath(reader.path),
+            signature,
+            stats_key(reader),
+            ftype,
+            None if reader.dtype is None else reader.dtype.str,
+        ]
+        return hashlib.sha1(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def get(self, key):
+        """
+        Returns
+        -------
+        np.memmap or None
+            The cached volume, memory-mapped copy-on-write, or None if it is not cached
+        """
+        path = self._path(key)
+        try:
+            arr = np.load(path, mmap_mode="c")
+        except (OSError, ValueError):
+            return None
+        try:
+            # the modification time of an entry records when it was last used
+            os.utime(path)
+        except OSError:
+            pass
+        logger.debug("Disk cache hit: %s", path)
+        return arr
+
+    def put(self, key, arr):
+        """
+        Store a volume, evicting the least recently used entries if the cache is then too large.
+
+        Returns
+        -------
+        bool
+            Whether the volume was stored
+        """
+        arr = np.asarray(arr)
+        if arr.dtype.hasobject or arr.nbytes > self.max_bytes:
+            logger.debug("Not caching volume of %s bytes", arr.nbytes)
+            return False
+
+        path = self._path(key)
+        tmp_path = "{}.{}.{}.tmp".format(path, os.getpid(), threading.get_ident())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # written under a temporary name and then renamed, so that a partial entry is never read
+            with open(tmp_path, "wb") as f:
+                np.save(f, arr)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not write to disk cache %s: %s", self.directory, e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+        logger.debug("Cached volume of %s bytes at %s", arr.nbytes, path)
+        self.evict()
+        return True
+
+    def entries(self):
+        """
+        Returns
+        -------
+        list of tuple
+            (last used time, size in bytes, path) of each entry, least recently used first
+        """
+        out = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return out
+        for name in names:
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            out.append((st.st_mtime, st.st_size, path))
+        return sorted(out)
+
+    def nbytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """
+        Delete the least recently used entries until the cache fits in ``max_bytes``.
+        Entries which another process has already deleted, or which cannot be deleted, are skipped.
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                # on POSIX, mapped entries stay readable by processes using them until they are unmapped
+                os.remove(path)
+            except OSError:
+                continue
+            logger.debug("Evicted %s from disk cache", path)
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,480 @@
+"""Headless rendering of slices to PNG files, animated GIFs and contact sheets"""
+import itertools
+import logging
+import os
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from smalldataviewer.ext import imageio, LazyModule
+from smalldataviewer.files import FileReader
+from smalldataviewer.pyramid import downsample_plane
+from smalldataviewer.render import LabelRenderer, LUTRenderer, is_lookup_colormap
+from smalldataviewer.stats import compute_statistics, load_statistics
+
+__all__ = ["SliceRenderer", "render_slices", "export"]
+
+
+logger = logging.getLogger(__name__)
+
+plt = LazyModule("matplotlib.pyplot")
+mpl_image = LazyModule("matplotlib.image")
+
+PNG_PATTERN = "slice_{:05d}.png"
+
+# how many rendered slices may be waiting to be written, per worker
+PENDING_PER_WORKER = 2
+
+
+def to_uint8(plane):
+    """Colour channels as uint8, scaling floats from [0, 1]"""
+    if plane.dtype == np.uint8:
+        return plane
+    if plane.dtype.kind == "f":
+        return (np.clip(plane, 0, 1) * 255).round().astype(np.uint8)
+    return np.clip(plane, 0, 255).astype(np.uint8)
+
+
+class SliceRenderer(object):
+    def __init__(
+        self,
+        volume,
+        cmap=None,
+        vmin=None,
+        vmax=None,
+        scale=1,
+        label=False,
+        png_dir=None,
+        keep=True,
+    ):
+        """
+        Render slices of a volume to uint8 RGB(A) images with the same colour mapping as DataViewer,
+        optionally writing each to a PNG file.
+
+        Parameters
+        ----------
+        volume : array-like
+        cmap : str, matplotlib.colors.Colormap or LabelRenderer, optional
+            As for DataViewer: default ``'gray'`` for 3D data, and ignored for data with colour channels
+        vmin, vmax : float, optional
+            Colour limits
+        scale : int
+            Downsample slices by this factor before rendering
+        label : bool
+            Whether the volume contains labels, which are downsampled by mode rather than mean
+        png_dir : str, optional
+            If given, write each rendered slice to a PNG file in this directory
+        keep : bool
+            Whether to return rendered slices (otherwise, only write them)
+        """
+        self.volume = volume
+        self.scale = scale
+        self.method = "mode" if label else "mean"
+        self.png_dir = png_dir
+        self.keep = keep
+
+        if volume.ndim == 4:
+            self.render = to_uint8
+        else:
+            if cmap is None:
+                cmap = "gray"
+            if isinstance(cmap, str):
+                cmap = plt.get_cmap(cmap)
+            if is_lookup_colormap(cmap):
+                self.render = LUTRenderer(cmap, vmin, vmax)
+            elif isinstance(cmap, LabelRenderer):
+                self.render = cmap
+            else:
+                self.render = lambda plane: cmap(plane, bytes=True)
+
+    def __call__(self, idx):
+        """
+        Returns
+        -------
+        tuple
+            (idx, rendered slice or None if not kept)
+        """
+        plane = np.asarray(self.volume[idx, ...])
+        if self.scale > 1:
+            plane = downsample_plane(plane, self.scale, self.method)
+        # copied, as LUTRenderer reuses its output buffer
+        rgba = np.array(self.render(plane))
+        if self.png_dir is not None:
+            mpl_image.imsave(os.path.join(self.png_dir, PNG_PATTERN.format(idx)), rgba)
+        return idx, rgba if self.keep else None
+
+
+# identifies each call of render_slices, so that workers know when to open the file again
+_export_ids = itertools.count()
+
+# (export id, SliceRenderer) of the file last opened by this worker process
+_worker_renderer = None
+
+
+def _render_in_worker(export_id, reader_kwargs, ftype, renderer_kwargs, idx):
+    """
+    Render a slice in a worker process, opening the file on its first slice of an export and keeping it open
+    for the rest. Not done with the executor's ``initializer``, which needs python 3.7.
+    """
+    global _worker_renderer
+    if _worker_renderer is None or _worker_renderer[0] != export_id:
+        if _worker_renderer is not None:
+            _worker_renderer[1].volume.close()
+        volume = FileReader(**reader_kwargs).open(ftype)
+        _worker_renderer = (export_id, SliceRenderer(volume, **renderer_kwargs))
+    return _worker_renderer[1](idx)
+
+
+def render_slices(reader_kwargs, indices, ftype=None, workers=1, **renderer_kwargs):
+    """
+    Render slices of a file in order, across a pool of processes which each open the file lazily.
+
+    At most a few rendered slices per worker are held in memory at once, regardless of how many are requested.
+    Every worker opens the file itself, so formats which cannot be read lazily (see ``FileReader.opens_lazily``)
+    are better rendered in this process.
+
+    Parameters
+    ----------
+    reader_kwargs : dict
+        Passed to FileReader
+    indices : iterable of int
+        Slices to render
+    ftype : str, optional
+    workers : int
+        Number of processes; if 1, render in this process
+    renderer_kwargs
+        Passed to SliceRenderer
+
+    Yields
+    ------
+    tuple
+        (idx, rendered slice or None), as returned by ``SliceRenderer``
+    """
+    if workers <= 1:
+        with FileReader(**reader_kwargs).open(ftype) as volume:
+            renderer = SliceRenderer(volume, **renderer_kwargs)
+            for idx in indices:
+                yield renderer(idx)
+        return
+
+    export_id = (os.getpid(), next(_export_ids))
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for idx in indices:
+            pending.append(
+                executor.submit(
+                    _render_in_worker,
+                    export_id,
+                    reader_kwargs,
+                    ftype,
+                    renderer_kwargs,
+                    idx,
+                )
+            )
+            if len(pending) >= workers * PENDING_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class ContactSheet(object):
+    def __init__(self, n_tiles, columns=None):
+        """Tiles slices into a grid, row by row, as they are added"""
+        self.n_tiles = n_tiles
+        self.columns = columns or int(np.ceil(np.sqrt(n_tiles)))
+        self.rows = int(np.ceil(n_tiles / self.columns))
+        self.sheet = None
+        self.count = 0
+
+    def add(self, tile):
+        if self.sheet is None:
+            height, width = tile.shape[:2]
+            self.sheet = np.zeros(
+                (self.rows * height, self.columns * width) + tile.shape[2:],
+                dtype=tile.dtype,
+            )
+        height, width = tile.shape[:2]
+        row, col = divmod(self.count, self.columns)
+        rows = slice(row * height, (row + 1) * height)
+        cols = slice(col * width, (col + 1) * width)
+        self.sheet[rows, cols] = tile
+        self.count += 1
+
+    def save(self, path):
+        mpl_image.imsave(path, self.sheet)
+
+
+def _gif_timing(fps):
+    """Frame rate keyword arguments for imageio's GIF writer, which changed from fps to duration in ms in 2.28"""
+    version = tuple(int(v) for v in imageio.__version__.split(".")[:2] if v.isdigit())
+    if version >= (2, 28):
+        return {"duration": 1000 / fps}
+    return {"fps": fps}
+
+
+def export(
+    reader_kwargs,
+    ftype=None,
+    start=0,
+    stop=None,
+    step=1,
+    png_dir=None,
+    gif=None,
+    fps=10,
+    sheet=None,
+    columns=None,
+    workers=1,
+    contrast=None,
+    contrast_percentiles=(0.5, 99.5),
+    **renderer_kwargs
+):
+    """
+    Render a range of slices of a file to any of: a PNG file per slice, an animated GIF, and a contact sheet.
+
+    Parameters
+    ----------
+    reader_kwargs : dict
+        Passed to FileReader
+    ftype : str, optional
+    start, stop, step : int, optional
+        Range of slices along dimension 0 (default all)
+    png_dir : str, optional
+        Directory in which to write a PNG file per slice (created if necessary)
+    gif : str, optional
+        Path of an animated GIF, which is written frame by frame
+    fps : float
+        Frame rate of the GIF
+    sheet : str, optional
+        Path of an image of all of the slices tiled in a grid
+    columns : int, optional
+        Number of columns in the contact sheet (default as square as possible)
+    workers : int
+        Number of processes with which to render slices. Formats which cannot be read lazily are rendered
+        in this process, rather than read in full by every worker.
+    contrast : {None, "minmax", "percentile"}
+        Set colour limits from statistics of the whole volume, as for DataViewer
+    contrast_percentiles : tuple of float
+    renderer_kwargs
+        Passed to SliceRenderer
+
+    Returns
+    -------
+    int
+        Number of slices rendered
+    """
+    if png_dir is None and gif is None and sheet is None:
+        raise ValueError(
+            "No output given: specify at least one of png_dir, gif or sheet"
+        )
+
+    reader = FileReader(**reader_kwargs)
+    if workers > 1 and not reader.opens_lazily(ftype):
+        logger.warning(
+            "%s cannot be read lazily: rendering in one process rather than reading it in each of %s",
+            reader.path,
+            workers,
+        )
+        workers = 1
+
+    keep = gif is not None or sheet is not None
+    volume = reader.open(ftype)
+    try:
+        indices = range(*slice(start, stop, step).indices(volume.shape[0]))
+        if contrast is not None:
+            stats = load_statistics(reader) or compute_statistics(volume)
+            if stats is not None:
+                percentiles = contrast_percentiles if contrast == "percentile" else None
+                renderer_kwargs["vmin"], renderer_kwargs["vmax"] = stats.clim(percentiles)
+        if workers <= 1:
+            # rendered from the volume already open, rather than opening the file again
+            renderer = SliceRenderer(volume, png_dir=png_dir, keep=keep, **renderer_kwargs)
+            slices = (renderer(idx) for idx in indices)
+        else:
+            volume.close()
+            slices = render_slices(
+                reader_kwargs,
+                indices,
+                ftype,
+                workers,
+                png_dir=png_dir,
+                keep=keep,
+                **renderer_kwargs
+            )
+        return _write_slices(slices, len(indices), png_dir, gif, fps, sheet, columns)
+    finally:
+        volume.close()
+
+
+def _write_slices(slices, n_slices, png_dir=None, gif=None, fps=10, sheet=None, columns=None):
+    """Write rendered slices, as yielded by ``render_slices``, to an animated GIF and contact sheet"""
+    if png_dir is not None:
+        os.makedirs(png_dir, exist_ok=True)
+    contact_sheet = ContactSheet(n_slices, columns) if sheet is not None else None
+    writer = None
+    if gif is not None:
+        writer = imageio.get_writer(gif, mode="I", **_gif_timing(fps))
+
+    count = 0
+    try:
+        for idx, rgba in slices:
+            if writer is not None:
+                writer.append_data(rgba)
+            if contact_sheet is not None:
+                contact_sheet.add(rgba)
+            count += 1
+            logger.debug("Rendered slice %s (%s of %s)", idx, count, n_slices)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if contact_sheet is not None and count:
+        contact_sheet.save(sheet)
+    logger.info("Exported %s slices", count)
+    return count
+
+
+def main(argv=None):
+    from smalldataviewer.__main__ import (
+        add_disk_cache_arguments,
+        add_raw_arguments,
+        reader_options_from_args,
+        str_to_ints,
+    )
+
+    parser = ArgumentParser(
+        prog="smalldataviewer export",
+        description="Render slices of a 3D dataset to images without a display",
+    )
+    parser.add_argument("path", help="Path to file containing a 3D dataset")
+    parser.add_argument(
+        "-i",
+        "--internal_path",
+        help="Internal path of dataset inside file, if required",
+    )
+    parser.add_argument(
+        "-t", "--type", help="Dataset file type. Inferred from extension if not given."
+    )
+    parser.add_argument(
+        "-f",
+        "--offset",
+        type=str_to_ints,
+        help="3D offset of ROI from (0, 0, 0) in pixels",
+    )
+    parser.add_argument(
+        "-s", "--shape", type=str_to_ints, help="3D shape of ROI in pixels"
+    )
+    add_raw_arguments(parser)
+    add_disk_cache_arguments(parser)
+    parser.add_argument(
+        "--start",
+        type=int,
+        default=0,
+        help="First slice of the ROI to render (default 0)",
+    )
+    parser.add_argument(
+        "--stop", type=int, help="Slice of the ROI to stop before (default the end)"
+    )
+    parser.add_argument(
+        "--every",
+        metavar="N",
+        type=int,
+        default=1,
+        help="Render every N-th slice (default 1)",
+    )
+    parser.add_argument(
+        "--png", metavar="DIR", help="Write a PNG file per slice to DIR"
+    )
+    parser.add_argument("--gif", help="Write an animated GIF to this path")
+    parser.add_argument(
+        "--fps", type=float, default=10, help="GIF frame rate (default 10)"
+    )
+    parser.add_argument(
+        "--sheet",
+        help="Write a contact sheet of all of the slices, tiled in a grid, to this path",
+    )
+    parser.add_argument(
+        "--columns", type=int, help="Number of columns in the contact sheet"
+    )
+    parser.add_argument(
+        "--scale",
+        type=int,
+        default=1,
+        help="Downsample slices by this integer factor, e.g. for thumbnails (default 1)",
+    )
+    parser.add_argument("--cmap", help="Matplotlib colormap name (default gray)")
+    parser.add_argument(
+        "--vmin", type=float, help="Value at the bottom of the colormap"
+    )
+    parser.add_argument("--vmax", type=float, help="Value at the top of the colormap")
+    parser.add_argument(
+        "-c",
+        "--contrast",
+        choices=["minmax", "percentile"],
+        help="Set colour limits from statistics of the whole volume",
+    )
+    parser.add_argument(
+        "-l",
+        "--label",
+        action="store_true",
+        help="Whether to treat images as a label volume",
+    )
+    parser.add_argument(
+        "--boundaries",
+        action="store_true",
+        help="With --label, draw the boundaries between labels",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes with which to render slices (default 1). 0 uses one per CPU.",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="count", help="Increase logging verbosity"
+    )
+    parsed_args = parser.parse_args(argv)
+
+    level = {
+        None: logging.WARNING,
+        0: logging.WARNING,
+        1: logging.INFO,
+        2: logging.DEBUG,
+    }.get(parsed_args.verbose, logging.NOTSET)
+
+    logging.basicConfig(level=level)
+    if parsed_args.png is None and parsed_args.gif is None and parsed_args.sheet is None:
+        parser.error("at least one of --png, --gif or --sheet is required")
+
+    plt.switch_backend("agg")
+    cmap = parsed_args.cmap
+    if parsed_args.label:
+        cmap = LabelRenderer(boundaries=parsed_args.boundaries)
+
+    export(
+        dict(
+            path=parsed_args.path,
+            offset=parsed_args.offset,
+            shape=parsed_args.shape,
+            internal_path=parsed_args.internal_path,
+            **reader_options_from_args(parsed_args)
+        ),
+        ftype=parsed_args.type,
+        start=parsed_args.start,
+        stop=parsed_args.stop,
+        step=parsed_args.every,
+        png_dir=parsed_args.png,
+        gif=parsed_args.gif,
+        fps=parsed_args.fps,
+        sheet=parsed_args.sheet,
+        columns=parsed_args.columns,
+        workers=parsed_args.workers or os.cpu_count(),
+        contrast=parsed_args.contrast,
+        cmap=cmap,
+        vmin=parsed_args.vmin,
+        vmax=parsed_args.vmax,
+        scale=parsed_args.scale,
+        label=parsed_args.label,
+    )
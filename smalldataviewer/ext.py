@@ -1,5 +1,6 @@
 import sys
 import logging
+import threading
 import traceback
 import warnings
 from importlib import import_module
@@ -9,7 +10,7 @@ logger = logging.getLogger(__name__)
 
 EXTRAS = ["h5py", "z5py", "pyn5", "PIL", "imageio"]
 
-__all__ = ["NoSuchModule"] + EXTRAS
+__all__ = ["NoSuchModule", "LazyModule"] + EXTRAS
 
 
 class NoSuchModule(object):
@@ -28,7 +29,7 @@ class NoSuchModule(object):
         return False
 
 
-def import_if_available(name, namespace):
+def import_if_available(name, namespace=None):
     try:
         with warnings.catch_warnings(record=True):
             warnings.filterwarnings("ignore", ".*issubdtype")
@@ -36,9 +37,43 @@ def import_if_available(name, namespace):
     except ImportError as e:
         module = NoSuchModule(name)
 
-    namespace[name] = module
+    if namespace is not None:
+        namespace[name] = module
     return module
 
 
+class LazyModule(object):
+    def __init__(self, name):
+        """
+        Stand-in for a module which is only imported when one of its attributes is first used,
+        so that importing smalldataviewer does not pay for backends which are never needed.
+
+        If the module cannot be imported, this behaves like a NoSuchModule: it is falsey,
+        and attribute access raises the ImportError.
+        """
+        self.__name = name
+        self.__module = None
+        self.__lock = threading.Lock()
+
+    def _load(self):
+        if self.__module is None:
+            with self.__lock:
+                if self.__module is None:
+                    logger.debug("Importing %s", self.__name)
+                    self.__module = import_if_available(self.__name)
+        return self.__module
+
+    def __getattr__(self, item):
+        return getattr(self._load(), item)
+
+    def __bool__(self):
+        return bool(self._load())
+
+    def __repr__(self):
+        if self.__module is None:
+            return "<{} '{}' (not yet imported)>".format(type(self).__name__, self.__name)
+        return repr(self.__module)
+
+
 for extra in EXTRAS:
-    import_if_available(extra, locals())
+    locals()[extra] = LazyModule(extra)
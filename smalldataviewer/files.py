@@ -1,12 +1,28 @@
-import json
+import glob
 import logging
 import os
 import functools
+import re
+import struct
+import threading
 import warnings
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 import numpy as np
 
+from smalldataviewer.cache import SliceCache, ChunkedDataset, DEFAULT_CHUNK_CACHE_BYTES
 from smalldataviewer.ext import h5py, z5py, imageio, pyn5
+from smalldataviewer.jsonarray import read_json_array
+from smalldataviewer.profiling import timed
+from smalldataviewer.pyramid import Pyramid, scale_names, infer_factors
+from smalldataviewer.sharedcache import SharedPlanes
+from smalldataviewer.lazy import (
+    LazyArray,
+    roi_to_ranges,
+    normalise_key,
+    indexed_shape,
+)
 
 __all__ = ["FileReader"]
 
@@ -24,8 +40,28 @@ NORMALISED_TYPES = {
     "npy": "npy",
     "npz": "npz",
     "json": "json",
+    "raw": "raw",
+    "bin": "raw",
+    "sequence": "sequence",
 }
 
+BYTE_ORDERS = {"little": "<", "big": ">", "native": "="}
+
+
+MULTISCALE_TYPES = {"n5", "zarr", "hdf5"}
+
+# files read from a directory as the slices of an image sequence
+SEQUENCE_EXTENSIONS = {".png", ".tif", ".tiff", ".jpg", ".jpeg", ".bmp", ".gif", ".webp"}
+
+# formats which ``open`` reads lazily without decoding the whole ROI, whatever the file
+LAZY_TYPES = {"npy", "raw", "n5", "zarr", "hdf5", "sequence"}
+
+# formats which are memory-mapped, and so already shared between processes by the page cache
+MAPPED_TYPES = {"npy", "raw"}
+
+# formats which are decoded rather than mapped or read in chunks, and so are worth caching on disk
+DISK_CACHED_TYPES = {"imageio", "json"}
+
 
 def check_internal_path(has_ipath):
     def decorator(fn):
@@ -46,31 +82,534 @@ def check_internal_path(has_ipath):
     return decorator
 
 
-def offset_shape_to_slicing(offset=None, shape=None):
-    if offset is None and shape is None:
+def offset_shape_to_slicing(offset=None, shape=None, step=None):
+    """
+    Slicing of the ROI of the given offset and shape, taking every ``step``-th voxel of it along each dimension.
+    A step of 1 is given as ``None``.
+    """
+    if offset is None and shape is None and step is None:
         return Ellipsis
 
     slices = []
-    for o, s in zip(offset or (None, None, None), shape or (None, None, None)):
+    for o, s, st in zip(
+        offset or (None, None, None), shape or (None, None, None), step or (None, None, None)
+    ):
         if s is None:
             end = None
         elif o is None:
             end = s
         else:
             end = o + s
-        slices.append(slice(o, end))
+        slices.append(slice(o, end, None if st == 1 else st))
     return tuple(slices)
 
 
+def _is_strided(slicing):
+    return slicing is not Ellipsis and any(slc.step not in (None, 1) for slc in slicing)
+
+
+def scale_slicing(slicing, factors):
+    """Scale a slicing in full-resolution coordinates to one covering the same region at a downsampled level"""
+    if slicing is Ellipsis:
+        return slicing
+    out = []
+    for slc, factor in zip(slicing, factors):
+        start = None if slc.start is None else slc.start // factor
+        stop = None if slc.stop is None else -(-slc.stop // factor)
+        out.append(slice(start, stop))
+    return tuple(out)
+
+
+NPY_HEADER_READERS = {
+    (1, 0): np.lib.format.read_array_header_1_0,
+    (2, 0): np.lib.format.read_array_header_2_0,
+}
+
+ZIP_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+ZIP_LOCAL_SIGNATURE = b"PK\x03\x04"
+
+STREAM_BLOCK_BYTES = 16 * 1024 ** 2
+
+
+def read_npy_header(f):
+    """
+    Read the header of an npy file from a file-like object positioned at its start.
+
+    Returns
+    -------
+    tuple
+        (shape, fortran_order, dtype), or None if the format version is not supported
+    """
+    version = np.lib.format.read_magic(f)
+    try:
+        header_reader = NPY_HEADER_READERS[version]
+    except KeyError:
+        return None
+    return header_reader(f)
+
+
+def memmap_npz_member(path, name):
+    """
+    Memory-map an array stored uncompressed (as by ``np.savez``) in an npz file.
+
+    Returns
+    -------
+    np.memmap or None
+        None if the member is compressed or otherwise cannot be mapped
+    """
+    with zipfile.ZipFile(path) as zf:
+        info = zf.getinfo(name)
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+
+    with open(path, "rb") as f:
+        f.seek(info.header_offset)
+        local_header = ZIP_LOCAL_HEADER.unpack(f.read(ZIP_LOCAL_HEADER.size))
+        if local_header[0] != ZIP_LOCAL_SIGNATURE:
+            return None
+        name_len, extra_len = local_header[-2:]
+        f.seek(name_len + extra_len, os.SEEK_CUR)
+
+        header = read_npy_header(f)
+        if header is None:
+            return None
+        shape, fortran_order, dtype = header
+        offset = f.tell()
+
+    if dtype.hasobject or 0 in shape:
+        return None
+
+    return np.memmap(
+        path,
+        dtype=dtype,
+        mode="c",
+        offset=offset,
+        shape=shape,
+        order="F" if fortran_order else "C",
+    )
+
+
+def memmap_raw(path, dtype, shape, header_bytes=0):
+    """
+    Memory-map a headerless C-order volume, after skipping ``header_bytes``.
+
+    One dimension of ``shape`` may be -1, in which case it is inferred from the size of the file.
+
+    Returns
+    -------
+    np.memmap
+    """
+    dtype = np.dtype(dtype)
+    shape = [int(n) for n in shape]
+    data_bytes = os.path.getsize(path) - header_bytes
+    known = int(np.prod([n for n in shape if n != -1], dtype=np.int64)) * dtype.itemsize
+    if shape.count(-1) > 1:
+        raise ValueError("Only one dimension of the volume shape can be inferred")
+    if -1 in shape:
+        shape[shape.index(-1)] = data_bytes // known if known else 0
+    expected = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+    if data_bytes < expected:
+        raise ValueError(
+            "{} has {} bytes after its header, but a volume of shape {} and type {} needs {}".format(
+                path, data_bytes, tuple(shape), dtype, expected
+            )
+        )
+    if data_bytes > expected:
+        logger.warning(
+            "%s has %s bytes after the volume, which will be ignored", path, data_bytes - expected
+        )
+    return np.memmap(path, dtype=dtype, mode="c", offset=header_bytes, shape=tuple(shape))
+
+
+def stream_npz_member(path, name, slicing):
+    """
+    Read the ROI of a compressed npz member, decompressing only as far as the last row needed and
+    holding only the rows within the ROI in memory.
+
+    Fortran-ordered and object arrays are read in their entirety before slicing.
+    """
+    with zipfile.ZipFile(path) as zf, zf.open(name) as f:
+        header = read_npy_header(f)
+        if header is None or header[1] or header[2].hasobject:
+            logger.debug("Cannot stream %s from %s, reading whole array", name, path)
+            with np.load(path) as npz:
+                return LazyArray(npz[name], slicing)[...]
+
+        shape, _, dtype = header
+        rows = roi_to_ranges(slicing, shape)[0]
+        row_bytes = int(np.prod(shape[1:], dtype=np.int64)) * dtype.itemsize
+
+        def skip(to_skip):
+            while to_skip > 0:
+                skipped = len(f.read(min(to_skip, STREAM_BLOCK_BYTES)))
+                if not skipped:
+                    break
+                to_skip -= skipped
+
+        def read_into(block):
+            buf = memoryview(block.reshape(-1).view(np.uint8))
+            pos = 0
+            while pos < len(buf):
+                n_read = f.readinto(buf[pos:])
+                if not n_read:
+                    raise ValueError("{} in {} is truncated".format(name, path))
+                pos += n_read
+
+        skip(rows.start * row_bytes)
+        if rows.step == 1:
+            n_rows = rows[-1] + 1 - rows.start if len(rows) else 0
+            block = np.empty((n_rows,) + tuple(shape[1:]), dtype=dtype)
+            read_into(block)
+        else:
+            # only hold the rows which are in the ROI
+            block = np.empty((len(rows),) + tuple(shape[1:]), dtype=dtype)
+            for idx in range(len(rows)):
+                if idx:
+                    skip((rows.step - 1) * row_bytes)
+                read_into(block[idx])
+            rows = range(len(rows))
+
+    if slicing is Ellipsis:
+        rest = ()
+    else:
+        rest = tuple(slicing[1:])
+    return LazyArray(block, (slice(None, None, rows.step),) + rest)[...]
+
+
+# imageio plugins implemented in pure python, which hold the GIL while decoding
+GIL_BOUND_FORMATS = {"BSDF", "SWF", "DICOM"}
+
+# blocks of frames per worker, for load balancing
+BLOCKS_PER_WORKER = 4
+
+
+def decode_frames(path, ftype, indices, key, out=None):
+    """
+    Decode the given frames of an image file and index each of them with ``key``.
+
+    Parameters
+    ----------
+    path : str
+    ftype : str or None
+        imageio format hint
+    indices : range
+        Frame indices
+    key : tuple
+        Normalised index into each frame
+    out : np.ndarray, optional
+        Array to write the frames into. If not given, a new one is created.
+
+    Returns
+    -------
+    np.ndarray
+    """
+    with imageio.get_reader(path, format=ftype) as reader:
+        for out_idx, frame_idx in enumerate(indices):
+            tile = np.asarray(reader.get_data(frame_idx))[key]
+            if out is None:
+                out = np.empty((len(indices),) + tile.shape, dtype=tile.dtype)
+            out[out_idx] = tile
+    return out
+
+
+def natural_key(path):
+    """Sort key under which e.g. ``slice_2.png`` comes before ``slice_10.png``"""
+    return [
+        int(part) if part.isdigit() else part.lower()
+        for part in re.split(r"(\d+)", os.path.basename(path))
+    ]
+
+
+def is_glob(path):
+    """Whether a path is a glob pattern: it has wildcards, and is not itself an existing file or directory"""
+    return any(char in str(path) for char in "*?[") and not os.path.exists(str(path))
+
+
+def sequence_paths(path):
+    """
+    Naturally-sorted paths of the image files matching a glob pattern,
+    or in a directory (those with the extension of an image format).
+    """
+    path = str(path)
+    if is_glob(path):
+        paths = [p for p in glob.glob(path) if os.path.isfile(p)]
+    else:
+        paths = [
+            os.path.join(path, name)
+            for name in os.listdir(path)
+            if not name.startswith(".")
+            and os.path.splitext(name)[1].lower() in SEQUENCE_EXTENSIONS
+        ]
+    if not paths:
+        raise ValueError("No image files found at {}".format(path))
+    return sorted(paths, key=natural_key)
+
+
+def decode_image(path, ftype=None):
+    """Decode the first image in a file"""
+    with imageio.get_reader(path, format=ftype) as reader:
+        return np.asarray(reader.get_data(0))
+
+
+class NotRandomAccess(Exception):
+    pass
+
+
+class ImageioStack:
+    def __init__(self, path, ftype=None, workers=1):
+        """
+        Array-like stack of the frames of an image file, which are decoded only when indexed.
+
+        Frames are accessed by index, so reading from the middle of a stack does not decode the
+        frames before it (if the imageio plugin supports seeking).
+
+        Parameters
+        ----------
+        path : str
+        ftype : str, optional
+            imageio format hint
+        workers : int
+            Number of workers with which to decode multiple frames in parallel (default 1).
+            Threads are used unless the imageio plugin is known to hold the GIL,
+            in which case processes are.
+
+        Raises
+        ------
+        NotRandomAccess
+            If the reader cannot report its length or read frames by index
+        """
+        self.path = path
+        self.ftype = ftype
+        self.workers = workers
+        self.reader = imageio.get_reader(path, format=ftype)
+        try:
+            length = self.reader.get_length()
+            if length == float("inf"):
+                raise NotRandomAccess("Reader has unknown length")
+            first = np.asarray(self.reader.get_data(0))
+        except NotRandomAccess:
+            self.reader.close()
+            raise
+        except (IndexError, RuntimeError, NotImplementedError) as e:
+            self.reader.close()
+            raise NotRandomAccess(str(e))
+
+        self.shape = (int(length),) + first.shape
+        self.dtype = first.dtype
+        self._lock = threading.Lock()
+
+    @property
+    def holds_gil(self):
+        fmt = getattr(self.reader, "format", None)
+        return getattr(fmt, "name", None) in GIL_BOUND_FORMATS
+
+    def frame(self, idx):
+        """Decode a single frame"""
+        with self._lock:
+            return np.asarray(self.reader.get_data(idx))
+
+    def __getitem__(self, key):
+        key = normalise_key(key, len(self.shape))
+        z, rest = key[0], key[1:]
+        if not isinstance(z, slice):
+            return self.frame(z)[rest]
+
+        indices = range(*z.indices(self.shape[0]))
+        out = np.empty(
+            (len(indices),) + indexed_shape(rest, self.shape[1:]), dtype=self.dtype
+        )
+        if self.workers > 1 and len(indices) > 1:
+            self._decode_parallel(indices, rest, out)
+        else:
+            for out_idx, frame_idx in enumerate(indices):
+                out[out_idx] = self.frame(frame_idx)[rest]
+        return out
+
+    def _decode_parallel(self, indices, key, out):
+        n_blocks = min(len(indices), self.workers * BLOCKS_PER_WORKER)
+        bounds = np.linspace(0, len(indices), n_blocks + 1, dtype=int)
+        blocks = [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+        if self.holds_gil:
+            logger.debug("Decoding %s frames in %s processes", len(indices), self.workers)
+            with ProcessPoolExecutor(self.workers) as executor:
+                futures = [
+                    executor.submit(decode_frames, self.path, self.ftype, indices[block], key)
+                    for block in blocks
+                ]
+                for block, future in zip(blocks, futures):
+                    out[block] = future.result()
+        else:
+            logger.debug("Decoding %s frames in %s threads", len(indices), self.workers)
+            with ThreadPoolExecutor(self.workers) as executor:
+                futures = [
+                    executor.submit(
+                        decode_frames, self.path, self.ftype, indices[block], key, out[block]
+                    )
+                    for block in blocks
+                ]
+                for future in futures:
+                    future.result()
+
+    def close(self):
+        self.reader.close()
+
+
+class ImageSequence:
+    def __init__(self, paths, ftype=None, workers=1):
+        """
+        Array-like stack of 2D images, one per file, which are decoded only when indexed.
+
+        Only the first file is decoded on construction, to find the shape and type of every slice,
+        so opening a sequence of many files is fast. Each file must contain a single image of the same shape.
+
+        Parameters
+        ----------
+        paths : list of str
+            In slice order
+        ftype : str, optional
+            imageio format hint
+        workers : int
+            Number of threads with which to decode multiple files in parallel (default 1)
+        """
+        self.paths = list(paths)
+        self.ftype = ftype
+        self.workers = workers
+        first = decode_image(self.paths[0], ftype)
+        self.shape = (len(self.paths),) + first.shape
+        self.dtype = first.dtype
+
+    def frame(self, idx):
+        """Decode a single file"""
+        with timed("sequence.decode") as timing:
+            arr = decode_image(self.paths[idx], self.ftype)
+            timing.nbytes = arr.nbytes
+        if arr.shape != self.shape[1:]:
+            raise ValueError(
+                "{} has shape {}, but the first file of the sequence has shape {}".format(
+                    self.paths[idx], arr.shape, self.shape[1:]
+                )
+            )
+        return arr
+
+    def __getitem__(self, key):
+        key = normalise_key(key, len(self.shape))
+        z, rest = key[0], key[1:]
+        if not isinstance(z, slice):
+            return self.frame(z)[rest]
+
+        indices = range(*z.indices(self.shape[0]))
+        out = np.empty(
+            (len(indices),) + indexed_shape(rest, self.shape[1:]), dtype=self.dtype
+        )
+
+        def decode(out_idx):
+            out[out_idx] = self.frame(indices[out_idx])[rest]
+
+        if self.workers > 1 and len(indices) > 1:
+            logger.debug("Decoding %s files in %s threads", len(indices), self.workers)
+            with ThreadPoolExecutor(self.workers) as executor:
+                for _ in executor.map(decode, range(len(indices))):
+                    pass
+        else:
+            for out_idx in range(len(indices)):
+                decode(out_idx)
+        return out
+
+
+class StridedDataset:
+    def __init__(self, dataset):
+        """
+        Array-like wrapper around a dataset which only supports contiguous slices (e.g. z5py and pyn5 datasets),
+        which serves strided slices by reading each plane along dimension 0 contiguously and striding it in memory.
+        Planes skipped along dimension 0 are not read at all.
+        """
+        self.dataset = dataset
+        self.shape = tuple(dataset.shape)
+        self.dtype = np.dtype(dataset.dtype)
+        self.chunks = getattr(dataset, "chunks", None)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __getitem__(self, key):
+        key = normalise_key(key, self.ndim)
+        if not any(isinstance(item, slice) and item.step not in (None, 1) for item in key):
+            return np.asarray(self.dataset[key])
+
+        contiguous = []
+        strides = []
+        for item, n in zip(key, self.shape):
+            if isinstance(item, slice):
+                rng = range(*item.indices(n))
+                contiguous.append(slice(rng.start, rng.start + (len(rng) - 1) * rng.step + 1))
+                strides.append(slice(None, None, rng.step))
+            else:
+                contiguous.append(item)
+        contiguous, strides = tuple(contiguous), tuple(strides)
+
+        z = key[0]
+        if not isinstance(z, slice):
+            return np.asarray(self.dataset[contiguous])[strides]
+        planes = range(*z.indices(self.shape[0]))
+        out = np.empty(
+            (len(planes),) + indexed_shape(key[1:], self.shape[1:]), dtype=self.dtype
+        )
+        for out_idx, plane in enumerate(planes):
+            out[out_idx] = np.asarray(self.dataset[(plane,) + contiguous[1:]])[strides[1:]]
+        return out
+
+
+# options of FileReader which the viewers' ``from_file`` methods take in their keyword arguments
+READER_OPTIONS = (
+    "workers",
+    "chunk_cache_bytes",
+    "hdf5_cache_bytes",
+    "dtype",
+    "volume_shape",
+    "byte_order",
+    "header_bytes",
+    "disk_cache",
+    "step",
+    "max_memory",
+    "shared_cache",
+)
+
+
+def pop_reader_kwargs(kwargs):
+    """Remove the FileReader options (see ``READER_OPTIONS``) from a dict of keyword arguments, and return them"""
+    return {name: kwargs.pop(name) for name in READER_OPTIONS if name in kwargs}
+
+
 class FileReader:
-    def __init__(self, path, offset=None, shape=None, internal_path=None, ftype=None):
+    def __init__(
+        self,
+        path,
+        offset=None,
+        shape=None,
+        internal_path=None,
+        ftype=None,
+        workers=1,
+        chunk_cache_bytes=DEFAULT_CHUNK_CACHE_BYTES,
+        hdf5_cache_bytes=None,
+        dtype=None,
+        volume_shape=None,
+        byte_order=None,
+        header_bytes=0,
+        disk_cache=None,
+        step=None,
+        max_memory=None,
+        shared_cache=None,
+    ):
         """
         A class which can read a variety of volumetric data formats.
 
         Parameters
         ----------
         path : str or PathLike
-            Path to data file
+            Path to data file; or to a directory of 2D image files, or a glob pattern matching them,
+            which are read as consecutive slices in natural sort order
         offset : array-like, optional
             Default (0, 0, 0)
         shape : array-like, optional
@@ -79,49 +618,339 @@ class FileReader:
             Path to data within file, if required
         ftype : str, optional
             Override file format inferred from ``path``
+        workers : int, optional
+            Number of workers with which to decode image stacks and sequences in parallel (default 1)
+        chunk_cache_bytes : int, optional
+            Budget for decompressed chunk-aligned slabs of chunked HDF5, N5 and zarr datasets opened lazily,
+            shared between all datasets opened by this reader (default 256MiB). 0 or None to disable.
+        hdf5_cache_bytes : int, optional
+            Size of HDF5's own raw chunk cache (``rdcc_nbytes``) per dataset. Default HDF5's default (1MiB).
+        dtype : np.dtype, optional
+            Data type for formats which do not record one: required for raw files, and inferred from the values
+            of JSON files if not given.
+        volume_shape : array-like, optional
+            Shape of the whole volume in a raw file, in C order (required for raw files).
+            One dimension may be -1, to be inferred from the file size.
+        byte_order : {"little", "big", "native"}, optional
+            Byte order of a raw file. Default that of ``dtype``, usually native.
+        header_bytes : int, optional
+            Number of bytes before the volume in a raw file (default 0)
+        disk_cache : DiskCache, optional
+            If given, image stacks and JSON files are cached there once decoded by ``read``,
+            and later reads (and ``open``) memory-map the cached volume rather than decoding the file again
+        step : array-like, optional
+            Read only every ``step``-th voxel of the ROI along each dimension, e.g. ``(4, 4, 4)`` for a preview of a
+            large volume. Only the voxels needed are read, where the format allows. Default (1, 1, 1).
+        max_memory : int, optional
+            Budget in bytes for the volume read by ``read``. If the ROI, as estimated from the file's metadata,
+            would exceed it, the step along every spatial dimension is multiplied by the smallest factor
+            which fits it within the budget (with a warning). Default no limit.
+        shared_cache : SharedSliceCache, optional
+            If given, volumes decoded by ``read``, and planes decoded from volumes opened by ``open``, are cached in
+            shared memory, and read from there by any process which reads the same data, without copying.
+            Arrays read from the cache are read-only. Memory-mapped formats are not cached, as they are already
+            shared through the operating system's page cache.
         """
         self.path = str(path)
-        self.slicing = offset_shape_to_slicing(offset, shape)
+        self.offset = None if offset is None else tuple(offset)
+        self.shape = None if shape is None else tuple(shape)
+        self.step = None if step is None else tuple(int(s) for s in step)
+        if self.step is not None and any(s < 1 for s in self.step):
+            raise ValueError("step must be positive, got {}".format(self.step))
+        self.slicing = offset_shape_to_slicing(self.offset, self.shape, self.step)
+        self.max_memory = max_memory
         self.internal_path = internal_path
+        self.workers = workers
+        self.hdf5_cache_bytes = hdf5_cache_bytes
+        self.dtype = None if dtype is None else np.dtype(dtype)
+        if byte_order is not None:
+            if byte_order not in BYTE_ORDERS:
+                raise ValueError(
+                    "byte_order must be one of {}, got '{}'".format(
+                        sorted(BYTE_ORDERS), byte_order
+                    )
+                )
+            if self.dtype is not None:
+                self.dtype = self.dtype.newbyteorder(BYTE_ORDERS[byte_order])
+        self.volume_shape = None if volume_shape is None else tuple(volume_shape)
+        self.header_bytes = header_bytes
+        self.disk_cache = disk_cache
+        self.shared_cache = shared_cache
+        self.chunk_cache = SliceCache(chunk_cache_bytes) if chunk_cache_bytes else None
 
         self.ftype = self._parse_ftype(ftype)
 
     def _parse_ftype(self, ftype=None):
         ftype = ftype or os.path.splitext(str(self.path))[1]
-        return NORMALISED_TYPES.get(ftype.lstrip(".").lower())
+        normalised = NORMALISED_TYPES.get(ftype.lstrip(".").lower())
+        if normalised is None and (is_glob(self.path) or os.path.isdir(self.path)):
+            return "sequence"
+        return normalised
+
+    def _resolve_ftype(self, ftype=None):
+        """Return the normalised file type to dispatch on, and any format hint for imageio"""
+        if ftype:
+            if ftype in NORMALISED_TYPES:
+                return NORMALISED_TYPES[ftype], None
+            else:
+                return "imageio", ftype
+        else:
+            return self.ftype or "imageio", None
 
     def read(self, ftype=None):
         """
+        Read the ROI into memory.
 
         Returns
         -------
         np.ndarray
         """
-        if ftype:
-            if ftype in NORMALISED_TYPES:
-                return getattr(self, "_read_" + NORMALISED_TYPES[ftype])()
+        name, hint = self._resolve_ftype(ftype)
+        args = (hint,) if hint else ()
+        with timed("reader.read") as timing:
+            self.fit_to_memory(ftype)
+            shared_key = self._shared_cache_key(name, hint)
+            arr = None if shared_key is None else self.shared_cache.get(shared_key)
+            if arr is not None:
+                logger.debug("Read %s from shared memory", self.path)
             else:
-                return self._read_imageio(ftype)
-        else:
-            if self.ftype:
-                return getattr(self, "_read_" + self.ftype)()
+                cache_key = self._disk_cache_key(name, hint)
+                arr = None if cache_key is None else self.disk_cache.get(cache_key)
+                if arr is None:
+                    arr = getattr(self, "_read_" + name)(*args)
+                    if cache_key is not None:
+                        self.disk_cache.put(cache_key, arr)
+                if shared_key is not None:
+                    self.shared_cache.put(shared_key, arr)
+            timing.nbytes = arr.nbytes
+        return arr
+
+    def _shared_cache_key(self, name, hint=None):
+        if self.shared_cache is None or name in MAPPED_TYPES:
+            return None
+        prefix = self.shared_cache.reader_key(self, hint or name)
+        if prefix is None:
+            return None
+        return self.shared_cache.key(prefix, repr(self.slicing))
+
+    def estimate_roi(self, ftype=None):
+        """
+        Shape and type of the ROI, from the file's metadata rather than by reading it.
+
+        Returns
+        -------
+        tuple or None
+            (shape, dtype), or None if they cannot be found without reading the whole file (e.g. JSON)
+        """
+        name, hint = self._resolve_ftype(ftype)
+        try:
+            if name in LAZY_TYPES:
+                with getattr(self, "_open_" + name)() as arr:
+                    return arr.shape, arr.dtype
+            if name == "npz":
+                with zipfile.ZipFile(self.path) as zf:
+                    with zf.open(self._npz_member_name()) as f:
+                        header = read_npy_header(f)
+                if header is None:
+                    return None
+                full_shape, dtype = header[0], header[2]
+            elif name == "imageio":
+                stack = ImageioStack(self.path, hint)
+                stack.close()
+                full_shape, dtype = stack.shape, stack.dtype
             else:
-                return self._read_imageio()
+                return None
+        except NotRandomAccess:
+            return None
+        shape = tuple(len(r) for r in roi_to_ranges(self.slicing, full_shape))
+        return shape, np.dtype(dtype)
 
-    def _slice_if_necessary(self, arr):
-        """Slice if self.slicing is not all, otherwise do not (avoid copying)"""
-        if self.slicing == Ellipsis:
-            return np.asarray(arr)
-        else:
-            return np.asarray(arr)[self.slicing]
+    def estimate_nbytes(self, ftype=None):
+        """Size of the ROI in bytes, from the file's metadata, or None if it cannot be found without reading it"""
+        estimate = self.estimate_roi(ftype)
+        if estimate is None:
+            return None
+        shape, dtype = estimate
+        return int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+
+    def fits_in_memory(self, ftype=None):
+        """Whether the ROI is within ``max_memory``, or there is no budget, or its size cannot be estimated"""
+        if self.max_memory is None:
+            return True
+        nbytes = self.estimate_nbytes(ftype)
+        return nbytes is None or nbytes <= self.max_memory
+
+    def opens_lazily(self, ftype=None):
+        """Whether ``open`` reads the file lazily, rather than reading the whole ROI into memory"""
+        return self._resolve_ftype(ftype)[0] in LAZY_TYPES
+
+    def memory_factor(self, ftype=None):
+        """
+        Smallest factor by which to multiply the step along the spatial dimensions for the ROI to fit in
+        ``max_memory``: 1 if it fits already, there is no budget, or its size cannot be estimated
+        """
+        if self.max_memory is None:
+            return 1
+        estimate = self.estimate_roi(ftype)
+        if estimate is None:
+            logger.info("Cannot estimate the size of %s before reading it", self.path)
+            return 1
+        shape, dtype = estimate
+        per_voxel = int(np.prod(shape[3:], dtype=np.int64)) * dtype.itemsize
+
+        def nbytes(factor):
+            return int(np.prod([-(-n // factor) for n in shape[:3]], dtype=np.int64)) * per_voxel
+
+        factor = 1
+        while nbytes(factor) > self.max_memory and factor < max(shape[:3]):
+            factor += 1
+        return factor
+
+    def fit_to_memory(self, ftype=None, factor=None):
+        """
+        Multiply the step along the spatial dimensions by ``factor``:
+        by default the smallest which fits the ROI in ``max_memory`` (see ``memory_factor``).
+        """
+        if factor is None:
+            factor = self.memory_factor(ftype)
+        if factor == 1:
+            return
+        logger.warning(
+            "%s: reading one voxel in %s along each dimension, to fit in the memory budget",
+            self.path,
+            factor,
+        )
+        self.step = tuple((s or 1) * factor for s in (self.step or (1, 1, 1)))
+        self.slicing = offset_shape_to_slicing(self.offset, self.shape, self.step)
+
+    def _disk_cache_key(self, name, hint=None):
+        if self.disk_cache is None or name not in DISK_CACHED_TYPES:
+            return None
+        return self.disk_cache.key(self, hint or name)
+
+    def open(self, ftype=None):
+        """
+        Open the ROI lazily: data is only read when the returned array is indexed.
+
+        Formats backed by a file handle (HDF5, N5, zarr) keep the handle open until the returned
+        array is closed, so use it as a context manager or call its ``close`` method when finished.
+        npy files and uncompressed npz members are memory-mapped.
+        Image stacks are decoded frame by frame as they are indexed, if the imageio plugin supports it.
+        Other formats are read into memory as by ``read``.
+        Volumes in the ``disk_cache`` (which are only added by ``read``) are memory-mapped from there.
+
+        Returns
+        -------
+        LazyArray
+        """
+        name, hint = self._resolve_ftype(ftype)
+        cache_key = self._disk_cache_key(name, hint)
+        if cache_key is not None:
+            cached = self.disk_cache.get(cache_key)
+            if cached is not None:
+                return LazyArray(cached)
+        try:
+            method = getattr(self, "_open_" + name)
+        except AttributeError:
+            logger.info("Lazy reading not supported for %s files, reading eagerly", name)
+            return LazyArray(self.read(ftype))
+        args = (hint,) if hint else ()
+        with timed("reader.open"):
+            arr = method(*args)
+        if self.shared_cache is not None and not isinstance(arr.source, np.ndarray):
+            prefix = self.shared_cache.reader_key(self, hint or name)
+            if prefix is not None:
+                # the ROI is still applied by the LazyArray, so planes are shared between ROIs
+                arr.source = SharedPlanes(arr.source, self.shared_cache, prefix)
+        return arr
+
+    def _wrap_handle(self, f, native_steps=False):
+        """
+        Wrap the dataset at internal_path in an open file handle, closing the handle on failure.
+
+        If internal_path is a multiscale group, its finest level is used.
+        Unless the format supports strided reads (``native_steps``), they are made plane by plane.
+        """
+        try:
+            obj = f[self.internal_path]
+            names = scale_names(obj)
+            name = self.internal_path
+            if names is not None:
+                logger.info("Reading finest level of multiscale group %s", self.internal_path)
+                obj = obj[names[0]]
+                name = (self.internal_path, names[0])
+            if not native_steps and _is_strided(self.slicing):
+                obj = StridedDataset(obj)
+            return LazyArray(self._chunked(obj, name), self.slicing, f)
+        except Exception:
+            f.close()
+            raise
+
+    def _chunked(self, dataset, name):
+        """
+        Wrap a dataset which is chunked along dimension 0 so that its planes are read in cached chunk-aligned slabs.
+        ``name`` identifies the dataset within the file.
+        """
+        chunks = getattr(dataset, "chunks", None)
+        if self.chunk_cache is None or not chunks or chunks[0] <= 1:
+            return dataset
+        logger.debug("Reading slabs of %s planes from dataset with chunks %s", chunks[0], chunks)
+        return ChunkedDataset(
+            dataset, self.chunk_cache, chunks, (os.path.abspath(self.path), name)
+        )
+
+    def open_multiscale(self, ftype=None):
+        """
+        Open all levels of a multiscale group (containing datasets named like ``s0``, ``s1``, ... or ``0``, ``1``, ...)
+        at internal_path in an HDF5, N5 or zarr file, lazily.
+
+        The ROI is given in the coordinates of the finest level, and scaled for each coarser level.
+        If internal_path is a single dataset, or the format does not support multiscale groups,
+        the Pyramid has a single level as opened by ``open``.
+
+        Returns
+        -------
+        Pyramid
+        """
+        arr = self.open(ftype)
+        handle = getattr(arr, "_handle", None)
+        name, _ = self._resolve_ftype(ftype)
+        if handle is None or name not in MULTISCALE_TYPES or _is_strided(self.slicing):
+            # coarser levels would not line up with a strided ROI
+            return Pyramid([arr])
+
+        try:
+            group = handle[self.internal_path]
+            names = scale_names(group)
+            if names is None:
+                return Pyramid([arr])
+
+            datasets = [group[name] for name in names]
+            factors = infer_factors([ds.shape[:3] for ds in datasets])
+            levels = [
+                LazyArray(
+                    self._chunked(ds, (self.internal_path, name)),
+                    scale_slicing(self.slicing, factor),
+                )
+                for ds, name, factor in zip(datasets, names, factors)
+            ]
+        except Exception:
+            arr.close()
+            raise
+        logger.info("Opened %s levels of multiscale group %s", len(levels), self.internal_path)
+        return Pyramid(levels, factors, handle)
+
+    @check_internal_path(False)
+    def _open_npy(self):
+        return LazyArray(np.load(self.path, mmap_mode="c"), self.slicing)
 
     @check_internal_path(False)
     def _read_npy(self):
-        whole_arr = np.load(self.path)
-        return self._slice_if_necessary(whole_arr)
+        with self._open_npy() as arr:
+            return arr[...]
 
     @check_internal_path(True)
-    def _read_n5(self):
+    def _open_n5(self):
         if z5py:
             cls = z5py.N5File
         elif pyn5:
@@ -129,50 +958,118 @@ class FileReader:
         else:
             cls = z5py.N5File
 
-        with cls(self.path, mode="r") as f:
-            return np.asarray(f[self.internal_path][self.slicing])
+        f = cls(self.path, mode="r")
+        return self._wrap_handle(f)
+
+    @check_internal_path(True)
+    def _read_n5(self):
+        with self._open_n5() as arr:
+            return np.asarray(arr)
+
+    @check_internal_path(True)
+    def _open_zarr(self):
+        f = z5py.ZarrFile(self.path, mode="r")
+        return self._wrap_handle(f)
 
     @check_internal_path(True)
     def _read_zarr(self):
-        with z5py.ZarrFile(self.path, mode="r") as f:
-            return np.asarray(f[self.internal_path][self.slicing])
+        with self._open_zarr() as arr:
+            return np.asarray(arr)
+
+    @check_internal_path(True)
+    def _open_hdf5(self):
+        kwargs = dict()
+        if self.hdf5_cache_bytes is not None:
+            kwargs["rdcc_nbytes"] = int(self.hdf5_cache_bytes)
+        f = h5py.File(self.path, mode="r", **kwargs)
+        return self._wrap_handle(f, native_steps=True)
 
     @check_internal_path(True)
     def _read_hdf5(self):
-        with h5py.File(self.path, mode="r") as f:
-            return np.asarray(f[self.internal_path][self.slicing])
+        with self._open_hdf5() as arr:
+            return np.asarray(arr)
+
+    def _npz_member_name(self):
+        if self.internal_path.endswith(".npy"):
+            return self.internal_path
+        return self.internal_path + ".npy"
+
+    @check_internal_path(True)
+    def _open_npz(self):
+        name = self._npz_member_name()
+        mapped = memmap_npz_member(self.path, name)
+        if mapped is None:
+            logger.info("%s is compressed, reading eagerly", name)
+            return LazyArray(self._read_npz())
+        return LazyArray(mapped, self.slicing)
 
     @check_internal_path(True)
     def _read_npz(self):
-        with np.load(self.path) as f:
-            return self._slice_if_necessary(f[self.internal_path])
+        name = self._npz_member_name()
+        mapped = memmap_npz_member(self.path, name)
+        if mapped is None:
+            return stream_npz_member(self.path, name, self.slicing)
+        return LazyArray(mapped, self.slicing)[...]
+
+    @check_internal_path(False)
+    def _open_imageio(self, ftype=None):
+        try:
+            stack = ImageioStack(self.path, ftype, self.workers)
+        except NotRandomAccess:
+            logger.info("%s does not support random access, reading eagerly", self.path)
+            return LazyArray(self._read_imageio_sequential(ftype))
+        return LazyArray(stack, self.slicing, stack)
 
     @check_internal_path(False)
     def _read_imageio(self, ftype=None):
+        with self._open_imageio(ftype) as arr:
+            return arr[...]
+
+    def _read_imageio_sequential(self, ftype=None):
+        """Decode every frame up to the end of the ROI, for readers which cannot seek"""
         slicing = (
             tuple(slice(None, None) for _ in range(3))
             if self.slicing == Ellipsis
             else self.slicing
         )
         zmin, zmax = slicing[0].start or 0, slicing[0].stop
+        zstep = slicing[0].step or 1
         reader = imageio.get_reader(self.path, format=ftype)
 
         tiles = []
-        for idx, frame in enumerate(reader):
-            if idx < zmin:
-                continue
-            if zmax is not None and idx >= zmax:
-                break
-
-            subframe = frame[slicing[1:]]
-            tiles.append(np.asarray(subframe))
+        with reader:
+            for idx, frame in enumerate(reader):
+                if zmax is not None and idx >= zmax:
+                    break
+                if idx < zmin or (idx - zmin) % zstep:
+                    continue
+
+                subframe = frame[slicing[1:]]
+                tiles.append(np.asarray(subframe))
         return np.array(tuple(tiles))
 
-    def _read_json(self):
-        with open(self.path) as f:
-            obj = json.load(f)
+    @check_internal_path(False)
+    def _open_raw(self):
+        if self.dtype is None or self.volume_shape is None:
+            raise ValueError("dtype and volume_shape are required for raw files")
+        mapped = memmap_raw(self.path, self.dtype, self.volume_shape, self.header_bytes)
+        return LazyArray(mapped, self.slicing)
 
-        if self.internal_path:
-            obj = obj[self.internal_path]
+    @check_internal_path(False)
+    def _read_raw(self):
+        with self._open_raw() as arr:
+            return arr[...]
+
+    @check_internal_path(False)
+    def _open_sequence(self):
+        sequence = ImageSequence(sequence_paths(self.path), workers=self.workers)
+        logger.info("Opened sequence of %s images at %s", len(sequence.paths), self.path)
+        return LazyArray(sequence, self.slicing)
 
-        return self._slice_if_necessary(obj)
+    @check_internal_path(False)
+    def _read_sequence(self):
+        with self._open_sequence() as arr:
+            return arr[...]
+
+    def _read_json(self):
+        return read_json_array(self.path, self.internal_path, self.slicing, self.dtype)
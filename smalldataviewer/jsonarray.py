@@ -0,0 +1,251 @@
+import json
+import logging
+import mmap
+import re
+
+import numpy as np
+
+from smalldataviewer.lazy import roi_to_ranges
+
+__all__ = ["read_json_array"]
+
+
+logger = logging.getLogger(__name__)
+
+# strings (which may contain brackets) and structural characters, for finding a key in the outer object
+OBJECT_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[\[\]{}:,]')
+
+VALUES = re.compile(rb"[^\s,]")
+
+FLOAT_MARKERS = (b".", b"e", b"E", b"NaN", b"Infinity", b"null")
+BOOL_MARKERS = (b"true", b"false")
+NULL = re.compile(rb"null")
+
+
+def _skip_whitespace(buf, pos):
+    while pos < len(buf) and buf[pos : pos + 1].isspace():
+        pos += 1
+    return pos
+
+
+def find_array(buf, key=None):
+    """
+    Find the position of the opening bracket of the array in a JSON document:
+    either the document itself, or the value of ``key`` in the outer object.
+    """
+    pos = _skip_whitespace(buf, 0)
+    if key is None:
+        if buf[pos : pos + 1] != b"[":
+            raise ValueError("JSON document is not an array: internal_path required")
+        return pos
+    if buf[pos : pos + 1] != b"{":
+        raise ValueError("JSON document is not an object: internal_path not required")
+
+    depth = 0
+    expect_key = False
+    found = False
+    for match in OBJECT_TOKEN.finditer(buf, pos):
+        token = match.group()
+        if token in (b"{", b"["):
+            depth += 1
+            expect_key = token == b"{" and depth == 1
+        elif token in (b"}", b"]"):
+            depth -= 1
+            if depth == 0:
+                break
+        elif depth != 1:
+            continue
+        elif token == b",":
+            expect_key = True
+        elif token == b":":
+            if found:
+                start = _skip_whitespace(buf, match.end())
+                if buf[start : start + 1] != b"[":
+                    raise ValueError("Value of '{}' is not an array".format(key))
+                return start
+        elif expect_key:
+            expect_key = False
+            found = json.loads(token.decode("utf-8")) == key
+    raise KeyError(key)
+
+
+def array_tokens(buf, start):
+    """
+    Yield the brackets of the nested array starting at ``start``, and the runs of bytes between them
+    (which are either separators or a row of values), until the end of the buffer.
+
+    Brackets are found with ``bytes.find`` rather than a regular expression, which is much faster for long rows.
+    """
+    next_open = buf.find(b"[", start)
+    next_close = buf.find(b"]", start)
+    pos = start
+    while next_close != -1:
+        if next_open != -1 and next_open < pos:
+            next_open = buf.find(b"[", pos)
+        if next_close < pos:
+            next_close = buf.find(b"]", pos)
+            if next_close == -1:
+                break
+        bracket = next_close if next_open == -1 else min(next_open, next_close)
+        if bracket > pos:
+            yield buf[pos:bracket]
+        yield buf[bracket : bracket + 1]
+        pos = bracket + 1
+    if pos < len(buf):
+        yield buf[pos:]
+
+
+def _value_dtype(run):
+    # checked first, as "true" and "false" contain float markers
+    if any(marker in run for marker in BOOL_MARKERS):
+        return np.dtype(np.bool_)
+    if any(marker in run for marker in FLOAT_MARKERS):
+        return np.dtype(np.float64)
+    return np.dtype(np.int64)
+
+
+def scan_array(buf, start, infer_dtype=True):
+    """
+    Find the shape of the (rectangular) nested array starting at ``start``, without building any Python objects
+    for its values, and optionally the dtype needed to represent them.
+
+    Returns
+    -------
+    tuple
+        (shape, dtype); dtype is None if not inferred
+    """
+    shape = []
+    counts = []
+    ndim = None
+    dtypes = set()
+    for token in array_tokens(buf, start):
+        if token == b"[":
+            counts.append(0)
+            if ndim is not None and len(counts) > ndim:
+                raise ValueError("JSON array is not rectangular")
+            if len(shape) < len(counts):
+                shape.append(None)
+            continue
+
+        depth = len(counts)
+        if token == b"]":
+            n = counts.pop()
+            if shape[depth - 1] is None:
+                shape[depth - 1] = n
+            elif shape[depth - 1] != n:
+                raise ValueError("JSON array is not rectangular")
+            if not counts:
+                break
+            counts[-1] += 1
+        elif VALUES.search(token):
+            if ndim is None:
+                ndim = depth
+            if depth != ndim or counts[-1]:
+                raise ValueError("JSON array is not rectangular")
+            counts[-1] = token.count(b",") + 1
+            if infer_dtype:
+                dtypes.add(_value_dtype(token))
+    if counts:
+        raise ValueError("JSON array is not terminated")
+
+    dtype = None
+    if infer_dtype:
+        dtype = np.result_type(*dtypes) if dtypes else np.dtype(np.float64)
+    return tuple(shape), dtype
+
+
+def parse_values(run, dtype):
+    """
+    Convert a comma-separated row of JSON scalars (as bytes) to a 1D array, cast to ``dtype``.
+    The row is parsed as the type of its values, whatever ``dtype`` is, so that e.g. floats can be read as integers.
+    """
+    wide = _value_dtype(run)
+    if wide.kind == "b":
+        values = np.array([v.strip() == b"true" for v in run.split(b",")], dtype=np.bool_)
+        return values.astype(dtype, copy=False)
+    if wide.kind == "f":
+        run = NULL.sub(b"nan", run)
+    try:
+        values = np.fromstring(run, dtype=wide, sep=",")
+    except ValueError:
+        raise ValueError("Could not read JSON values as {}".format(dtype))
+    return values.astype(dtype, copy=False)
+
+
+def read_array(buf, start, shape, slicing=Ellipsis, dtype=np.float64):
+    """Read the ROI ``slicing`` of the nested array of ``shape`` starting at ``start`` into a new array"""
+    ranges = roi_to_ranges(slicing, shape)
+    out = np.empty(tuple(len(r) for r in ranges), dtype=dtype)
+    if not out.size:
+        return out
+    last_row = ranges[0][-1]
+    columns = slice(ranges[-1].start, ranges[-1].stop, ranges[-1].step)
+
+    # for each open array: index of its current element,
+    # and its index in the output if it is in the ROI (else None)
+    positions = []
+    out_idxs = []
+    for token in array_tokens(buf, start):
+        if token == b"[":
+            if not positions:
+                out_idx = ()
+            else:
+                parent_idx = out_idxs[-1]
+                pos = positions[-1]
+                rng = ranges[len(positions) - 1]
+                if parent_idx is None or pos not in rng:
+                    out_idx = None
+                else:
+                    out_idx = parent_idx + (rng.index(pos),)
+            positions.append(0)
+            out_idxs.append(out_idx)
+        elif token == b"]":
+            positions.pop()
+            out_idxs.pop()
+            if not positions:
+                break
+            positions[-1] += 1
+            if len(positions) == 1 and positions[0] > last_row:
+                # the rest of the array is beyond the ROI
+                break
+        elif out_idxs[-1] is not None and VALUES.search(token):
+            out[out_idxs[-1]] = parse_values(token, out.dtype)[columns]
+    return out
+
+
+def read_json_array(path, key=None, slicing=Ellipsis, dtype=None):
+    """
+    Read the ROI of a numeric array from a JSON document into a numpy array,
+    without building Python objects for the values outside of the ROI.
+
+    The file is memory-mapped and scanned twice: once to find the shape of the array
+    (and the dtype needed to represent its values, if not given), and once to parse the values in the ROI
+    directly into the output.
+    Integers are read as int64, numbers with a decimal point or exponent (or NaN, Infinity and null)
+    as float64, and true/false as bool. If ``dtype`` is given, values are cast to it as by ``astype``.
+
+    Parameters
+    ----------
+    path : str or PathLike
+    key : str, optional
+        If given, the document is an object and the array is the value of this key
+    slicing : tuple of slice, optional
+        ROI, as produced by ``offset_shape_to_slicing``. Default everything.
+    dtype : np.dtype, optional
+        Type of the output, skipping inference
+
+    Returns
+    -------
+    np.ndarray
+    """
+    with open(str(path), "rb") as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ValueError("{} is empty".format(path))
+    with buf:
+        start = find_array(buf, key)
+        shape, inferred = scan_array(buf, start, dtype is None)
+        dtype = inferred if dtype is None else np.dtype(dtype)
+        logger.debug("JSON array of shape %s, reading as %s", shape, dtype)
+        return read_array(buf, start, shape, slicing, dtype)
@@ -0,0 +1,200 @@
+import logging
+import operator
+
+import numpy as np
+
+from smalldataviewer.profiling import timed
+
+__all__ = ["LazyArray"]
+
+
+logger = logging.getLogger(__name__)
+
+
+def roi_to_ranges(slicing, shape):
+    """
+    Convert a slicing as produced by ``offset_shape_to_slicing`` into one concrete ``range`` per dimension.
+
+    Dimensions not covered by the slicing (e.g. colour channels) are taken in their entirety.
+    """
+    if slicing is Ellipsis or slicing is None:
+        slicing = ()
+    slicing = tuple(slicing)
+    if len(slicing) > len(shape):
+        raise ValueError(
+            "ROI has {} dimensions but data has {}".format(len(slicing), len(shape))
+        )
+    slicing += (slice(None),) * (len(shape) - len(slicing))
+    return tuple(range(*slc.indices(n)) for slc, n in zip(slicing, shape))
+
+
+def normalise_key(key, ndim):
+    """Expand a numpy-style basic index into a tuple of ``ndim`` ints and slices"""
+    if not isinstance(key, tuple):
+        key = (key,)
+
+    n_ellipsis = sum(item is Ellipsis for item in key)
+    if n_ellipsis > 1:
+        raise IndexError("an index can only have a single ellipsis ('...')")
+
+    n_explicit = len(key) - n_ellipsis
+    if n_explicit > ndim:
+        raise IndexError(
+            "too many indices: array is {}-dimensional, but {} were indexed".format(
+                ndim, n_explicit
+            )
+        )
+
+    out = []
+    for item in key:
+        if item is Ellipsis:
+            out.extend([slice(None)] * (ndim - n_explicit))
+        elif isinstance(item, slice):
+            out.append(item)
+        else:
+            try:
+                out.append(operator.index(item))
+            except TypeError:
+                raise TypeError(
+                    "Only integers, slices and ellipsis are valid indices, got {}".format(
+                        type(item).__name__
+                    )
+                )
+    out.extend([slice(None)] * (ndim - len(out)))
+    return tuple(out)
+
+
+def indexed_shape(key, shape):
+    """Shape of the result of indexing an array of the given shape with a normalised key"""
+    return tuple(
+        len(range(*item.indices(n)))
+        for item, n in zip(key, shape)
+        if isinstance(item, slice)
+    )
+
+
+def range_to_slice(rng):
+    """
+    Convert a range with a positive step into an equivalent slice.
+
+    A step of 1 is given as ``None``, for the benefit of backends which do not support strides.
+    """
+    if len(rng) == 0:
+        return slice(rng.start, rng.start)
+    step = None if rng.step == 1 else rng.step
+    return slice(rng.start, rng[-1] + 1, step)
+
+
+class LazyArray:
+    def __init__(self, source, slicing=Ellipsis, handle=None):
+        """
+        Read-only, numpy-like view of a region of interest of some indexable backing store.
+
+        Data is only read from ``source`` when the LazyArray is indexed, and the ROI offset is
+        applied to every index. Indexing returns a ``np.ndarray``, in native byte order.
+
+        Parameters
+        ----------
+        source : array-like
+            Anything with ``shape``, ``dtype`` and a numpy-like basic slicing interface,
+            e.g. an h5py, z5py or pyn5 dataset
+        slicing : tuple of slice, optional
+            ROI, as produced by ``offset_shape_to_slicing``. Default everything.
+        handle : object, optional
+            Object with a ``close`` method (e.g. an open file) which must stay alive while
+            ``source`` is in use, and is closed when this LazyArray is.
+        """
+        self.source = source
+        self._ranges = roi_to_ranges(slicing, source.shape)
+        self.shape = tuple(len(r) for r in self._ranges)
+        # e.g. big-endian raw files are converted as they are read, as renderers assume native byte order
+        self.dtype = np.dtype(source.dtype).newbyteorder("=")
+        self._handle = handle
+        self.closed = False
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def offset(self):
+        """Position of the start of the ROI in ``source``"""
+        return tuple(r.start for r in self._ranges)
+
+    @property
+    def step(self):
+        """Step of the ROI along each dimension of ``source``"""
+        return tuple(r.step for r in self._ranges)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape, dtype=np.int64))
+
+    @property
+    def nbytes(self):
+        return self.size * self.dtype.itemsize
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if self.closed:
+            raise ValueError("Cannot read from a closed LazyArray")
+
+        src_key = []
+        to_flip = []
+        out_dim = 0
+        for item, rng in zip(normalise_key(key, self.ndim), self._ranges):
+            if isinstance(item, slice):
+                sub = rng[item]
+                if sub.step < 0:
+                    sub = sub[::-1]
+                    to_flip.append(out_dim)
+                src_key.append(range_to_slice(sub))
+                out_dim += 1
+            else:
+                try:
+                    src_key.append(rng[item])
+                except IndexError:
+                    raise IndexError(
+                        "index {} is out of bounds for axis with size {}".format(
+                            item, len(rng)
+                        )
+                    )
+
+        with timed("lazy.read") as timing:
+            arr = np.asarray(self.source[tuple(src_key)])
+            if not arr.dtype.isnative:
+                arr = arr.astype(self.dtype)
+            timing.nbytes = arr.nbytes
+        if to_flip:
+            arr = np.flip(arr, tuple(to_flip))
+        return arr
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self[...], dtype=dtype)
+
+    def close(self):
+        """Close the underlying file handle, if any. Idempotent."""
+        if self.closed:
+            return
+        self.closed = True
+        if self._handle is not None:
+            logger.debug("Closing %s", self._handle)
+            self._handle.close()
+            self._handle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return "{}(shape={}, dtype={}, source={}{})".format(
+            type(self).__name__,
+            self.shape,
+            self.dtype,
+            type(self.source).__name__,
+            ", closed" if self.closed else "",
+        )
@@ -0,0 +1,387 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from smalldataviewer.cache import (
+    DEFAULT_CACHE_BYTES,
+    SliceCache,
+    Prefetcher,
+)
+from smalldataviewer.ext import LazyModule
+from smalldataviewer.files import FileReader, pop_reader_kwargs
+from smalldataviewer.profiling import timed
+from smalldataviewer.pyramid import Pyramid
+from smalldataviewer.render import LabelRenderer, LUTRenderer, is_lookup_colormap
+from smalldataviewer.viewer import display_cmap
+
+__all__ = ["MultiViewer"]
+
+
+logger = logging.getLogger(__name__)
+
+plt = LazyModule("matplotlib.pyplot")
+
+LAYOUTS = ("overlay", "tile")
+
+# overlaid volumes after the first are drawn with this opacity by default
+DEFAULT_ALPHA = 0.5
+
+
+def _to_rgba(plane):
+    """uint8 RGBA from a plane of 1-4 colour channels: integers as 0-255, floats in [0, 1]"""
+    plane = np.asarray(plane)
+    if plane.dtype.kind == "f":
+        plane = np.clip(plane, 0, 1) * 255
+    plane = plane.astype(np.uint8, copy=False)
+    channels = plane.shape[-1]
+    out = np.empty(plane.shape[:-1] + (4,), dtype=np.uint8)
+    if channels < 3:
+        out[..., :3] = plane[..., :1]
+    else:
+        out[..., :3] = plane[..., :3]
+    out[..., 3] = plane[..., channels - 1] if channels in (2, 4) else 255
+    return out
+
+
+class _Layer(object):
+    def __init__(self, volume, cmap, alpha, name, vmin=None, vmax=None):
+        """One volume of a MultiViewer, and how to render its planes to uint8 RGBA"""
+        cmap = display_cmap(volume, cmap, _to_rgba)
+
+        self.volume = volume
+        self.alpha = alpha
+        self.name = name
+        if is_lookup_colormap(cmap):
+            self.render = LUTRenderer(cmap, vmin, vmax)
+        elif isinstance(cmap, LabelRenderer):
+            # each layer reuses its own output buffer
+            self.render = cmap.copy()
+        else:
+            self.render = cmap
+
+    def transparent(self, plane):
+        """Mask of pixels which should not be drawn over the layers below, or None"""
+        if isinstance(self.render, LabelRenderer) and self.render.background is not None:
+            return np.asarray(plane) == self.render.background
+        return None
+
+
+class MultiViewer(object):
+    def __init__(
+        self,
+        volumes,
+        layout="overlay",
+        cmaps=None,
+        alphas=None,
+        names=None,
+        data_order="zyx",
+        cache_bytes=DEFAULT_CACHE_BYTES,
+        prefetch=4,
+        threads=None,
+        **kwargs
+    ):
+        """
+        Class used to view several datasets of the same spatial shape, e.g. raw data, a segmentation and predictions,
+        as image slices scrolled in lockstep: either overlaid, or side by side in panels with linked zoom and pan.
+
+        Slices of every volume are read through one pool of threads and cached within one memory budget,
+        so that the slice at a new index is read from all volumes concurrently, and slices ahead of it are
+        prefetched for all volumes in the background.
+
+        Parameters
+        ----------
+        volumes : sequence of array-like or Pyramid
+            Anything with a numpy-like slicing interface, in 3 spatial dimensions and up to 4 colour channels,
+            all with the same spatial shape. Only the finest level of a Pyramid is displayed.
+        layout : {"overlay", "tile"}
+            Whether to draw the volumes over each other in order, or in a row of panels (default "overlay")
+        cmaps : sequence, optional
+            ``cmap`` of each volume, as for DataViewer, e.g. a ``LabelRenderer`` for label volumes.
+            Default ``'gray'`` for 3D volumes.
+        alphas : sequence of float, optional
+            Opacity of each volume when overlaid. Default opaque for the first and 0.5 for the rest.
+            Label volumes are transparent at their background label.
+        names : sequence of str, optional
+            Shown in the title of each panel when tiled
+        data_order : str
+            Permutation of ``'zyx'`` used for axis labelling (data is not transposed). Default ``'zyx'``
+        cache_bytes : int
+            Memory budget for slices of all volumes (default 256MiB). Slices of numpy arrays are not cached.
+        prefetch : int
+            How many slices ahead of the current one to read in the background (default 4)
+        threads : int, optional
+            Number of threads reading slices of all volumes. Default two per volume.
+        kwargs
+            Passed to ``matplotlib.pyplot.imshow``; ``vmin`` and ``vmax`` apply to every volume with a colormap.
+        """
+        volumes = [v[0] if isinstance(v, Pyramid) else v for v in volumes]
+        if not volumes:
+            raise ValueError("No volumes given")
+        if layout not in LAYOUTS:
+            raise ValueError(
+                "layout must be one of {}, got '{}'".format(LAYOUTS, layout)
+            )
+        if not all(dim in data_order for dim in "zyx"):
+            raise ValueError("Data order must include z, y and x dimensions")
+        shapes = {tuple(v.shape[:3]) for v in volumes}
+        if len(shapes) > 1:
+            raise ValueError(
+                "Volumes must have the same spatial shape, got {}".format(
+                    sorted(shapes)
+                )
+            )
+
+        n = len(volumes)
+        cmaps = [None] * n if cmaps is None else list(cmaps)
+        if alphas is None:
+            alphas = [1.0] + [DEFAULT_ALPHA] * (n - 1)
+        names = [None] * n if names is None else list(names)
+        if not len(cmaps) == len(alphas) == len(names) == n:
+            raise ValueError("cmaps, alphas and names must have one item per volume")
+
+        vmin, vmax = kwargs.pop("vmin", None), kwargs.pop("vmax", None)
+        self.layers = [
+            _Layer(volume, cmap, alpha, name, vmin, vmax)
+            for volume, cmap, alpha, name in zip(volumes, cmaps, alphas, names)
+        ]
+        self.layout = layout
+        self.data_order = data_order
+        self.slices = volumes[0].shape[0]
+        self.idx = 0
+        self.direction = 1
+        self.owns_volumes = False
+        self.title_formatstr = "{} = {{}} (last = {})".format(
+            data_order[0], self.slices - 1
+        )
+
+        cached = [not isinstance(v, np.ndarray) for v in volumes]
+        self._cache = SliceCache(cache_bytes) if cache_bytes and any(cached) else None
+        self._executor = None
+        self._prefetchers = [None] * n
+        if self._cache is not None:
+            self._executor = ThreadPoolExecutor(max_workers=threads or 2 * n)
+            for i, layer in enumerate(self.layers):
+                if not cached[i]:
+                    continue
+                self._prefetchers[i] = Prefetcher(
+                    layer.volume.__getitem__,
+                    self.slices,
+                    self._cache,
+                    ahead=prefetch,
+                    behind=max(prefetch // 4, 1) if prefetch else 0,
+                    namespace=i,
+                    executor=self._executor,
+                )
+        self._rgba = None
+
+        if layout == "overlay":
+            self.fig, ax = plt.subplots(1, 1)
+            self.axes = [ax]
+        else:
+            self.fig, axes = plt.subplots(1, n, sharex=True, sharey=True, squeeze=False)
+            self.axes = list(axes[0])
+        images = self._render(self._planes())
+        self.images = [ax.imshow(image, **kwargs) for ax, image in zip(self.axes, images)]
+        for ax in self.axes:
+            ax.set_ylabel(data_order[1])
+            ax.set_xlabel(data_order[2])
+
+        self._update(read=False)
+        self.fig.canvas.mpl_connect("scroll_event", self._onscroll)
+        self.fig.canvas.mpl_connect("close_event", self._onclose)
+
+    @property
+    def volumes(self):
+        return [layer.volume for layer in self.layers]
+
+    def _planes(self):
+        """The current slice of every volume, reading those which are not cached concurrently"""
+        idx = self.idx
+        planes = [None] * len(self.layers)
+        futures = dict()
+        for i, prefetcher in enumerate(self._prefetchers):
+            if prefetcher is not None:
+                planes[i] = prefetcher.get(idx)
+                if planes[i] is None:
+                    futures[i] = prefetcher.request(idx)
+        for i, layer in enumerate(self.layers):
+            if i in futures:
+                planes[i] = futures[i].result()
+            elif planes[i] is None:
+                planes[i] = layer.volume[idx]
+        for prefetcher in self._prefetchers:
+            if prefetcher is not None:
+                prefetcher.prefetch(idx, self.direction)
+        return [np.asarray(plane) for plane in planes]
+
+    def _render(self, planes):
+        """One RGBA image per panel"""
+        rendered = [layer.render(plane) for layer, plane in zip(self.layers, planes)]
+        if self.layout == "tile":
+            return rendered
+
+        shape = rendered[0].shape[:2] + (4,)
+        if self._rgba is None or self._rgba.shape != shape:
+            self._rgba = np.empty(shape, dtype=np.float32)
+        out = self._rgba
+        out[:] = 0
+        for layer, plane, rgba in zip(self.layers, planes, rendered):
+            alpha = rgba[..., 3:].astype(np.float32) * (layer.alpha / 255)
+            mask = layer.transparent(plane)
+            if mask is not None:
+                alpha[mask] = 0
+            out *= 1 - alpha
+            out += alpha * rgba
+        out[..., 3] = 255
+        return [out.astype(np.uint8)]
+
+    def _update(self, read=True):
+        with timed("viewer.update"):
+            if read:
+                with timed("viewer.slice"):
+                    planes = self._planes()
+                with timed("viewer.render"):
+                    for im, image in zip(self.images, self._render(planes)):
+                        im.set_data(image)
+            title = self.title_formatstr.format(self.idx)
+            for ax, layer in zip(self.axes, self.layers):
+                if self.layout == "tile" and layer.name:
+                    ax.set_title("{}: {}".format(layer.name, title))
+                else:
+                    ax.set_title(title)
+            with timed("viewer.draw"):
+                self.fig.canvas.draw_idle()
+
+    def _onscroll(self, event):
+        if event.button == "up" and self.idx < self.slices - 1:
+            self.idx += 1
+            self.direction = 1
+        elif event.button == "down" and self.idx > 0:
+            self.idx -= 1
+            self.direction = -1
+        else:
+            return
+        logger.debug("Scrolling to %s", self.idx)
+        self._update()
+
+    def show(self):
+        """Show the viewer. Note that the viewer will no longer scroll if the script ends: use ``plt.show`` for that"""
+        self.fig.show()
+
+    def cache_info(self):
+        """CacheInfo of the slice cache shared by all volumes, or None if slices are not cached"""
+        if self._cache is None:
+            return None
+        return self._cache.info()
+
+    def close(self):
+        """
+        Stop prefetching slices,
+        and close the volumes if this viewer owns them (e.g. lazy volumes opened by ``from_files``)
+        """
+        for prefetcher in self._prefetchers:
+            if prefetcher is not None:
+                prefetcher.close()
+        self._prefetchers = [None] * len(self.layers)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._cache is not None:
+            logger.info("Slice cache: %s", self.cache_info())
+            self._cache.clear()
+        if self.owns_volumes:
+            for volume in self.volumes:
+                if hasattr(volume, "close"):
+                    volume.close()
+
+    def _onclose(self, event):
+        self.close()
+
+    @classmethod
+    def from_files(
+        cls,
+        paths,
+        internal_paths=None,
+        offset=None,
+        shape=None,
+        ftype=None,
+        lazy=False,
+        file_kwargs=None,
+        **kwargs
+    ):
+        """
+        Instantiate a MultiViewer from paths to files in a variety of formats.
+
+        Parameters are as for ``DataViewer.from_file``, and apply to every file, except:
+
+        Parameters
+        ----------
+        paths : sequence of str or PathLike
+        internal_paths : sequence of str, optional
+            Internal path of the dataset in each file, for file types which need it
+        max_memory : int, optional
+            Budget in bytes for reading each volume into memory. Volumes which would exceed it are opened
+            as with ``lazy`` if their format allows; otherwise every volume is read with the same larger step,
+            the smallest with which each fits the budget, so that their shapes still match.
+        file_kwargs : sequence of dict, optional
+            For each file, ``ftype`` and FileReader options (e.g. ``dtype`` and ``volume_shape``)
+            which apply to it alone, overriding those given for every file
+        kwargs
+            Other keyword arguments are passed to the MultiViewer constructor after ``volumes``
+
+        Returns
+        -------
+        MultiViewer
+        """
+        if internal_paths is None:
+            internal_paths = [None] * len(paths)
+        if len(internal_paths) != len(paths):
+            raise ValueError("internal_paths must have one item per path")
+        if file_kwargs is None:
+            file_kwargs = [dict() for _ in paths]
+        if len(file_kwargs) != len(paths):
+            raise ValueError("file_kwargs must have one item per path")
+        shared = pop_reader_kwargs(kwargs)
+
+        readers = []
+        for path, internal_path, own in zip(paths, internal_paths, file_kwargs):
+            options = dict(shared, ftype=ftype)
+            options.update(own)
+            file_ftype = options.pop("ftype")
+            reader = FileReader(
+                path, offset=offset, shape=shape, internal_path=internal_path, **options
+            )
+            readers.append((reader, file_ftype))
+
+        opened = [lazy] * len(readers)
+        if not lazy:
+            # each reader would otherwise choose its own step, and the volumes' shapes would differ
+            factor = max(
+                (
+                    reader.memory_factor(file_ftype)
+                    for reader, file_ftype in readers
+                    if not reader.opens_lazily(file_ftype)
+                ),
+                default=1,
+            )
+            for idx, (reader, file_ftype) in enumerate(readers):
+                reader.fit_to_memory(file_ftype, factor)
+                if not reader.fits_in_memory(file_ftype) and reader.opens_lazily(file_ftype):
+                    logger.warning("%s is larger than the memory budget, reading it lazily", reader.path)
+                    opened[idx] = True
+
+        volumes = []
+        try:
+            for (reader, file_ftype), open_lazily in zip(readers, opened):
+                volumes.append(
+                    reader.open(file_ftype) if open_lazily else reader.read(file_ftype)
+                )
+            mv = MultiViewer(volumes, **kwargs)
+        except Exception:
+            for volume in volumes:
+                if hasattr(volume, "close"):
+                    volume.close()
+            raise
+        mv.owns_volumes = any(opened)
+        return mv
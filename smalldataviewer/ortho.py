@@ -0,0 +1,341 @@
+import logging
+
+import numpy as np
+
+from smalldataviewer.cache import (
+    DEFAULT_CACHE_BYTES,
+    SliceCache,
+    ChunkedDataset,
+)
+from smalldataviewer.ext import LazyModule
+from smalldataviewer.files import FileReader, pop_reader_kwargs
+from smalldataviewer.pyramid import Pyramid
+from smalldataviewer.render import LabelRenderer, LUTRenderer, is_lookup_colormap
+from smalldataviewer.viewer import display_cmap
+
+__all__ = ["OrthoViewer", "AccessPlanner"]
+
+
+logger = logging.getLogger(__name__)
+
+plt = LazyModule("matplotlib.pyplot")
+
+# reads from memory-mapped files touch whole pages, so planes along the contiguous axis are read a page's width at a time
+PAGE_BYTES = 4096
+
+# (row dimension, column dimension) of the panel showing planes normal to each dimension;
+# the panel normal to dimension 2 is transposed so that it shares its rows with the panel normal to dimension 0
+PANEL_DIMS = {0: (1, 2), 1: (0, 2), 2: (1, 0)}
+
+
+class AccessPlanner:
+    def __init__(self, volume, cache_bytes=DEFAULT_CACHE_BYTES):
+        """
+        Read 2D planes normal to any of the 3 spatial dimensions of a volume,
+        touching as little of its backing store as its layout allows.
+
+        Planes are read as part of a slab along their normal which is aligned to the unit in which the
+        backing store is read: chunks of HDF5, N5 and zarr datasets, pages of memory-mapped arrays,
+        or whole frames of image stacks. Slabs are kept in a separate cache for each orientation,
+        so that scrolling through neighbouring planes in one orientation does not evict the others.
+        Slabs which would take more than half of their cache are not read; the plane is read directly.
+
+        Parameters
+        ----------
+        volume : array-like
+            e.g. a np.ndarray or a LazyArray
+        cache_bytes : int
+            Memory budget for the slab caches of all orientations. 0 to read every plane directly.
+        """
+        self.volume = volume
+        self.shape = tuple(volume.shape[:3])
+        self.offset = tuple(getattr(volume, "offset", (0, 0, 0))[:3])
+        self.step = tuple(getattr(volume, "step", (1, 1, 1))[:3])
+        self.itemsize = np.dtype(volume.dtype).itemsize * int(
+            np.prod(volume.shape[3:], dtype=np.int64)
+        )
+        self.depths = [
+            max(1, min(depth, n)) for depth, n in zip(self._plan(), self._source.shape[:3])
+        ]
+        logger.debug("Reading slabs of depths %s along each dimension", self.depths)
+
+        in_memory = isinstance(self._source, np.ndarray) and not isinstance(
+            self._source, np.memmap
+        )
+        self.caches = [
+            SliceCache(cache_bytes // 3) if cache_bytes and not in_memory else None
+            for _ in range(3)
+        ]
+
+    @property
+    def _source(self):
+        return getattr(self.volume, "source", self.volume)
+
+    def _plan(self):
+        """Depth of the slab to read along each dimension"""
+        source = self._source
+        if isinstance(source, np.memmap):
+            strides = [abs(s) for s in source.strides[:3]]
+            depths = [1, 1, 1]
+            fastest = int(np.argmin(strides))
+            depths[fastest] = max(1, PAGE_BYTES // max(strides[fastest], 1))
+            return depths
+        if isinstance(source, np.ndarray):
+            # indexing in memory is a view in any orientation
+            return [1, 1, 1]
+
+        chunks = getattr(source, "chunks", None)
+        if chunks:
+            depths = [int(c) for c in chunks[:3]]
+            if isinstance(source, ChunkedDataset):
+                # planes normal to dimension 0 are already read in cached chunk-aligned slabs
+                depths[0] = 1
+            return depths
+        # otherwise, assume that the backing store decodes whole planes normal to dimension 0, like an image stack
+        return [1] + [int(n) for n in source.shape[1:3]]
+
+    def _slab_bounds(self, axis, idx):
+        """
+        Start and stop, in ROI coordinates, of the slab along ``axis`` containing ``idx``:
+        the planes of the ROI which lie in the same chunk of the source.
+        """
+        depth, offset, step = self.depths[axis], self.offset[axis], self.step[axis]
+        chunk_start = (offset + idx * step) // depth * depth
+        # first ROI index at or after each end of the chunk, in source coordinates
+        start = -(-(chunk_start - offset) // step)
+        stop = -(-(chunk_start + depth - offset) // step)
+        return max(start, 0), min(stop, self.shape[axis])
+
+    def read_plane(self, axis, idx):
+        """
+        Read the plane at ``idx`` along ``axis``.
+
+        Returns
+        -------
+        np.ndarray
+            2D, or 3D with colour channels last, with the remaining spatial dimensions in order
+        """
+        key = [slice(None)] * 3
+        cache = self.caches[axis]
+        if cache is None or self.depths[axis] == 1:
+            key[axis] = idx
+            return np.asarray(self.volume[tuple(key)])
+
+        start, stop = self._slab_bounds(axis, idx)
+        plane_size = int(np.prod(self.shape, dtype=np.int64)) // max(self.shape[axis], 1)
+        if (stop - start) * plane_size * self.itemsize > cache.max_bytes // 2:
+            key[axis] = idx
+            return np.asarray(self.volume[tuple(key)])
+
+        slab = cache.get(start)
+        if slab is None:
+            key[axis] = slice(start, stop)
+            logger.debug("Reading slab %s:%s along dimension %s", start, stop, axis)
+            slab = np.asarray(self.volume[tuple(key)])
+            cache.put(start, slab)
+        return np.take(slab, idx - start, axis=axis)
+
+    def cache_info(self):
+        """CacheInfo of each orientation's slab cache, or None where slabs are not cached"""
+        return [None if cache is None else cache.info() for cache in self.caches]
+
+
+class OrthoViewer(object):
+    def __init__(
+        self, volume, data_order="zyx", cmap=None, cache_bytes=DEFAULT_CACHE_BYTES, **kwargs
+    ):
+        """
+        Class used to view a dataset with 3 spatial dimensions as three orthogonal planes through a shared cursor.
+
+        Scrolling over a panel moves the cursor along the dimension normal to it;
+        clicking on a panel moves the cursor to that point.
+        Planes are read through an AccessPlanner, so that panels normal to any dimension are read efficiently
+        from chunked or memory-mapped data without transposing the volume.
+
+        Parameters
+        ----------
+        volume : array-like or Pyramid
+            Anything with a numpy-like slicing interface, in 3 spatial dimensions and up to 4 colour channels.
+            Only the finest level of a Pyramid is displayed.
+        data_order : str
+            Permutation of ``'zyx'`` used for axis labelling (data is not transposed). Default ``'zyx'``
+        cmap : str
+            As for DataViewer
+        cache_bytes : int
+            Memory budget for the slabs read for the three orientations (default 256MiB)
+        kwargs
+            Passed to ``matplotlib.pyplot.imshow``.
+        """
+        if isinstance(volume, Pyramid):
+            volume = volume[0]
+        if not all(dim in data_order for dim in "zyx"):
+            raise ValueError("Data order must include z, y and x dimensions")
+        self.volume = volume
+        self.data_order = data_order
+
+        cmap = display_cmap(volume, cmap)
+
+        if is_lookup_colormap(cmap):
+            vmin, vmax = kwargs.pop("vmin", None), kwargs.pop("vmax", None)
+            # one renderer per panel, as each reuses its output buffer
+            self._renderers = [LUTRenderer(cmap, vmin, vmax) for _ in range(3)]
+        elif isinstance(cmap, LabelRenderer):
+            self._renderers = [cmap.copy() for _ in range(3)]
+        else:
+            self._renderers = [cmap] * 3
+        self.cmap = cmap
+
+        self.planner = AccessPlanner(volume, cache_bytes)
+        self.cursor = [n // 2 for n in volume.shape[:3]]
+        self.owns_volume = False
+
+        self.fig, axes = plt.subplots(2, 2)
+        self.axes = [axes[0][0], axes[1][0], axes[0][1]]
+        axes[1][1].set_axis_off()
+
+        self.images = []
+        self.lines = []
+        for axis, ax in enumerate(self.axes):
+            row_dim, col_dim = PANEL_DIMS[axis]
+            self.images.append(ax.imshow(self._render(axis), **kwargs))
+            self.lines.append(
+                (
+                    ax.axhline(self.cursor[row_dim], color="yellow", linewidth=0.5),
+                    ax.axvline(self.cursor[col_dim], color="yellow", linewidth=0.5),
+                )
+            )
+            ax.set_ylabel(data_order[row_dim])
+            ax.set_xlabel(data_order[col_dim])
+            if isinstance(cmap, LabelRenderer):
+                ax.format_coord = self._label_coord_formatter(axis)
+
+        self._update(())
+        self.fig.canvas.mpl_connect("scroll_event", self._onscroll)
+        self.fig.canvas.mpl_connect("button_press_event", self._onclick)
+        self.fig.canvas.mpl_connect("close_event", self._onclose)
+
+    def _plane(self, axis):
+        plane = self.planner.read_plane(axis, self.cursor[axis])
+        if PANEL_DIMS[axis][0] > PANEL_DIMS[axis][1]:
+            plane = np.swapaxes(plane, 0, 1)
+        return plane
+
+    def _render(self, axis):
+        return self._renderers[axis](self._plane(axis))
+
+    def _label_coord_formatter(self, axis):
+        renderer = self._renderers[axis]
+
+        def format_coord(x, y):
+            col, row = int(np.floor(x + 0.5)), int(np.floor(y + 0.5))
+            return "x={}, y={}, label={}".format(col, row, renderer.label_at(row, col))
+
+        return format_coord
+
+    def _update(self, changed):
+        """Re-read the panels normal to the ``changed`` dimensions, and move the cursor on every panel"""
+        for axis in changed:
+            self.images[axis].set_data(self._render(axis))
+        for axis, ax in enumerate(self.axes):
+            row_dim, col_dim = PANEL_DIMS[axis]
+            hline, vline = self.lines[axis]
+            hline.set_ydata([self.cursor[row_dim]] * 2)
+            vline.set_xdata([self.cursor[col_dim]] * 2)
+            ax.set_title(
+                "{} = {} (last = {})".format(
+                    self.data_order[axis], self.cursor[axis], self.volume.shape[axis] - 1
+                )
+            )
+        self.fig.canvas.draw_idle()
+
+    def _panel_axis(self, event):
+        try:
+            return self.axes.index(event.inaxes)
+        except ValueError:
+            return None
+
+    def _onscroll(self, event):
+        axis = self._panel_axis(event)
+        if axis is None:
+            return
+        step = {"up": 1, "down": -1}.get(event.button)
+        if step is None:
+            return
+        idx = self.cursor[axis] + step
+        if not 0 <= idx < self.volume.shape[axis]:
+            return
+        logger.debug("Moving cursor along dimension %s to %s", axis, idx)
+        self.cursor[axis] = idx
+        self._update((axis,))
+
+    def _onclick(self, event):
+        axis = self._panel_axis(event)
+        if axis is None or event.button != 1 or event.xdata is None:
+            return
+        changed = []
+        for dim, value in zip(PANEL_DIMS[axis], (event.ydata, event.xdata)):
+            idx = min(max(int(round(value)), 0), self.volume.shape[dim] - 1)
+            if idx != self.cursor[dim]:
+                self.cursor[dim] = idx
+                changed.append(dim)
+        logger.debug("Moving cursor to %s", self.cursor)
+        self._update(changed)
+
+    def show(self):
+        """Show the viewer. Note that the viewer will no longer respond if the script ends: use ``plt.show`` for that"""
+        self.fig.show()
+
+    def close(self):
+        """Close the volume if this viewer owns it (e.g. a lazy volume opened by ``from_file``)"""
+        logger.info("Slab caches: %s", self.planner.cache_info())
+        for cache in self.planner.caches:
+            if cache is not None:
+                cache.clear()
+        if self.owns_volume and hasattr(self.volume, "close"):
+            self.volume.close()
+
+    def _onclose(self, event):
+        self.close()
+
+    @classmethod
+    def from_file(
+        cls,
+        path,
+        offset=None,
+        shape=None,
+        internal_path=None,
+        ftype=None,
+        lazy=False,
+        **kwargs
+    ):
+        """
+        Instantiate an OrthoViewer from a path to a file in a variety of formats.
+
+        Parameters are as for ``DataViewer.from_file``; other ``kwargs`` are passed to the OrthoViewer constructor.
+
+        Returns
+        -------
+        OrthoViewer
+        """
+        reader = FileReader(
+            path,
+            offset=offset,
+            shape=shape,
+            internal_path=internal_path,
+            **pop_reader_kwargs(kwargs)
+        )
+        if not lazy and not reader.fits_in_memory(ftype) and reader.opens_lazily(ftype):
+            logger.warning("%s is larger than the memory budget, reading it lazily", path)
+            lazy = True
+
+        if not lazy:
+            ov = OrthoViewer(reader.read(ftype), **kwargs)
+        else:
+            vol = reader.open(ftype)
+            try:
+                ov = OrthoViewer(vol, **kwargs)
+            except Exception:
+                vol.close()
+                raise
+            ov.owns_volume = True
+        return ov
@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+__all__ = ["Profiler", "add_hook", "remove_hook", "timed"]
+
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 95, 99)
+
+_hooks = []
+
+
+def add_hook(fn):
+    """
+    Call ``fn(stage, seconds, nbytes)`` whenever an instrumented stage completes, from whichever thread ran it.
+
+    Stages include ``"reader.read"`` and ``"reader.open"`` (FileReader), ``"lazy.read"`` (indexing a LazyArray),
+    ``"chunks.slab"`` (reading a chunk-aligned slab), ``"sequence.decode"`` (decoding one file of an image sequence),
+    ``"projection.block"`` (reading and reducing a block for a projection), and ``"viewer.slice"``,
+    ``"viewer.render"``, ``"viewer.draw"`` and ``"viewer.update"`` (each stage of a DataViewer update).
+    ``nbytes`` is the size of the data produced by the stage, or 0 if not applicable.
+    """
+    _hooks.append(fn)
+
+
+def remove_hook(fn):
+    try:
+        _hooks.remove(fn)
+    except ValueError:
+        pass
+
+
+class _Timing(object):
+    __slots__ = ("stage", "nbytes", "_start")
+
+    def __init__(self, stage, nbytes=0):
+        self.stage = stage
+        self.nbytes = nbytes
+        self._start = None
+
+    def __enter__(self):
+        if _hooks:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._start is None or exc_type is not None:
+            return
+        seconds = time.perf_counter() - self._start
+        for hook in list(_hooks):
+            try:
+                hook(self.stage, seconds, self.nbytes)
+            except Exception:
+                logger.exception("Profiling hook %s failed", hook)
+
+
+def timed(stage, nbytes=0):
+    """
+    Context manager which reports the time taken by its block to any hooks added with ``add_hook``.
+    Set ``nbytes`` on the returned object to report the size of the data produced.
+    If there are no hooks, the clock is not read.
+    """
+    return _Timing(stage, nbytes)
+
+
+class Profiler(object):
+    def __init__(self):
+        """
+        Profiling hook which collects the times and bytes of every instrumented stage, e.g.
+
+        >>> with Profiler() as profiler:
+        ...     DataViewer.from_file(...)
+        >>> print(profiler.report())
+        """
+        self._seconds = defaultdict(list)
+        self._nbytes = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def __call__(self, stage, seconds, nbytes=0):
+        with self._lock:
+            self._seconds[stage].append(seconds)
+            self._nbytes[stage] += nbytes
+
+    def start(self):
+        add_hook(self)
+        return self
+
+    def stop(self):
+        remove_hook(self)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def summary(self):
+        """
+        Returns
+        -------
+        dict
+            For each stage, its count, total and mean time, time percentiles (as ``"p50"`` etc.), and bytes produced.
+            Times are in milliseconds.
+        """
+        with self._lock:
+            samples = {stage: np.array(s) * 1000 for stage, s in self._seconds.items()}
+            nbytes = dict(self._nbytes)
+        out = dict()
+        for stage in sorted(samples):
+            ms = samples[stage]
+            stats = {
+                "count": len(ms),
+                "total": float(ms.sum()),
+                "mean": float(ms.mean()),
+            }
+            for q in PERCENTILES:
+                stats["p{}".format(q)] = float(np.percentile(ms, q))
+            stats["bytes"] = nbytes[stage]
+            out[stage] = stats
+        return out
+
+    def report(self):
+        """Summary as a table"""
+        columns = ["count", "mean"] + ["p{}".format(q) for q in PERCENTILES]
+        header = "{:<16}".format("stage (ms)") + "".join(
+            "{:>10}".format(c) for c in columns + ["MiB"]
+        )
+        lines = [header]
+        for stage, stats in self.summary().items():
+            lines.append(
+                "{:<16}{:>10}".format(stage, stats["count"])
+                + "".join("{:>10.2f}".format(stats[c]) for c in columns[1:])
+                + "{:>10.1f}".format(stats["bytes"] / 1024 ** 2)
+            )
+        return "\n".join(lines)
@@ -0,0 +1,199 @@
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+
+import numpy as np
+
+from smalldataviewer.profiling import timed
+
+__all__ = ["PROJECTIONS", "project", "project_slab"]
+
+
+logger = logging.getLogger(__name__)
+
+PROJECTIONS = ("max", "min", "mean", "sum")
+
+DEFAULT_BLOCK_BYTES = 32 * 1024 ** 2
+
+# blocks in flight per worker: enough to keep the workers busy without reading far ahead of the reductions
+PENDING_PER_WORKER = 2
+
+
+def _check_method(method):
+    if method not in PROJECTIONS:
+        raise ValueError(
+            "projection must be one of {}, got '{}'".format(PROJECTIONS, method)
+        )
+
+
+def _accumulator_dtype(dtype, method):
+    """Type in which to reduce and combine partial results, so that sums do not overflow"""
+    dtype = np.dtype(dtype)
+    if method in ("max", "min"):
+        return dtype
+    if method == "mean" or dtype.kind in "fc":
+        return np.dtype(np.complex128 if dtype.kind == "c" else np.float64)
+    return np.dtype(np.uint64 if dtype.kind == "u" else np.int64)
+
+
+def _combine(method):
+    """ufunc which combines two partial results"""
+    if method == "max":
+        return np.maximum
+    if method == "min":
+        return np.minimum
+    return np.add
+
+
+def _identity(dtype, method):
+    """Initial value of the output, which any value combines with to give that value"""
+    if method in ("sum", "mean"):
+        return 0
+    if dtype.kind == "b":
+        return method == "min"
+    if dtype.kind in "fc":
+        return -np.inf if method == "max" else np.inf
+    info = np.iinfo(dtype)
+    return info.min if method == "max" else info.max
+
+
+def _reduce(block, method, axis, dtype):
+    if method == "max":
+        return block.max(axis=axis)
+    if method == "min":
+        return block.min(axis=axis)
+    return block.sum(axis=axis, dtype=dtype)
+
+
+def _chunks(volume):
+    """Chunk shape of the backing store of ``volume``, or None if it is not chunked"""
+    source = getattr(volume, "source", volume)
+    chunks = getattr(source, "chunks", None)
+    if not chunks or isinstance(source, np.ndarray):
+        return None
+    return tuple(int(c) for c in chunks)
+
+
+def block_shape(shape, itemsize, chunks=None, block_bytes=DEFAULT_BLOCK_BYTES):
+    """
+    Shape of the blocks in which to read a volume: whole chunks (or single elements, if it is not chunked),
+    extended by whole chunks along the last dimensions first until they would exceed ``block_bytes``.
+    """
+    if chunks is None:
+        chunks = (1,) * len(shape)
+    block = [max(1, min(c, n)) for c, n in zip(chunks, shape)]
+    for dim in reversed(range(len(shape))):
+        other = int(np.prod(block, dtype=np.int64)) // block[dim] * itemsize
+        n_chunks = max(1, block_bytes // max(other * block[dim], 1))
+        block[dim] = min(block[dim] * n_chunks, shape[dim])
+        if block[dim] < shape[dim]:
+            break
+    return tuple(block)
+
+
+def iter_blocks(shape, block, offset=None):
+    """
+    Yield the slicings of the blocks tiling an array of ``shape``.
+    Block boundaries are aligned to multiples of ``block`` in the coordinates of the backing store,
+    i.e. after adding ``offset``, so that each block covers whole chunks where possible.
+    """
+    if offset is None:
+        offset = (0,) * len(shape)
+    bounds = []
+    for n, b, o in zip(shape, block, offset):
+        edges = [0] + list(range(b - o % b, n, b)) + [n]
+        bounds.append([slice(start, stop) for start, stop in zip(edges, edges[1:]) if stop > start])
+    return product(*bounds)
+
+
+def project(
+    volume, method="max", axis=0, workers=None, block_bytes=DEFAULT_BLOCK_BYTES
+):
+    """
+    Project a volume along one of its spatial dimensions, e.g. a maximum-intensity projection.
+
+    The volume is read in chunk-aligned blocks of roughly ``block_bytes``, which are reduced in a pool of threads
+    and combined into the output as they complete, so that memory use is bounded by the size of the output
+    plus a few blocks per worker, however large the volume.
+
+    Parameters
+    ----------
+    volume : array-like
+        e.g. a np.ndarray or a LazyArray, with up to 3 spatial dimensions followed by any colour channels
+    method : {"max", "min", "mean", "sum"}
+    axis : int
+        Spatial dimension to project along (default 0)
+    workers : int, optional
+        Number of threads reading and reducing blocks. Default one per CPU.
+    block_bytes : int
+        Approximate size of each block read
+
+    Returns
+    -------
+    np.ndarray
+        ``volume`` without dimension ``axis``. Maximum and minimum projections have the type of ``volume``;
+        sums are accumulated as 64-bit integers or floats, and means are float64.
+    """
+    _check_method(method)
+    shape = tuple(volume.shape)
+    if not 0 <= axis < min(len(shape), 3):
+        raise ValueError("Cannot project along dimension {}".format(axis))
+    if not shape[axis]:
+        raise ValueError("Cannot project along empty dimension {}".format(axis))
+
+    dtype = np.dtype(volume.dtype)
+    acc_dtype = _accumulator_dtype(dtype, method)
+    combine = _combine(method)
+    block = block_shape(shape, dtype.itemsize, _chunks(volume), block_bytes)
+    offset = tuple(getattr(volume, "offset", ())) + (0,) * len(shape)
+    out_shape = shape[:axis] + shape[axis + 1 :]
+    out = np.full(out_shape, _identity(acc_dtype, method), dtype=acc_dtype)
+    logger.debug("Projecting %s along dimension %s in blocks of %s", method, axis, block)
+
+    def reduce_block(key):
+        with timed("projection.block") as timing:
+            data = np.asarray(volume[key])
+            timing.nbytes = data.nbytes
+            return key, _reduce(data, method, axis, acc_dtype)
+
+    def accumulate(key, partial):
+        region = out[key[:axis] + key[axis + 1 :]]
+        combine(region, partial, out=region)
+
+    keys = iter_blocks(shape, block, offset[: len(shape)])
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        for key in keys:
+            accumulate(*reduce_block(key))
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for key in keys:
+                pending.append(executor.submit(reduce_block, key))
+                if len(pending) >= workers * PENDING_PER_WORKER:
+                    accumulate(*pending.popleft().result())
+            while pending:
+                accumulate(*pending.popleft().result())
+
+    if method == "mean":
+        out /= shape[axis]
+    return out
+
+
+def project_slab(slab, method="max", dtype=None):
+    """
+    Project a stack of planes, already in memory, along dimension 0.
+    If ``dtype`` is given, the result is rounded (for integer types) and cast to it.
+    """
+    _check_method(method)
+    slab = np.asarray(slab)
+    result = _reduce(slab, method, 0, _accumulator_dtype(slab.dtype, method))
+    if method == "mean":
+        result = result / len(slab)
+    if dtype is not None and result.dtype != dtype:
+        if np.dtype(dtype).kind in "iub" and result.dtype.kind in "fc":
+            result = np.rint(result)
+        result = result.astype(dtype)
+    return result
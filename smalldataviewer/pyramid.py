@@ -0,0 +1,207 @@
+import logging
+import re
+
+import numpy as np
+
+from smalldataviewer.lazy import normalise_key
+
+__all__ = ["Pyramid", "DownsampledVolume", "downsample_plane"]
+
+
+logger = logging.getLogger(__name__)
+
+# names of datasets in a multiscale group, e.g. "s0", "s1" (N5 viewer) or "0", "1" (OME-zarr)
+SCALE_NAME = re.compile(r"^s?(\d+)$")
+
+# on-the-fly pyramids are built until the coarsest level is no larger than this in either dimension
+MIN_LEVEL_SIZE = 512
+
+
+def _block_starts(n, factor):
+    return np.arange(0, n, factor)
+
+
+def downsample_mean(plane, factor):
+    """Block mean over the first two axes, keeping the dtype; partial blocks at the edges are averaged as they are"""
+    out = plane
+    for axis in (0, 1):
+        starts = _block_starts(plane.shape[axis], factor)
+        counts = np.diff(np.append(starts, plane.shape[axis]))
+        out = np.add.reduceat(out, starts, axis=axis, dtype=np.float64)
+        out /= np.expand_dims(counts, tuple(i for i in range(out.ndim) if i != axis))
+    if plane.dtype.kind in "iub":
+        out = np.rint(out)
+    return out.astype(plane.dtype, copy=False)
+
+
+def downsample_mode(plane, factor):
+    """Most common value in each block over the first two axes (ties go to the smallest value)"""
+    h, w = plane.shape[:2]
+    pad_h, pad_w = -h % factor, -w % factor
+    if pad_h or pad_w:
+        pad = [(0, pad_h), (0, pad_w)] + [(0, 0)] * (plane.ndim - 2)
+        plane = np.pad(plane, pad, mode="edge")
+    h, w = plane.shape[:2]
+    rest = plane.shape[2:]
+
+    blocks = plane.reshape((h // factor, factor, w // factor, factor) + rest)
+    blocks = np.moveaxis(blocks, 2, 1).reshape(
+        (h // factor, w // factor, factor * factor) + rest
+    )
+    blocks = np.sort(blocks, axis=2)
+
+    # length of the run of equal values ending at each position
+    n = blocks.shape[2]
+    positions = np.arange(n).reshape((1, 1, n) + (1,) * len(rest))
+    run_start = np.zeros(blocks.shape, dtype=np.intp)
+    run_start[:, :, 1:] = np.where(
+        blocks[:, :, 1:] != blocks[:, :, :-1], positions[:, :, 1:], 0
+    )
+    np.maximum.accumulate(run_start, axis=2, out=run_start)
+    run_end = np.argmax(positions - run_start, axis=2)
+    return np.take_along_axis(blocks, np.expand_dims(run_end, 2), axis=2)[:, :, 0]
+
+
+DOWNSAMPLERS = {"mean": downsample_mean, "mode": downsample_mode}
+
+
+def downsample_plane(plane, factor, method="mean"):
+    """
+    Downsample the first two axes of ``plane`` by an integer factor.
+
+    Parameters
+    ----------
+    plane : np.ndarray
+        2D, or 3D with colour channels in the last axis
+    factor : int
+    method : {"mean", "mode"}
+        Block mean for intensity data, block mode for labels
+
+    Returns
+    -------
+    np.ndarray
+    """
+    if factor == 1:
+        return np.asarray(plane)
+    try:
+        downsampler = DOWNSAMPLERS[method]
+    except KeyError:
+        raise ValueError(
+            "Unknown downsampling method '{}', expected one of {}".format(
+                method, sorted(DOWNSAMPLERS)
+            )
+        )
+    return downsampler(np.asarray(plane), factor)
+
+
+class DownsampledVolume:
+    def __init__(self, volume, factor, method="mean"):
+        """
+        Array-like view of ``volume`` downsampled by ``factor`` in dimensions 1 and 2,
+        computed from the full-resolution planes as they are indexed.
+        """
+        self.volume = volume
+        self.factor = factor
+        self.method = method
+        shape = tuple(volume.shape)
+        self.shape = (
+            (shape[0],) + tuple(-(-n // factor) for n in shape[1:3]) + shape[3:]
+        )
+        self.dtype = volume.dtype
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __getitem__(self, key):
+        key = normalise_key(key, self.ndim)
+        z, rest = key[0], key[1:]
+        if isinstance(z, slice):
+            planes = [
+                self._plane(i)[rest] for i in range(*z.indices(self.shape[0]))
+            ]
+            return np.stack(planes) if planes else np.empty((0,), dtype=self.dtype)
+        return self._plane(z)[rest]
+
+    def _plane(self, idx):
+        return downsample_plane(self.volume[idx, ...], self.factor, self.method)
+
+
+def infer_factors(shapes):
+    """Integer downsampling factor of each shape relative to the first, per dimension"""
+    base = shapes[0]
+    return [
+        tuple(max(1, int(round(b / max(s, 1)))) for b, s in zip(base, shape))
+        for shape in shapes
+    ]
+
+
+def scale_names(group):
+    """Names of the scale levels in a multiscale group, finest first, or None if it is not one"""
+    try:
+        keys = list(group.keys())
+    except AttributeError:
+        return None
+    levels = dict()
+    for key in keys:
+        match = SCALE_NAME.match(key)
+        if match:
+            levels[int(match.group(1))] = key
+    if 0 not in levels:
+        return None
+    return [levels[i] for i in sorted(levels)]
+
+
+class Pyramid:
+    def __init__(self, levels, factors=None, handle=None):
+        """
+        A volume at several resolutions, finest first.
+
+        Parameters
+        ----------
+        levels : list of array-like
+        factors : list of tuple of int, optional
+            Downsampling factor of each level relative to the first, per dimension.
+            By default, inferred from the shapes.
+        handle : object, optional
+            Object with a ``close`` method which is closed when this Pyramid is
+        """
+        self.levels = list(levels)
+        if factors is None:
+            factors = infer_factors([level.shape[:3] for level in self.levels])
+        self.factors = [tuple(f) for f in factors]
+        self._handle = handle
+
+    @classmethod
+    def on_the_fly(cls, volume, method="mean", min_size=MIN_LEVEL_SIZE):
+        """Pyramid of power-of-two DownsampledVolumes, computed from ``volume`` as planes are requested"""
+        levels = [volume]
+        factors = [(1, 1, 1)]
+        factor = 2
+        while max(volume.shape[1:3]) / (factor // 2) > min_size:
+            levels.append(DownsampledVolume(volume, factor, method))
+            factors.append((1, factor, factor))
+            factor *= 2
+        return cls(levels, factors)
+
+    def __len__(self):
+        return len(self.levels)
+
+    def __getitem__(self, item):
+        return self.levels[item]
+
+    def choose(self, factor):
+        """Index of the coarsest level downsampled by no more than ``factor`` in dimensions 1 and 2"""
+        best = 0
+        for idx, (_, fy, fx) in enumerate(self.factors):
+            if fy <= factor and fx <= factor:
+                best = idx
+        return best
+
+    def close(self):
+        for level in self.levels:
+            if hasattr(level, "close"):
+                level.close()
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
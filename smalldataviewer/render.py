@@ -0,0 +1,301 @@
+import logging
+
+import numpy as np
+
+from smalldataviewer.ext import LazyModule
+
+__all__ = ["LUTRenderer", "LabelRenderer"]
+
+
+logger = logging.getLogger(__name__)
+
+colors = LazyModule("matplotlib.colors")
+
+# integer types up to this many bytes get a lookup table covering every possible value
+MAX_FULL_LUT_ITEMSIZE = 2
+
+DEFAULT_LABEL_SEED = 8916
+BOUNDARY_RGBA = (0, 0, 0, 255)
+BACKGROUND_RGBA = (0, 0, 0, 255)
+
+
+def is_lookup_colormap(cmap):
+    """Whether ``cmap`` maps values with the standard matplotlib lookup table semantics"""
+    return (
+        isinstance(cmap, colors.Colormap) and type(cmap).__call__ is colors.Colormap.__call__
+    )
+
+
+def extended_palette(cmap):
+    """
+    Colours of ``cmap`` as uint8 RGBA, ordered ``[under, 0, ..., N - 1, over, bad]``,
+    so that the palette index of a colormap index ``i`` clipped to ``[-1, N]`` is ``i + 1``.
+    """
+    n = cmap.N
+    colours = cmap(np.arange(n), bytes=True)
+    under, over = cmap(np.array([-1, n]), bytes=True)
+    bad = cmap(np.array([np.nan]), bytes=True)[0]
+    return np.concatenate([[under], colours, [over], [bad]]).astype(np.uint8)
+
+
+class LUTRenderer:
+    def __init__(self, cmap, vmin=None, vmax=None):
+        """
+        Render 2D arrays to uint8 RGBA through a matplotlib colormap, reusing its output buffers between calls.
+
+        With no colour limits, values are mapped as by ``cmap(values)``: integers are colormap indices,
+        and floats are mapped from [0, 1].
+        With colour limits, values are mapped linearly from [vmin, vmax].
+
+        Integers of up to 16 bits are rendered with a single lookup into a table covering every possible value.
+        Other data are normalised and quantised in place into a reused index buffer.
+
+        Parameters
+        ----------
+        cmap : matplotlib.colors.Colormap
+        vmin, vmax : float, optional
+            Colour limits
+        """
+        self.cmap = cmap
+        self.palette = extended_palette(cmap)
+        self.vmin = vmin
+        self.vmax = vmax
+
+        self._luts = dict()
+        self._rgba = None
+        self._buffers = dict()
+
+    def set_clim(self, vmin=None, vmax=None):
+        """Set the values mapped to the bottom and top of the colormap"""
+        self.vmin = vmin
+        self.vmax = vmax
+        self._luts.clear()
+
+    def _window(self, dtype):
+        """Return (offset, scale) mapping values to colormap indices, or None if values are indices"""
+        if self.vmin is None and self.vmax is None:
+            if dtype.kind in "iub":
+                return None
+            vmin, vmax = 0.0, 1.0
+        else:
+            vmin = 0.0 if self.vmin is None else float(self.vmin)
+            vmax = 1.0 if self.vmax is None else float(self.vmax)
+        scale = self.cmap.N / (vmax - vmin) if vmax != vmin else 0.0
+        return vmin, scale
+
+    def _buffer(self, name, shape, dtype):
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buf
+        return buf
+
+    def _output(self, shape):
+        shape = tuple(shape) + (4,)
+        if self._rgba is None or self._rgba.shape != shape:
+            self._rgba = np.empty(shape, dtype=np.uint8)
+        return self._rgba
+
+    def _full_lut(self, dtype):
+        """Lookup table from every value of a small integer dtype (viewed as unsigned) to RGBA"""
+        try:
+            return self._luts[dtype]
+        except KeyError:
+            pass
+        unsigned = np.dtype("u{}".format(dtype.itemsize))
+        values = np.arange(2 ** (8 * dtype.itemsize), dtype=unsigned).view(dtype)
+        indices = self._palette_indices(values)
+        lut = self.palette[indices]
+        self._luts[dtype] = lut
+        return lut
+
+    def _palette_indices(self, arr, out=None):
+        """Map values to palette indices, writing into ``out`` (intp) and reusing scratch buffers if given"""
+        n = self.cmap.N
+        reuse = out is not None
+        if not reuse:
+            out = np.empty(arr.shape, dtype=np.intp)
+
+        window = self._window(arr.dtype)
+        if window is None:
+            lower = 0 if arr.dtype.kind == "u" else -1
+            np.clip(arr, lower, n, out=out, casting="unsafe")
+            np.add(out, 1, out=out)
+            return out
+
+        offset, scale = window
+        if reuse:
+            scaled = self._buffer("scaled", arr.shape, np.float64)
+            mask = self._buffer("mask", arr.shape, np.bool_)
+        else:
+            scaled = np.empty(arr.shape, dtype=np.float64)
+            mask = np.empty(arr.shape, dtype=np.bool_)
+
+        np.subtract(arr, offset, out=scaled, casting="unsafe")
+        np.multiply(scaled, scale, out=scaled)
+        # as in Colormap.__call__, the top of the range is included in the last colour
+        np.equal(scaled, n, out=mask)
+        np.copyto(scaled, n - 1, where=mask)
+        np.floor(scaled, out=scaled)
+        np.clip(scaled, -1, n, out=scaled)
+        np.isnan(scaled, out=mask)
+        np.copyto(scaled, n + 1, where=mask)
+        np.add(scaled, 1, out=scaled)
+        out[...] = scaled
+        return out
+
+    def __call__(self, arr):
+        arr = np.asarray(arr)
+        out = self._output(arr.shape)
+
+        if arr.dtype.kind in "iub" and arr.dtype.itemsize <= MAX_FULL_LUT_ITEMSIZE:
+            if arr.dtype.kind == "b":
+                arr = arr.view(np.uint8)
+            lut = self._full_lut(arr.dtype)
+            unsigned = np.dtype("u{}".format(arr.dtype.itemsize))
+            np.take(lut, arr.view(unsigned), axis=0, out=out)
+            return out
+
+        indices = self._palette_indices(
+            arr, self._buffer("indices", arr.shape, np.intp)
+        )
+        np.take(self.palette, indices, axis=0, out=out)
+        return out
+
+
+def label_colours(ids, seed=DEFAULT_LABEL_SEED):
+    """
+    Pseudo-random but deterministic uint8 RGBA colour for each label ID, from a hash of the ID,
+    so that a label has the same colour in every slice however it is relabelled.
+    """
+    with np.errstate(over="ignore"):
+        x = np.asarray(ids).astype(np.uint64) + np.uint64(seed)
+        # splitmix64 finaliser
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+    out = np.empty(x.shape + (4,), dtype=np.uint8)
+    for channel in range(3):
+        out[..., channel] = (x >> np.uint64(8 * channel)) & np.uint64(0xFF)
+    out[..., 3] = 255
+    return out
+
+
+def relabel(plane):
+    """
+    Map the (possibly sparse, e.g. 64-bit) label IDs in a plane to dense indices.
+
+    Only the first value of each run of equal values along rows is looked up, so labelled regions cost
+    little more than a comparison per pixel, rather than a sort.
+
+    Returns
+    -------
+    tuple
+        (ids, dense): the sorted unique IDs, and an array of the shape of ``plane`` such that ``ids[dense] == plane``
+    """
+    plane = np.asarray(plane)
+    flat = plane.ravel()
+    if not flat.size:
+        return flat, np.zeros(plane.shape, dtype=np.intp)
+    is_start = np.empty(flat.shape, dtype=bool)
+    is_start[0] = True
+    np.not_equal(flat[1:], flat[:-1], out=is_start[1:])
+    starts = np.flatnonzero(is_start)
+    ids, run_idxs = np.unique(flat[starts], return_inverse=True)
+    lengths = np.diff(np.append(starts, flat.size))
+    return ids, np.repeat(run_idxs.ravel(), lengths).reshape(plane.shape)
+
+
+class LabelRenderer:
+    def __init__(self, seed=DEFAULT_LABEL_SEED, boundaries=False, background=0):
+        """
+        Render 2D arrays of label IDs to uint8 RGBA, giving each label a pseudo-random colour.
+
+        Each plane is relabelled to dense indices, so that colours are looked up from a table with one entry per
+        label in the plane rather than computed per pixel, however large or sparse the IDs.
+        Integers of up to 16 bits are rendered with a single lookup into a table covering every possible value.
+        The dense indices of the most recently rendered plane are kept, so that the label at a pixel can be
+        looked up with ``label_at`` without reading the volume again.
+
+        Parameters
+        ----------
+        seed : int
+            Changes the colour assigned to each label
+        boundaries : bool
+            Whether to draw the boundaries between labels (default False)
+        background : int, optional
+            Label drawn in black (default 0). None to give every label a colour.
+        """
+        self.seed = seed
+        self.boundaries = boundaries
+        self.background = background
+
+        self._luts = dict()
+        self._rgba = None
+        self.ids = None
+        self.dense = None
+
+    def copy(self):
+        """New LabelRenderer with the same settings, and its own output buffer"""
+        return type(self)(self.seed, self.boundaries, self.background)
+
+    def colours(self, ids):
+        """uint8 RGBA colour of each label ID"""
+        out = label_colours(ids, self.seed)
+        if self.background is not None:
+            out[np.asarray(ids) == self.background] = BACKGROUND_RGBA
+        return out
+
+    def _full_lut(self, dtype):
+        try:
+            return self._luts[dtype]
+        except KeyError:
+            pass
+        unsigned = np.dtype("u{}".format(dtype.itemsize))
+        values = np.arange(2 ** (8 * dtype.itemsize), dtype=unsigned).view(dtype)
+        lut = self.colours(values)
+        self._luts[dtype] = lut
+        return lut
+
+    def _output(self, shape):
+        shape = tuple(shape) + (4,)
+        if self._rgba is None or self._rgba.shape != shape:
+            self._rgba = np.empty(shape, dtype=np.uint8)
+        return self._rgba
+
+    def __call__(self, arr):
+        arr = np.asarray(arr)
+        if arr.dtype.kind == "b":
+            arr = arr.view(np.uint8)
+        out = self._output(arr.shape)
+
+        if arr.dtype.kind in "iu" and arr.dtype.itemsize <= MAX_FULL_LUT_ITEMSIZE:
+            # small integers are their own dense indices, into a table over every possible value
+            unsigned = np.dtype("u{}".format(arr.dtype.itemsize))
+            self.ids, self.dense = None, arr
+            np.take(self._full_lut(arr.dtype), arr.view(unsigned), axis=0, out=out)
+        else:
+            self.ids, self.dense = relabel(arr)
+            np.take(self.colours(self.ids), self.dense, axis=0, out=out)
+
+        if self.boundaries:
+            edges = np.zeros(arr.shape, dtype=bool)
+            vertical = self.dense[1:] != self.dense[:-1]
+            horizontal = self.dense[:, 1:] != self.dense[:, :-1]
+            edges[1:] |= vertical
+            edges[:, 1:] |= horizontal
+            out[edges] = BOUNDARY_RGBA
+        return out
+
+    def label_at(self, row, col):
+        """Label ID at a pixel of the most recently rendered plane, or None if there is none"""
+        if self.dense is None:
+            return None
+        if not (0 <= row < self.dense.shape[0] and 0 <= col < self.dense.shape[1]):
+            return None
+        idx = self.dense[row, col]
+        if self.ids is None:
+            return idx.item()
+        return self.ids[idx].item()
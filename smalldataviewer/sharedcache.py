@@ -0,0 +1,445 @@
+import ctypes
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from smalldataviewer.lazy import normalise_key
+from smalldataviewer.stats import file_signature
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    # python < 3.8
+    resource_tracker = shared_memory = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+__all__ = ["SharedSliceCache", "SharedPlanes", "shared_cache_available"]
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARED_CACHE_BYTES = 1024 ** 3
+
+# names of shared memory blocks are limited to 31 characters on some platforms
+NAME_PREFIX = "sdv_"
+NAME_HASH_CHARS = 24
+
+# magic, whether the data has been completely written, length of the JSON metadata which follows
+HEADER = struct.Struct("<8sBI")
+MAGIC = b"SDVSLICE"
+# data starts at an offset aligned for any dtype, after the header and metadata
+DATA_OFFSET = 256
+
+LOCK_NAME = "lock"
+
+# the resource tracker fails if a name's registration and unregistration by different threads interleave
+_tracker_lock = threading.Lock()
+
+
+def shared_cache_available():
+    """Whether shared-memory caching is supported: it needs python 3.8 or later, on a POSIX system"""
+    return shared_memory is not None and fcntl is not None
+
+
+def default_shared_cache_dir():
+    """Node-local directory in which the cache entries of the current user are coordinated"""
+    return os.path.join(
+        tempfile.gettempdir(), "smalldataviewer-shm-{}".format(os.getuid())
+    )
+
+
+def _untrack(block):
+    """
+    Stop this process's resource tracker from unlinking a shared memory block when the process exits,
+    so that the block outlives it for other processes to use.
+    """
+    try:
+        resource_tracker.unregister(block._name, "shared_memory")
+    except Exception:
+        pass
+
+
+if shared_memory is not None:
+
+    class _Block(shared_memory.SharedMemory):
+        def __del__(self):
+            # if arrays still view the block, its mapping is released along with the last of them
+            try:
+                self.close()
+            except BufferError:
+                pass
+
+
+def _attach(name, create=False, size=0):
+    """Open a shared memory block which is not unlinked when this process exits"""
+    try:
+        return _Block(name, create=create, size=size, track=False)
+    except TypeError:
+        # python < 3.13 has no ``track`` argument
+        with _tracker_lock:
+            block = _Block(name, create=create, size=size)
+            _untrack(block)
+        return block
+
+
+def _close(block):
+    """Unmap a shared memory block, unless arrays still view it. Returns whether it was unmapped."""
+    try:
+        block.close()
+    except BufferError:
+        return False
+    return True
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SharedSliceCache:
+    def __init__(self, max_bytes=DEFAULT_SHARED_CACHE_BYTES, directory=None):
+        """
+        Cache of decoded arrays in shared memory, which every process of the same user on a node can read,
+        so that e.g. several viewers of the same dataset decode each plane once between them, and each maps
+        the decoded planes without copying them.
+
+        Each entry is a ``multiprocessing.shared_memory`` block, named after its key. Blocks outlive the process
+        which created them, until they are evicted. Processes coordinate through a directory holding a small file
+        per entry, whose modification time records when it was last used: when the entries grow beyond
+        ``max_bytes``, the least recently used are unlinked. Processes still using an unlinked entry keep their
+        mapping of it. Each process also unmaps the entries it has used least recently once those it maps
+        exceed ``max_bytes``, as soon as no arrays view them.
+
+        Parameters
+        ----------
+        max_bytes : int
+            Total size of the entries to keep (default 1GiB)
+        directory : str, optional
+            Directory through which processes coordinate. Default a directory for the current user
+            in the system's temporary directory.
+
+        Raises
+        ------
+        RuntimeError
+            If shared memory is not supported (before python 3.8, or on Windows)
+        """
+        if not shared_cache_available():
+            raise RuntimeError(
+                "Shared-memory caching requires python 3.8 or later on a POSIX system"
+            )
+        self.max_bytes = max_bytes
+        self.directory = str(directory or default_shared_cache_dir())
+        # guards the blocks mapped by this process against the threads using the cache;
+        # the file lock in ``directory`` coordinates processes
+        self._thread_lock = threading.RLock()
+        # blocks mapped by this process, least recently used first
+        self._blocks = OrderedDict()
+        # blocks dropped from ``_blocks`` which could not be unmapped yet, as arrays still view them
+        self._unmapping = []
+
+    def key(self, *parts):
+        """Name of the entry identified by the given JSON-serialisable parts"""
+        digest = hashlib.sha1(json.dumps(parts, sort_keys=True).encode("utf-8"))
+        return NAME_PREFIX + digest.hexdigest()[:NAME_HASH_CHARS]
+
+    def reader_key(self, reader, ftype=None):
+        """Key identifying the dataset read by a FileReader, or None if its file cannot be found"""
+        try:
+            signature = file_signature(reader.path)
+        except OSError:
+            return None
+        return self.key(
+            os.path.abspath(reader.path),
+            signature,
+            reader.internal_path,
+            ftype,
+            None if reader.dtype is None else reader.dtype.str,
+        )
+
+    def _marker(self, key):
+        return os.path.join(self.directory, key)
+
+    def _view(self, block):
+        magic, ready, meta_len = HEADER.unpack_from(block.buf)
+        if magic != MAGIC or not ready:
+            return None
+        meta = json.loads(bytes(block.buf[HEADER.size : HEADER.size + meta_len]))
+        shape, dtype = tuple(meta["shape"]), np.dtype(meta["dtype"])
+        # numpy does not hold on to the buffers of memoryviews, so the array would not stop the block being
+        # unmapped; a ctypes array does, and closing the block raises BufferError while any view of it is alive
+        nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        data = (ctypes.c_char * nbytes).from_buffer(block.buf, DATA_OFFSET)
+        arr = np.frombuffer(data, dtype).reshape(shape)
+        arr.flags.writeable = False
+        return arr
+
+    def get(self, key):
+        """
+        Returns
+        -------
+        np.ndarray or None
+            Read-only view of the cached array in shared memory, or None if it is not cached
+        """
+        with self._thread_lock:
+            return self._get(key)
+
+    def _get(self, key):
+        block = self._blocks.get(key)
+        if block is None:
+            try:
+                block = _attach(key)
+            except (FileNotFoundError, ValueError):
+                return None
+        arr = self._view(block)
+        if arr is None:
+            # still being written by another process
+            if key not in self._blocks:
+                block.close()
+            return None
+        self._map(key, block)
+        try:
+            os.utime(self._marker(key))
+        except OSError:
+            pass
+        return arr
+
+    def put(self, key, arr):
+        """
+        Store an array, evicting the least recently used entries if the cache is then too large.
+
+        Returns
+        -------
+        bool
+            Whether the array was stored; not if it is too large, or another process is storing it
+        """
+        with self._thread_lock:
+            return self._put(key, arr)
+
+    def _put(self, key, arr):
+        arr = np.ascontiguousarray(arr)
+        meta = json.dumps({"shape": arr.shape, "dtype": arr.dtype.str}).encode("utf-8")
+        size = DATA_OFFSET + arr.nbytes
+        if arr.dtype.hasobject or size > self.max_bytes or HEADER.size + len(meta) > DATA_OFFSET:
+            logger.debug("Not caching array of %s bytes in shared memory", arr.nbytes)
+            return False
+        with self._lock():
+            try:
+                block = self._create(key, size)
+            except FileExistsError:
+                return False
+            except OSError as e:
+                logger.warning("Could not allocate %s bytes of shared memory: %s", size, e)
+                return False
+            # written before the block is filled, so that it is evicted like any other entry
+            # even if this process dies before the block is ready
+            with open(self._marker(key), "w") as f:
+                f.write("{} {}".format(size, os.getpid()))
+
+        HEADER.pack_into(block.buf, 0, MAGIC, 0, len(meta))
+        block.buf[HEADER.size : HEADER.size + len(meta)] = meta
+        np.ndarray(arr.shape, arr.dtype, buffer=block.buf, offset=DATA_OFFSET)[...] = arr
+        # only marked as ready once completely written, so that other processes never read a partial entry
+        HEADER.pack_into(block.buf, 0, MAGIC, 1, len(meta))
+        self._map(key, block)
+
+        with self._lock():
+            self._evict()
+        logger.debug("Cached array of %s bytes in shared memory as %s", arr.nbytes, key)
+        return True
+
+    def _create(self, key, size):
+        """Create the block of an entry, replacing one abandoned by a process which died while writing it"""
+        try:
+            return _attach(key, create=True, size=size)
+        except FileExistsError:
+            if not self._abandoned(key):
+                raise
+        logger.info("Replacing shared memory block %s abandoned before it was written", key)
+        self._unlink(key)
+        return _attach(key, create=True, size=size)
+
+    def _abandoned(self, key):
+        """Whether an existing block is not ready, and the process which created it is gone"""
+        try:
+            block = _attach(key)
+        except (FileNotFoundError, ValueError):
+            return False
+        try:
+            magic, ready, _ = HEADER.unpack_from(block.buf)
+        finally:
+            block.close()
+        if magic == MAGIC and ready:
+            return False
+        try:
+            with open(self._marker(key)) as f:
+                pid = int(f.read().split()[1])
+        except (OSError, ValueError, IndexError):
+            # blocks are created under the lock along with their marker, so its writer died in between
+            return True
+        return not _alive(pid)
+
+    def _map(self, key, block):
+        """
+        Record a block as mapped by this process, unmapping the least recently used beyond ``max_bytes``.
+        Called with ``_thread_lock`` held.
+        """
+        self._blocks[key] = block
+        self._blocks.move_to_end(key)
+        self._unmapping = [old for old in self._unmapping if not _close(old)]
+        total = sum(mapped.size for mapped in self._blocks.values())
+        while total > self.max_bytes and len(self._blocks) > 1:
+            _, old = self._blocks.popitem(last=False)
+            total -= old.size
+            if not _close(old):
+                self._unmapping.append(old)
+
+    def mapped_bytes(self):
+        """Size of the blocks this process has mapped"""
+        with self._thread_lock:
+            return sum(block.size for block in list(self._blocks.values()) + self._unmapping)
+
+    def _lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        return _FileLock(os.path.join(self.directory, LOCK_NAME))
+
+    def entries(self):
+        """
+        Returns
+        -------
+        list of tuple
+            (last used time, size in bytes, key) of each entry, least recently used first
+        """
+        out = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return out
+        for name in names:
+            if not name.startswith(NAME_PREFIX):
+                continue
+            try:
+                with open(self._marker(name)) as f:
+                    size = int(f.read().split()[0])
+                mtime = os.stat(self._marker(name)).st_mtime
+            except (OSError, ValueError):
+                continue
+            out.append((mtime, size, name))
+        return sorted(out)
+
+    def nbytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def _unlink(self, key):
+        try:
+            os.remove(self._marker(key))
+        except OSError:
+            pass
+        with _tracker_lock:
+            try:
+                # attached with tracking, so that unlinking it balances the resource tracker
+                block = shared_memory.SharedMemory(key)
+            except (FileNotFoundError, ValueError):
+                return
+            block.close()
+            block.unlink()
+
+    def _evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            self._unlink(key)
+            logger.debug("Evicted %s from shared memory", key)
+            total -= size
+
+    def evict(self):
+        """Unlink the least recently used entries until the cache fits in ``max_bytes``"""
+        with self._lock():
+            self._evict()
+
+    def clear(self):
+        """Unlink every entry, from every process"""
+        with self._lock():
+            for _, _, key in self.entries():
+                self._unlink(key)
+
+    def close(self):
+        """Unmap the entries mapped by this process, other than those still viewed by arrays in use"""
+        with self._thread_lock:
+            blocks = list(self._blocks.values()) + self._unmapping
+            self._blocks.clear()
+            self._unmapping = [block for block in blocks if not _close(block)]
+
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+        self._f = None
+
+    def __enter__(self):
+        self._f = open(self.path, "a")
+        fcntl.flock(self._f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        fcntl.flock(self._f, fcntl.LOCK_UN)
+        self._f.close()
+
+
+class SharedPlanes:
+    def __init__(self, dataset, cache, prefix):
+        """
+        Array-like wrapper around a dataset, which serves planes along dimension 0 from a SharedSliceCache,
+        decoding them from the dataset (and caching them) only if no process has done so already.
+        Reads spanning several planes go directly to the dataset.
+
+        Parameters
+        ----------
+        dataset : array-like
+        cache : SharedSliceCache
+        prefix : str
+            Key identifying the dataset, e.g. from ``SharedSliceCache.reader_key``
+        """
+        self.dataset = dataset
+        self.shape = tuple(dataset.shape)
+        self.dtype = np.dtype(dataset.dtype)
+        self.chunks = getattr(dataset, "chunks", None)
+        self.cache = cache
+        self.prefix = prefix
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __getitem__(self, key):
+        key = normalise_key(key, self.ndim)
+        if isinstance(key[0], slice):
+            return np.asarray(self.dataset[key])
+
+        rest = [
+            [item.start, item.stop, item.step] if isinstance(item, slice) else item
+            for item in key[1:]
+        ]
+        name = self.cache.key(self.prefix, key[0], rest)
+        plane = self.cache.get(name)
+        if plane is None:
+            plane = np.asarray(self.dataset[key])
+            self.cache.put(name, plane)
+        return plane
@@ -0,0 +1,274 @@
+import json
+import logging
+import os
+
+import numpy as np
+
+__all__ = ["VolumeStatistics", "compute_statistics", "load_statistics", "save_statistics"]
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLAB_BYTES = 64 * 1024 ** 2
+DEFAULT_SAMPLE_SIZE = 200000
+HISTOGRAM_BINS = 256
+
+# percentiles at which quantiles are stored: every 0.1%
+QUANTILE_GRID = np.linspace(0, 100, 1001)
+
+STATS_SUFFIX = ".sdvstats.json"
+
+
+class VolumeStatistics:
+    def __init__(self, vmin, vmax, count, hist_counts, hist_edges, quantiles, exact=False):
+        """
+        Summary statistics of the values in a volume.
+
+        Parameters
+        ----------
+        vmin, vmax : float
+            Minimum and maximum finite values
+        count : int
+            Number of finite values
+        hist_counts, hist_edges : array-like
+            Histogram, as returned by ``np.histogram``
+        quantiles : array-like
+            Values at each percentile in ``QUANTILE_GRID``
+        exact : bool
+            Whether the histogram and quantiles were computed from every value, rather than a sample
+        """
+        self.min = vmin
+        self.max = vmax
+        self.count = int(count)
+        self.hist_counts = np.asarray(hist_counts)
+        self.hist_edges = np.asarray(hist_edges)
+        self.quantiles = np.asarray(quantiles, dtype=np.float64)
+        self.exact = exact
+
+    def percentile(self, q):
+        """Value at percentile ``q`` (0-100), interpolated between stored quantiles"""
+        return float(np.interp(q, QUANTILE_GRID, self.quantiles))
+
+    def clim(self, percentiles=None):
+        """Colour limits at the given (lower, upper) percentiles, or the minimum and maximum if None"""
+        if percentiles is None:
+            return self.min, self.max
+        return tuple(self.percentile(q) for q in percentiles)
+
+    def to_dict(self):
+        return {
+            "min": self.min,
+            "max": self.max,
+            "count": self.count,
+            "hist_counts": self.hist_counts.tolist(),
+            "hist_edges": self.hist_edges.tolist(),
+            "quantiles": self.quantiles.tolist(),
+            "exact": self.exact,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(
+            d["min"],
+            d["max"],
+            d["count"],
+            d["hist_counts"],
+            d["hist_edges"],
+            d["quantiles"],
+            d.get("exact", False),
+        )
+
+    def __repr__(self):
+        return "{}(min={}, max={}, count={}, exact={})".format(
+            type(self).__name__, self.min, self.max, self.count, self.exact
+        )
+
+
+def iter_slabs(volume, slab_bytes=DEFAULT_SLAB_BYTES):
+    """Yield consecutive slabs of ``volume`` along dimension 0, of roughly ``slab_bytes`` each"""
+    plane_bytes = int(np.prod(volume.shape[1:], dtype=np.int64)) * np.dtype(volume.dtype).itemsize
+    depth = max(1, slab_bytes // max(plane_bytes, 1))
+    for start in range(0, volume.shape[0], depth):
+        yield np.asarray(volume[start : start + depth, ...])
+
+
+def _exact_integer_stats(volume, slab_bytes):
+    """Statistics of an integer volume of up to 16 bits, from a count of every possible value"""
+    dtype = np.dtype(volume.dtype)
+    bits = 8 * dtype.itemsize
+    unsigned = np.dtype("u{}".format(dtype.itemsize))
+    counts = np.zeros(2 ** bits, dtype=np.int64)
+    # bincount works on a platform integer copy of each slab
+    for slab in iter_slabs(volume, max(slab_bytes // 8, 1)):
+        counts += np.bincount(slab.ravel().view(unsigned), minlength=len(counts))
+
+    offset = int(np.iinfo(dtype).min)
+    if offset:
+        # signed values viewed as unsigned wrap around: reorder so that index 0 is the minimum
+        counts = np.roll(counts, -offset)
+
+    nonzero = np.flatnonzero(counts)
+    if not len(nonzero):
+        return None
+    vmin, vmax = int(nonzero[0]) + offset, int(nonzero[-1]) + offset
+    total = int(counts.sum())
+
+    cumulative = np.cumsum(counts)
+    ranks = QUANTILE_GRID / 100 * (total - 1)
+    quantiles = np.searchsorted(cumulative, ranks, side="right") + offset
+
+    values = np.arange(vmin, vmax + 1)
+    hist_counts, hist_edges = np.histogram(
+        values,
+        bins=min(HISTOGRAM_BINS, len(values)),
+        weights=counts[vmin - offset : vmax - offset + 1],
+    )
+    return VolumeStatistics(
+        vmin, vmax, total, hist_counts.astype(np.int64), hist_edges, quantiles, exact=True
+    )
+
+
+def _sampled_stats(volume, slab_bytes, sample_size, seed):
+    """Statistics of a volume from its extrema and a uniform random sample of its values"""
+    rng = np.random.RandomState(seed)
+    total_size = int(np.prod(volume.shape, dtype=np.int64))
+    vmin, vmax = np.inf, -np.inf
+    count = 0
+    samples = []
+    for slab in iter_slabs(volume, slab_bytes):
+        values = slab.ravel()
+        if values.dtype.kind == "f":
+            values = values[np.isfinite(values)]
+        if not len(values):
+            continue
+        vmin = min(vmin, values.min())
+        vmax = max(vmax, values.max())
+        count += len(values)
+
+        n_sample = int(np.ceil(sample_size * slab.size / total_size))
+        if n_sample >= len(values):
+            samples.append(values)
+        else:
+            samples.append(values[rng.randint(0, len(values), n_sample)])
+
+    if not count:
+        return None
+    sample = np.concatenate(samples).astype(np.float64)
+    quantiles = np.percentile(sample, QUANTILE_GRID)
+    hist_counts, hist_edges = np.histogram(
+        sample, bins=HISTOGRAM_BINS, range=(float(vmin), float(vmax))
+    )
+    hist_counts = np.rint(hist_counts * (count / len(sample))).astype(np.int64)
+    return VolumeStatistics(
+        vmin.item(), vmax.item(), count, hist_counts, hist_edges, quantiles
+    )
+
+
+def compute_statistics(
+    volume, slab_bytes=DEFAULT_SLAB_BYTES, sample_size=DEFAULT_SAMPLE_SIZE, seed=0
+):
+    """
+    Compute statistics of ``volume`` by streaming over it in slabs along dimension 0,
+    so that memory use is bounded by ``slab_bytes`` regardless of the size of the volume.
+
+    Integers of up to 16 bits are counted exactly; other data are summarised by their extrema and
+    a uniform random sample of ``sample_size`` values.
+
+    Parameters
+    ----------
+    volume : array-like
+    slab_bytes : int
+        Approximate size of each slab read
+    sample_size : int
+    seed : int
+        Seed for sampling, so that results are reproducible
+
+    Returns
+    -------
+    VolumeStatistics or None
+        None if the volume has no finite values
+    """
+    dtype = np.dtype(volume.dtype)
+    if dtype.kind in "iub" and dtype.itemsize <= 2:
+        if dtype.kind == "b":
+            volume = _BoolAsUint8(volume)
+        return _exact_integer_stats(volume, slab_bytes)
+    return _sampled_stats(volume, slab_bytes, sample_size, seed)
+
+
+class _BoolAsUint8:
+    def __init__(self, volume):
+        self.volume = volume
+        self.shape = volume.shape
+        self.dtype = np.dtype(np.uint8)
+
+    def __getitem__(self, item):
+        return np.asarray(self.volume[item]).view(np.uint8)
+
+
+def stats_path(path):
+    """Path of the file in which statistics for the data file at ``path`` are stored"""
+    return os.path.abspath(str(path)).rstrip(os.sep) + STATS_SUFFIX
+
+
+def stats_key(reader):
+    """Identify the data a FileReader reads: its internal path and ROI"""
+    return json.dumps(
+        [reader.internal_path, repr(reader.slicing), reader.ftype], sort_keys=True
+    )
+
+
+def file_signature(path):
+    st = os.stat(str(path))
+    return {"size": st.st_size, "mtime": st.st_mtime}
+
+
+def load_statistics(reader):
+    """
+    Load previously saved statistics for the data read by a FileReader,
+    if they exist and the file has not changed since.
+
+    Returns
+    -------
+    VolumeStatistics or None
+    """
+    try:
+        with open(stats_path(reader.path)) as f:
+            stored = json.load(f)
+        entry = stored[stats_key(reader)]
+        if entry["file"] != file_signature(reader.path):
+            logger.info("Saved statistics for %s are out of date", reader.path)
+            return None
+        return VolumeStatistics.from_dict(entry["stats"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_statistics(reader, stats):
+    """
+    Save statistics for the data read by a FileReader alongside its file, if possible.
+
+    Returns
+    -------
+    bool
+        Whether they were saved: not if the file cannot be written, e.g. because the directory is read-only
+    """
+    path = stats_path(reader.path)
+    try:
+        with open(path) as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        stored = dict()
+
+    try:
+        stored[stats_key(reader)] = {
+            "file": file_signature(reader.path),
+            "stats": stats.to_dict(),
+        }
+        with open(path, "w") as f:
+            json.dump(stored, f)
+    except OSError as e:
+        logger.info("Could not save statistics to %s: %s", path, e)
+        return False
+    logger.debug("Saved statistics to %s", path)
+    return True
@@ -1,24 +1,111 @@
 #!/usr/bin/env python
 """Adapted from https://matplotlib.org/gallery/animation/image_slices_viewer.html"""
 
+import functools
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-import matplotlib.pyplot as plt
-from smalldataviewer.files import FileReader
+import numpy as np
+
+from smalldataviewer.cache import (
+    DEFAULT_CACHE_BYTES,
+    SliceCache,
+    Prefetcher,
+)
+from smalldataviewer.ext import LazyModule
+from smalldataviewer.files import FileReader, pop_reader_kwargs
+from smalldataviewer.profiling import timed
+from smalldataviewer.projection import project_slab
+from smalldataviewer.pyramid import DownsampledVolume, Pyramid
+from smalldataviewer.render import LabelRenderer, LUTRenderer, is_lookup_colormap
+from smalldataviewer.stats import compute_statistics, load_statistics, save_statistics
 
 __all__ = ["DataViewer"]
 
 
 logger = logging.getLogger(__name__)
 
+# imported when a figure is first needed, so that e.g. the CLI's --help does not wait for matplotlib
+plt = LazyModule("matplotlib.pyplot")
+backend_bases = LazyModule("matplotlib.backend_bases")
+
+# how often to check for completed background tasks
+POLL_INTERVAL_MS = 100
+
+CONTRAST_MODES = ("minmax", "percentile")
+
+# with lod=None, use a level-of-detail pyramid if a slice is larger than this in either dimension
+LOD_MIN_SIZE = 2048
+
+# with async_load, previews of slices which are still loading have at most this many pixels
+PREVIEW_PIXELS = 512 ** 2
+
+# projections which can be shown over a slab of slices; sums would need colour limits of their own
+SLAB_PROJECTIONS = ("max", "min", "mean")
+
 
 class NullColorMap:
     def __call__(self, arg):
         return arg
 
 
+def display_cmap(volume, cmap=None, colour_cmap=None):
+    """
+    Check that a volume can be displayed slice by slice, and return the colormap with which to display it.
+
+    Parameters
+    ----------
+    volume : array-like
+        3D, or 4D with up to 4 colour channels in the last dimension
+    cmap : str, matplotlib.colors.Colormap or LabelRenderer, optional
+        Colormap for 3D data, or the name of one (default ``'gray'``)
+    colour_cmap : callable, optional
+        Used instead of ``cmap`` for data with colour channels. Default a NullColorMap.
+
+    Raises
+    ------
+    ValueError
+        If the volume is 2D, has more than 4 dimensions, or more than 4 colour channels
+    """
+    if volume.ndim == 2:
+        raise ValueError("Data is 2D: just use plt.imshow")
+    elif volume.ndim == 3:
+        if cmap is None:
+            cmap = "gray"
+        if isinstance(cmap, str):
+            cmap = plt.get_cmap(cmap)
+        return cmap
+    elif volume.ndim == 4:
+        if volume.shape[-1] > 4:
+            raise ValueError("Data has >4 colour channels, cannot display")
+        return NullColorMap() if colour_cmap is None else colour_cmap
+    else:
+        raise ValueError(
+            "Data has more than 4 dimensions including colour channels, cannot display"
+        )
+
+
 class DataViewer(object):
-    def __init__(self, volume, data_order="zyx", cmap=None, **kwargs):
+    def __init__(
+        self,
+        volume,
+        data_order="zyx",
+        cmap=None,
+        cache_bytes=None,
+        prefetch=4,
+        blit=True,
+        coalesce=True,
+        lod=None,
+        lod_method="mean",
+        contrast=None,
+        contrast_percentiles=(0.5, 99.5),
+        stats=None,
+        slab=1,
+        projection="max",
+        async_load=False,
+        **kwargs
+    ):
         """
         Class used to view a dataset with 3 spatial dimensions as image slices. The dimension 0 will be scrolled
         through, dimension 1 will on the up-down axis, dimension 2 will be on the left-right axis, and dimension 3 will
@@ -26,8 +113,9 @@ class DataViewer(object):
 
         Parameters
         ----------
-        volume : array-like
-            Anything with a numpy-like slicing interface, in 3 spatial dimensions and up to 4 colour channels
+        volume : array-like or Pyramid
+            Anything with a numpy-like slicing interface, in 3 spatial dimensions and up to 4 colour channels;
+            or a Pyramid of such volumes at several resolutions, finest first
         data_order : str
             Permutation of ``'zyx'`` used for axis labelling (data is usually not transposed).
             If volume is VigraArray, volume is transposed to numpy order (``'zyx'``) and data_order is ignored.
@@ -35,9 +123,58 @@ class DataViewer(object):
         cmap : str
             ``cmap`` parameter as passed to ``matplotlib.pyplot.imshow``.
             If ``None`` (default), will be set to ``'gray'`` for 3D data and ``None`` for 4D.
+            Standard matplotlib colormaps are applied through a precomputed lookup table, honouring
+            ``vmin`` and ``vmax`` if given in ``kwargs``.
+            For a label volume, pass a ``LabelRenderer``: hovering over the image then shows the label ID.
+        cache_bytes : int, optional
+            Memory budget for caching slices which have been read from ``volume``.
+            If ``None`` (default), 256MiB unless ``volume`` is a numpy array, in which case slices are not cached.
+        prefetch : int
+            How many slices ahead of the current one, in the direction of scrolling, to read in the background
+            (default 4). A quarter as many are read behind. Has no effect if slices are not cached.
+        blit : bool
+            Whether to redraw only the image and title when scrolling, rather than the whole figure,
+            if the backend supports it (default True)
+        coalesce : bool
+            Whether to render a burst of scroll events once, at the final index, rather than once per event,
+            if the backend has a working event loop timer (default True)
+        lod : bool, optional
+            Whether to display slices at a resolution matching the size of the axes on screen, switching to
+            finer levels of detail as the view is zoomed in. Levels are taken from ``volume`` if it is a Pyramid,
+            or computed from the full-resolution slices.
+            If ``None`` (default), enabled if ``volume`` is a multi-level Pyramid or slices are larger than 2048
+            pixels in either dimension.
+        lod_method : {"mean", "mode"}
+            How to compute levels of detail if ``volume`` is not a Pyramid: block mean (default),
+            or block mode (for label volumes)
+        contrast : {None, "minmax", "percentile"}
+            How to set colour limits from statistics of the whole volume: between its minimum and maximum, or between
+            ``contrast_percentiles``. Statistics are computed in the background if ``stats`` is not given, and the
+            colour limits updated when they are ready. If ``None`` (default), colour limits are as for
+            ``matplotlib.colors.Colormap``, unless ``vmin``/``vmax`` are given in ``kwargs``.
+        contrast_percentiles : tuple of float
+            Lower and upper percentiles (0-100) used for colour limits with ``contrast="percentile"``
+        stats : VolumeStatistics, optional
+            Precomputed statistics of ``volume``
+        slab : int
+            Number of slices around the current one to project into the displayed image (default 1, no projection).
+            Can be changed with the ``[`` and ``]`` keys.
+        projection : {"max", "min", "mean"}
+            How to project a slab of slices (default "max", a maximum-intensity projection).
+            Mean projections are rounded to the type of ``volume``. Cycle through them with the ``m`` key.
+        async_load : bool
+            Whether to read slices which are not cached in a background thread, rather than blocking the GUI
+            (default False). Meanwhile, a low-resolution preview is shown if one is cheap to read: from a coarser
+            stored level of detail, or by a strided read of memory-mapped data. Otherwise, the previous slice stays
+            on screen. Only applies when slices are cached, and to single slices rather than slab projections.
         kwargs
             Passed to ``matplotlib.pyplot.imshow``.
         """
+        pyramid = None
+        if isinstance(volume, Pyramid):
+            pyramid = volume
+            volume = pyramid[0]
+
         logger.debug(
             "Volume of shape {} and type {} received".format(
                 volume.shape, type(volume).__name__
@@ -58,62 +195,518 @@ class DataViewer(object):
 
         self.slices = self.volume.shape[0]
         self.idx = 0
+        self.direction = 1
+
         self.title_formatstr = "{} = {{}} (last = {})".format(
             data_order[0], self.slices - 1
         )
 
-        if self.volume.ndim == 2:
-            raise ValueError("Data is 2D: just use plt.imshow")
-        elif self.volume.ndim == 3:
-            if cmap is None:
-                cmap = "gray"
-            if isinstance(cmap, str):
-                cmap = plt.get_cmap(cmap)
-        elif self.volume.ndim == 4:
-            cmap = NullColorMap()
-            if self.volume.shape[-1] > 4:
-                raise ValueError("Data has >4 colour channels, cannot display")
-        else:
+        cmap = display_cmap(self.volume, cmap)
+
+        if lod is None:
+            lod = (pyramid is not None and len(pyramid) > 1) or max(
+                self.volume.shape[1:3]
+            ) > LOD_MIN_SIZE
+        if not lod:
+            pyramid = Pyramid([self.volume])
+        elif pyramid is None or len(pyramid) == 1:
+            pyramid = Pyramid.on_the_fly(self.volume, lod_method)
+        self.pyramid = pyramid
+        self.level = 0
+
+        if cache_bytes is None:
+            all_numpy = all(isinstance(level, np.ndarray) for level in pyramid.levels)
+            cache_bytes = 0 if all_numpy else DEFAULT_CACHE_BYTES
+        self._cache = SliceCache(cache_bytes) if cache_bytes else None
+        self._prefetch = prefetch
+        self._prefetchers = dict()
+        self.async_load = async_load
+        self._loading = None
+        self.owns_volume = False
+
+        if projection not in SLAB_PROJECTIONS:
             raise ValueError(
-                "Data has more than 4 dimensions including colour channels, cannot display"
+                "projection must be one of {}, got '{}'".format(
+                    SLAB_PROJECTIONS, projection
+                )
             )
+        self.slab = max(1, int(slab))
+        self.projection = projection
 
-        self.fig, self.ax = plt.subplots(1, 1)
         self.cmap = cmap
-        self.im = self.ax.imshow(self.cmap(self._slice), **kwargs)
+        if is_lookup_colormap(cmap):
+            self._render = LUTRenderer(
+                cmap, vmin=kwargs.pop("vmin", None), vmax=kwargs.pop("vmax", None)
+            )
+        else:
+            self._render = cmap
+
+        self.fig, self.ax = plt.subplots(1, 1)
+        self.im = None
+        self.level = self._choose_level()
+        self.im = self.ax.imshow(self._render(self._slice), **kwargs)
         self.ax.set_ylabel(data_order[1])
         self.ax.set_xlabel(data_order[2])
+        if isinstance(self._render, LabelRenderer):
+            self.ax.format_coord = self._format_label_coord
+        if len(self.pyramid) > 1:
+            self._set_extent()
+            self.ax.set_autoscale_on(False)
+
+        self.blit = blit and getattr(self._canvas, "supports_blit", False)
+        self._background = None
+        self._background_bounds = None
+        if self.blit:
+            # left out of full draws, and drawn on top of them by _ondraw
+            for artist in self._animated_artists:
+                artist.set_animated(True)
+
+        self._update_pending = False
+        self._pending_since = None
+        self._timer = self._canvas.new_timer(interval=0) if coalesce else None
+        if type(self._timer) is backend_bases.TimerBase:
+            logger.debug("Backend has no event loop timer, not coalescing scroll events")
+            self._timer = None
+        if self._timer is not None:
+            self._timer.single_shot = True
+            self._timer.add_callback(self._flush_update)
+
+        if contrast is not None and contrast not in CONTRAST_MODES:
+            raise ValueError(
+                "contrast must be None or one of {}, got '{}'".format(
+                    CONTRAST_MODES, contrast
+                )
+            )
+        self.contrast = contrast
+        self.contrast_percentiles = contrast_percentiles
+        self.statistics = None
+        self._statistics_callbacks = []
+
+        self._tasks = []
+        self._task_executor = None
+        self._task_timer = self._canvas.new_timer(interval=POLL_INTERVAL_MS)
+        if type(self._task_timer) is backend_bases.TimerBase:
+            self._task_timer = None
+        else:
+            self._task_timer.add_callback(self._poll_tasks)
+
+        if self.async_load and self._task_timer is None:
+            logger.debug("Backend has no event loop timer, reading slices synchronously")
+            self.async_load = False
+
+        if stats is not None:
+            self._set_statistics(stats, update=False)
+
         self._update()
         self.fig.canvas.mpl_connect("scroll_event", self._onscroll)
+        self.fig.canvas.mpl_connect("key_press_event", self._onkey)
+        self.fig.canvas.mpl_connect("close_event", self._onclose)
+        self.fig.canvas.mpl_connect("draw_event", self._ondraw)
+        if len(self.pyramid) > 1:
+            self.ax.callbacks.connect("xlim_changed", self._onlimits)
+            self.ax.callbacks.connect("ylim_changed", self._onlimits)
+
+        if contrast is not None and stats is None:
+            self.compute_statistics()
+
+    def compute_statistics(self):
+        """
+        Compute statistics of the whole volume in a background thread,
+        applying the colour limits given by ``contrast`` when they are ready.
+        """
+        self._submit(compute_statistics, self._set_statistics, self.volume)
+
+    def add_statistics_callback(self, fn):
+        """Call ``fn`` with the VolumeStatistics when they have been computed"""
+        self._statistics_callbacks.append(fn)
+
+    def _set_statistics(self, stats, update=True):
+        self.statistics = stats
+        if stats is None:
+            logger.warning("Volume has no finite values")
+            return
+        logger.info("Volume statistics: %s", stats)
+
+        if self.contrast is not None:
+            if isinstance(self._render, LUTRenderer):
+                percentiles = (
+                    self.contrast_percentiles if self.contrast == "percentile" else None
+                )
+                clim = stats.clim(percentiles)
+                logger.info("Setting colour limits to %s", clim)
+                self._render.set_clim(*clim)
+                if update:
+                    self._update()
+            else:
+                logger.info("Colour limits do not apply to this colormap, ignoring")
+
+        for fn in self._statistics_callbacks:
+            fn(stats)
+
+    def _submit(self, fn, callback, *args):
+        """Run ``fn(*args)`` in a background thread, and then ``callback`` with its result in the GUI thread"""
+        if self._task_executor is None:
+            self._task_executor = ThreadPoolExecutor(max_workers=1)
+        future = self._task_executor.submit(fn, *args)
+        self._watch(future, callback)
+        return future
+
+    def _watch(self, future, callback):
+        """Run ``callback`` with the result of ``future`` in the GUI thread when it completes"""
+        self._tasks.append((future, callback))
+        if self._task_timer is not None:
+            self._task_timer.start()
+
+    def _poll_tasks(self):
+        """Run the callbacks of completed background tasks"""
+        tasks, self._tasks = self._tasks, []
+        for future, callback in tasks:
+            if not future.done():
+                self._tasks.append((future, callback))
+            elif future.cancelled():
+                continue
+            elif future.exception() is not None:
+                logger.error("Background task failed: %s", future.exception())
+            else:
+                callback(future.result())
+        if not self._tasks and self._task_timer is not None:
+            self._task_timer.stop()
 
     def show(self):
         """Show the viewer. Note that the viewer will no longer scroll if the script ends: use ``plt.show`` for that"""
         self.fig.show()
 
+    def cache_info(self):
+        """
+        Returns
+        -------
+        CacheInfo or None
+            Slice cache hits, misses and size, or None if slices are not cached
+        """
+        if self._cache is None:
+            return None
+        return self._cache.info()
+
+    def close(self):
+        """
+        Stop prefetching slices,
+        and close the volume if this viewer owns it (e.g. a lazy volume opened by ``from_file``)
+        """
+        for prefetcher in self._prefetchers.values():
+            if prefetcher is not None:
+                prefetcher.close()
+        self._prefetchers.clear()
+        if self._task_timer is not None:
+            self._task_timer.stop()
+        for future, _ in self._tasks:
+            future.cancel()
+        self._tasks = []
+        if self._task_executor is not None:
+            self._task_executor.shutdown(wait=False)
+            self._task_executor = None
+        if self._cache is not None:
+            logger.info("Slice cache: %s", self.cache_info())
+            # which may view a SharedSliceCache's blocks, so that it can unmap them
+            self._cache.clear()
+        if self.owns_volume:
+            self.pyramid.close()
+
+    def _onclose(self, event):
+        if self._timer is not None:
+            self._timer.stop()
+        self.close()
+
     def _onscroll(self, event):
         step = 1
         if event.button == "up" and self.idx < self.slices - 1:
             logger.debug("Scrolling forward by %s", step)
             self.idx += step
+            self.direction = 1
         elif event.button == "down" and self.idx > 0:
             logger.debug("Scrolling back by %s", step)
             self.idx -= step
+            self.direction = -1
         else:
             return
+        self._schedule_update()
+
+    def _onkey(self, event):
+        if event.key == "]":
+            self.set_slab(self.slab + 2 if self.slab > 1 else 3)
+        elif event.key == "[":
+            self.set_slab(self.slab - 2)
+        elif event.key == "m":
+            idx = SLAB_PROJECTIONS.index(self.projection)
+            self.set_slab(projection=SLAB_PROJECTIONS[(idx + 1) % len(SLAB_PROJECTIONS)])
+
+    def set_slab(self, slab=None, projection=None):
+        """Change the number of slices projected into the displayed image, and/or how they are projected"""
+        if slab is not None:
+            self.slab = max(1, min(int(slab), self.slices))
+        if projection is not None:
+            if projection not in SLAB_PROJECTIONS:
+                raise ValueError(
+                    "projection must be one of {}, got '{}'".format(
+                        SLAB_PROJECTIONS, projection
+                    )
+                )
+            self.projection = projection
+        logger.info("Showing %s projection of %s slices", self.projection, self.slab)
+        self._schedule_update()
+
+    def _schedule_update(self):
+        """Render the current index, after any other queued events have been handled if coalescing"""
+        if self._pending_since is None:
+            self._pending_since = time.perf_counter()
+        if self._timer is None:
+            self._flush_update()
+        elif not self._update_pending:
+            self._update_pending = True
+            self._timer.start()
+
+    def _flush_update(self):
+        self._update_pending = False
         self._update()
+        if self._pending_since is not None:
+            logger.debug(
+                "Slice %s displayed %.1fms after scroll",
+                self.idx,
+                (time.perf_counter() - self._pending_since) * 1000,
+            )
+            self._pending_since = None
+
+    @property
+    def _canvas(self):
+        return self.im.axes.figure.canvas
+
+    @property
+    def _animated_artists(self):
+        return self.im, self.ax.title
+
+    def _ondraw(self, event):
+        """After a full draw, which leaves out the image and title, capture it as the background for blitting
+        and draw the image and title on top"""
+        if not self.blit:
+            return
+        if getattr(event.canvas, "supports_blit", False):
+            self._background = event.canvas.copy_from_bbox(self.fig.bbox)
+            self._background_bounds = tuple(self.fig.bbox.bounds)
+        for artist in self._animated_artists:
+            artist.draw(event.renderer)
+
+    def _blit(self):
+        canvas = self._canvas
+        canvas.restore_region(self._background)
+        for artist in self._animated_artists:
+            self.ax.draw_artist(artist)
+        canvas.blit(self.fig.bbox)
+
+    def _display_factor(self):
+        """How many data pixels are displayed per screen pixel, along the less downsampled axis"""
+        bbox = self.ax.get_window_extent()
+        if self.im is None:
+            height, width = self.volume.shape[1:3]
+        else:
+            width = abs(np.diff(self.ax.get_xlim())[0])
+            height = abs(np.diff(self.ax.get_ylim())[0])
+        return max(1, int(min(width / max(bbox.width, 1), height / max(bbox.height, 1))))
+
+    def _choose_level(self):
+        if len(self.pyramid) == 1:
+            return 0
+        return self.pyramid.choose(self._display_factor())
+
+    def _set_extent(self):
+        """Scale the image so that the current level is displayed in full-resolution coordinates"""
+        _, fy, fx = self.pyramid.factors[self.level]
+        height, width = self.pyramid[self.level].shape[1:3]
+        right, bottom = width * fx - 0.5, height * fy - 0.5
+        if self.im.origin == "upper":
+            self.im.set_extent((-0.5, right, bottom, -0.5))
+        else:
+            self.im.set_extent((-0.5, right, -0.5, bottom))
+
+    def _format_label_coord(self, x, y):
+        """Cursor position and the label under it, looked up in the displayed slice rather than the volume"""
+        _, fy, fx = self.pyramid.factors[self.level]
+        col, row = int(np.floor(x + 0.5)), int(np.floor(y + 0.5))
+        label = self._render.label_at(row // fy, col // fx)
+        return "x={}, y={}, label={}".format(col, row, label)
+
+    def _onlimits(self, ax):
+        if self._choose_level() != self.level:
+            self._schedule_update()
+
+    def _prefetcher(self, level):
+        """Prefetcher for the given level, or None if it is not cached"""
+        try:
+            return self._prefetchers[level]
+        except KeyError:
+            pass
+        array = self.pyramid[level]
+        if self._cache is None or isinstance(array, np.ndarray):
+            prefetcher = None
+        else:
+            prefetcher = Prefetcher(
+                functools.partial(self._read_slice, level=level),
+                array.shape[0],
+                self._cache,
+                ahead=self._prefetch,
+                behind=max(self._prefetch // 4, 1) if self._prefetch else 0,
+                workers=2 if self._prefetch or self.async_load else 0,
+                namespace=level,
+            )
+        self._prefetchers[level] = prefetcher
+        return prefetcher
+
+    @property
+    def _level_idx(self):
+        """Index of the current slice in the current level"""
+        return self.idx // self.pyramid.factors[self.level][0]
+
+    def _read_slice(self, idx, level=0):
+        return self.pyramid[level][idx, ...]
+
+    def _slab_bounds(self):
+        """Start and stop, in the current level, of the slab of slices projected into the displayed image"""
+        n = self.pyramid[self.level].shape[0]
+        depth = min(max(1, self.slab // self.pyramid.factors[self.level][0]), n)
+        start = min(max(self._level_idx - depth // 2, 0), n - depth)
+        return start, start + depth
 
     @property
     def _slice(self):
-        return self.volume[self.idx, ...]
+        prefetcher = self._prefetcher(self.level)
+        start, stop = self._slab_bounds()
+        if stop - start == 1:
+            if prefetcher is None:
+                return self._read_slice(self._level_idx, self.level)
+            return prefetcher[self._level_idx]
+
+        array = self.pyramid[self.level]
+        if prefetcher is None:
+            slab = array[start:stop, ...]
+        else:
+            # scrolling by one slice only reads the slice entering the slab; the rest are cached
+            slab = np.stack([prefetcher[idx] for idx in range(start, stop)])
+        return project_slab(slab, self.projection, array.dtype)
+
+    def _load_async(self):
+        """
+        The current slice if it is cached; otherwise, start reading it in the background and return a preview,
+        or None if there is no cheap preview
+        """
+        prefetcher = self._prefetcher(self.level)
+        idx = self._level_idx
+        data = prefetcher.get(idx)
+        if data is not None:
+            self._loading = None
+            return data
+
+        target = (self.level, idx)
+        if self._loading is None or self._loading[0] != target:
+            if self._loading is not None:
+                # discard the read of a slice which has been scrolled past, if it has not started
+                self._loading[1].cancel()
+            future = prefetcher.request(idx)
+            self._loading = (target, future)
+            self._watch(future, functools.partial(self._onloaded, target))
+            logger.debug("Loading slice %s of level %s in the background", idx, self.level)
+        return self._preview(idx)
+
+    def _onloaded(self, target, _):
+        if self._loading is not None and self._loading[0] == target:
+            self._update()
+
+    def _preview(self, idx):
+        """Low-resolution version of slice ``idx`` of the current level, if one is cheap to read"""
+        array = self.pyramid[self.level]
+        fz = self.pyramid.factors[self.level][0]
+        for level in range(self.level + 1, len(self.pyramid)):
+            coarse = self.pyramid[level]
+            if isinstance(coarse, DownsampledVolume):
+                break
+            shape = coarse.shape[1:3]
+            if shape[0] * shape[1] <= PREVIEW_PIXELS or level == len(self.pyramid) - 1:
+                coarse_idx = idx * fz // self.pyramid.factors[level][0]
+                return np.asarray(coarse[min(coarse_idx, coarse.shape[0] - 1), ...])
+
+        if isinstance(getattr(array, "source", array), np.ndarray):
+            # strided reads of memory-mapped data only touch the pages of the rows read
+            height, width = array.shape[1:3]
+            stride = max(1, int(np.ceil(np.sqrt(height * width / PREVIEW_PIXELS))))
+            return np.asarray(array[idx, ::stride, ::stride])
+        return None
 
     def _update(self):
-        self.im.set_data(self.cmap(self._slice))
-        self.ax.set_title(self.title_formatstr.format(self.idx))
-        self.im.axes.figure.canvas.draw()
+        if self._task_timer is None and self._tasks:
+            # no event loop timer to poll background tasks with
+            self._poll_tasks()
+        start = time.perf_counter()
+        with timed("viewer.update"):
+            level = self._choose_level()
+            if level != self.level:
+                logger.debug("Switching to level of detail %s", level)
+                self.level = level
+                self._set_extent()
+            loading = False
+            with timed("viewer.slice") as timing:
+                if (
+                    self.async_load
+                    and self.slab == 1
+                    and self._prefetcher(self.level) is not None
+                ):
+                    data = self._load_async()
+                    loading = self._loading is not None
+                else:
+                    data = self._slice
+                timing.nbytes = getattr(data, "nbytes", 0)
+            if data is not None:
+                with timed("viewer.render"):
+                    self.im.set_data(self._render(data))
+            slab_start, slab_stop = self._slab_bounds()
+            prefetcher = self._prefetcher(self.level)
+            if prefetcher is not None:
+                # read ahead of the leading edge of the slab
+                edge = slab_stop - 1 if self.direction > 0 else slab_start
+                prefetcher.prefetch(edge, self.direction)
+            title = self.title_formatstr.format(self.idx)
+            if slab_stop - slab_start > 1:
+                fz = self.pyramid.factors[self.level][0]
+                title += " ({} of {}-{})".format(
+                    self.projection,
+                    slab_start * fz,
+                    min(slab_stop * fz, self.slices) - 1,
+                )
+            if loading:
+                title += " (loading)"
+            if self.level:
+                title += " (downsampled x{})".format(
+                    max(self.pyramid.factors[self.level][1:])
+                )
+            self.ax.set_title(title)
+            with timed("viewer.draw"):
+                if self._background is None or self._background_bounds != tuple(
+                    self.fig.bbox.bounds
+                ):
+                    self._canvas.draw()
+                else:
+                    self._blit()
+        logger.debug(
+            "Rendered slice %s in %.1fms", self.idx, (time.perf_counter() - start) * 1000
+        )
 
     @classmethod
     def from_file(
-        cls, path, offset=None, shape=None, internal_path=None, ftype=None, **kwargs
+        cls,
+        path,
+        offset=None,
+        shape=None,
+        internal_path=None,
+        ftype=None,
+        lazy=False,
+        save_stats=False,
+        **kwargs
     ):
         """
         Instantiate a DataViewer from a path to a file in a variety of formats.
@@ -124,7 +717,7 @@ class DataViewer(object):
         ----------
         path : str or PathLike
             Path to dataset file
-        ftype : {'n5', 'h5', 'hdf', 'hdf5', 'zarr', 'npy', 'npz', 'json', 'tif', 'tiff'}, optional
+        ftype : {'n5', 'h5', 'hdf', 'hdf5', 'zarr', 'npy', 'npz', 'json', 'raw', 'bin', 'tif', 'tiff'}, optional
             File type. By default, infer from path extension.
         offset : array-like, optional
             Offset of ROI from (0, 0, 0). By default, start at (0, 0, 0)
@@ -132,14 +725,75 @@ class DataViewer(object):
             Shape of ROI. By default, take the whole array.
         internal_path : str, optional
             For dataset file types which need it, an internal path to the dataset
+        lazy : bool, optional
+            Whether to read slices from the file as they are displayed, rather than reading the whole ROI
+            into memory up front (default False). The file is held open until the figure is closed.
+            If ``internal_path`` is a multiscale group, all of its levels are used for levels of detail.
+        workers : int, optional
+            Number of workers with which to decode image stacks in parallel (default 1)
+        save_stats : bool, optional
+            If ``contrast`` is given in ``kwargs``, whether to save the volume statistics alongside the file
+            (as ``<path>.sdvstats.json``) when they have been computed, so that they can be reused (default False).
+            If the file cannot be written, e.g. because the directory is read-only, the statistics are not saved.
+        chunk_cache_bytes : int, optional
+            With ``lazy``, budget for decompressed chunk-aligned slabs of chunked HDF5, N5 and zarr datasets
+            (default 256MiB). 0 or None to disable.
+        hdf5_cache_bytes : int, optional
+            Size of HDF5's raw chunk cache per dataset. Default HDF5's default.
+        dtype : np.dtype, optional
+            Data type for formats which do not record one: required for raw files, and inferred from the values
+            of JSON files if not given.
+        volume_shape : array-like, optional
+            For raw files, shape of the whole volume. One dimension may be -1, to be inferred from the file size.
+        byte_order : {"little", "big", "native"}, optional
+            For raw files, byte order of the data. Default native.
+        header_bytes : int, optional
+            For raw files, number of bytes before the volume (default 0)
+        disk_cache : DiskCache, optional
+            Persistent cache of decoded image stacks and JSON volumes, so that they are only decoded once
+        step : array-like, optional
+            Read only every ``step``-th voxel of the ROI along each dimension. Default (1, 1, 1).
+        max_memory : int, optional
+            Budget in bytes for reading the ROI into memory. If it would be exceeded, the file is opened as with
+            ``lazy`` if the format allows, and otherwise only every n-th voxel is read, for the smallest n which
+            fits the budget.
+        shared_cache : SharedSliceCache, optional
+            Cache in shared memory of decoded volumes (or, with ``lazy``, planes), which other processes
+            viewing the same data read rather than decoding it again
         kwargs
-            Passed to DataViewer constructor after ``volume``
+            Other keyword arguments are passed to DataViewer constructor after ``volume``
 
         Returns
         -------
         DataViewer
         """
-        vol = FileReader(
-            path, offset=offset, shape=shape, internal_path=internal_path
-        ).read(ftype)
-        return DataViewer(vol, **kwargs)
+        reader = FileReader(
+            path,
+            offset=offset,
+            shape=shape,
+            internal_path=internal_path,
+            **pop_reader_kwargs(kwargs)
+        )
+        if kwargs.get("contrast") is not None and kwargs.get("stats") is None:
+            kwargs["stats"] = load_statistics(reader)
+            if kwargs["stats"] is not None:
+                logger.info("Using saved statistics for %s", path)
+
+        if not lazy and not reader.fits_in_memory(ftype) and reader.opens_lazily(ftype):
+            logger.warning("%s is larger than the memory budget, reading it lazily", path)
+            lazy = True
+
+        if not lazy:
+            dv = DataViewer(reader.read(ftype), **kwargs)
+        else:
+            vol = reader.open_multiscale(ftype)
+            try:
+                dv = DataViewer(vol, **kwargs)
+            except Exception:
+                vol.close()
+                raise
+            dv.owns_volume = True
+
+        if save_stats and kwargs.get("contrast") is not None and dv.statistics is None:
+            dv.add_statistics_callback(functools.partial(save_statistics, reader))
+        return dv
@@ -4,12 +4,12 @@ import warnings
 import numpy as np
 import pytest
 
-from smalldataviewer.ext import h5py, NoSuchModule, z5py, imageio
+from smalldataviewer.ext import h5py, z5py, imageio
 from tests.constants import INTERNAL_PATH
 
 
 def hdf5_file(path, array):
-    if isinstance(h5py, NoSuchModule):
+    if not h5py:
         pytest.skip("h5py not installed")
 
     with h5py.File(path, "w") as f:
@@ -40,7 +40,7 @@ def json_file_no_path(path, array):
 
 
 def n5_file(path, array):
-    if isinstance(z5py, NoSuchModule):
+    if not z5py:
         pytest.skip("z5py not installed")
 
     with z5py.File(path, use_zarr_format=False) as f:
@@ -52,7 +52,7 @@ def n5_file(path, array):
 
 
 def zarr_file(path, array):
-    if isinstance(z5py, NoSuchModule):
+    if not z5py:
         pytest.skip("z5py not installed")
 
     with z5py.File(path, use_zarr_format=True) as f:
@@ -64,7 +64,7 @@ def zarr_file(path, array):
 
 
 def imageio_mim_file(path, array):
-    if isinstance(imageio, NoSuchModule):
+    if not imageio:
         pytest.skip("imageio not installed")
 
     with warnings.catch_warnings():
@@ -74,7 +74,7 @@ def imageio_mim_file(path, array):
 
 
 def imageio_vol_file(path, array):
-    if isinstance(imageio, NoSuchModule):
+    if not imageio:
         pytest.skip("imageio not installed")
 
     imageio.volwrite(path, array)
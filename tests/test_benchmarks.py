@@ -0,0 +1,30 @@
+import json
+
+from benchmarks.run import main
+
+
+def test_benchmarks_run(tmpdir):
+    output = str(tmpdir.join("bench.json"))
+    main(
+        [
+            "--shape=4,32,32",
+            "--frames=5",
+            "--repeats=1",
+            "--formats",
+            "npy",
+            "json",
+            "raw",
+            "sequence",
+            "--output",
+            output,
+        ]
+    )
+    with open(output) as f:
+        results = json.load(f)
+
+    assert results["meta"]["shape"] == [4, 32, 32]
+    for name in ("npy", "json", "raw", "sequence"):
+        result = results["formats"][name]
+        assert result["read"]["mb_per_second"] > 0
+        for key in ("scroll", "scroll_lazy"):
+            assert result[key]["p50"] <= result[key]["max"]
@@ -0,0 +1,117 @@
+import threading
+
+import numpy as np
+import pytest
+
+from smalldataviewer.cache import SliceCache, Prefetcher, ChunkedDataset
+
+
+def test_cache_evicts_least_recently_used():
+    cache = SliceCache(max_bytes=30)
+    for key in "abc":
+        cache.put(key, np.zeros(10, dtype=np.uint8))
+    cache.get("a")
+    cache.put("d", np.zeros(10, dtype=np.uint8))
+
+    assert "b" not in cache
+    assert all(key in cache for key in "acd")
+    assert cache.nbytes == 30
+
+
+def test_cache_skips_oversized():
+    cache = SliceCache(max_bytes=5)
+    cache.put("a", np.zeros(10, dtype=np.uint8))
+    assert len(cache) == 0
+
+
+def test_cache_info_counts():
+    cache = SliceCache(max_bytes=100)
+    cache.put("a", np.zeros(10, dtype=np.uint8))
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+    info = cache.info()
+    assert (info.hits, info.misses, info.currsize, info.nbytes) == (2, 1, 1, 10)
+
+
+class RecordingFetch(object):
+    def __init__(self):
+        self.fetched = []
+        self.lock = threading.Lock()
+
+    def __call__(self, idx):
+        with self.lock:
+            self.fetched.append(idx)
+        return np.full(4, idx)
+
+
+@pytest.mark.parametrize(
+    "idx,direction,expected",
+    [(5, 1, [6, 7, 4]), (5, -1, [4, 3, 6]), (0, -1, [1]), (9, 1, [8])],
+)
+def test_prefetch_window(idx, direction, expected):
+    prefetcher = Prefetcher(RecordingFetch(), 10, ahead=2, behind=1, workers=0)
+    assert prefetcher.window(idx, direction) == expected
+
+
+def test_prefetch_warms_cache():
+    fetch = RecordingFetch()
+    prefetcher = Prefetcher(fetch, 10, ahead=2, behind=1)
+    assert prefetcher[5][0] == 5
+    prefetcher.prefetch(5, 1)
+    prefetcher.close()
+
+    assert sorted(fetch.fetched) == [4, 5, 6, 7]
+    assert prefetcher[6][0] == 6
+    assert fetch.fetched.count(6) == 1
+
+
+class CountingDataset:
+    def __init__(self, arr, chunks):
+        self.arr = arr
+        self.shape = arr.shape
+        self.dtype = arr.dtype
+        self.chunks = chunks
+        self.reads = []
+
+    def __getitem__(self, key):
+        self.reads.append(key)
+        return self.arr[key]
+
+
+def test_chunked_dataset_reads_aligned_slabs():
+    arr = np.arange(10 * 4 * 5).reshape(10, 4, 5)
+    ds = CountingDataset(arr, (4, 2, 5))
+    chunked = ChunkedDataset(ds, SliceCache())
+
+    for z in range(10):
+        assert np.array_equal(chunked[z, 1:3, :], arr[z, 1:3, :])
+    assert [key[0] for key in ds.reads] == [slice(0, 4), slice(4, 8), slice(8, 10)]
+    assert np.array_equal(chunked[-1], arr[-1])
+
+
+def test_chunked_dataset_reads_oversized_slabs_directly():
+    arr = np.zeros((8, 4, 4), dtype=np.uint8)
+    ds = CountingDataset(arr, (8, 4, 4))
+    chunked = ChunkedDataset(ds, SliceCache(max_bytes=100))
+
+    assert np.array_equal(chunked[3], arr[3])
+    assert ds.reads[0][0] == 3
+
+
+def test_chunked_datasets_named_by_identity():
+    cache = SliceCache()
+    first = np.zeros((4, 4, 4))
+    second = np.ones((4, 4, 4))
+    ChunkedDataset(CountingDataset(first, (4, 4, 4)), cache)[0]
+    # not served the slabs of another dataset, even if it reuses the id of one since collected
+    assert np.array_equal(
+        ChunkedDataset(CountingDataset(second, (4, 4, 4)), cache)[0], second[0]
+    )
+
+    ds = CountingDataset(second, (4, 4, 4))
+    ChunkedDataset(ds, cache, name="same")[0]
+    reopened = ChunkedDataset(ds, cache, name="same")
+    assert np.array_equal(reopened[1], second[1])
+    assert len(ds.reads) == 1
+    assert not reopened._slab_locks
@@ -0,0 +1,80 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from smalldataviewer.diskcache import DiskCache
+from smalldataviewer.files import FileReader
+
+from .constants import OFFSET, SHAPE, INTERNAL_PATH
+from .file_helpers import json_file
+
+
+@pytest.fixture
+def json_path(tmpdir, padded_array):
+    path = str(tmpdir.join("data.json"))
+    json_file(path, padded_array)
+    return path
+
+
+def test_read_through_cache(tmpdir, json_path, array):
+    cache = DiskCache(str(tmpdir.join("cache")))
+    reader = FileReader(
+        json_path, offset=OFFSET, shape=SHAPE, internal_path=INTERNAL_PATH, disk_cache=cache
+    )
+    first = reader.read()
+    assert len(cache.entries()) == 1
+
+    second = reader.read()
+    assert isinstance(second, np.memmap)
+    assert np.array_equal(first, array)
+    assert np.array_equal(second, array)
+
+    with reader.open() as arr:
+        assert isinstance(arr.source, np.memmap)
+        assert np.array_equal(arr[2], array[2])
+
+
+def test_key_changes_with_file_and_roi(tmpdir, json_path, padded_array):
+    cache = DiskCache(str(tmpdir.join("cache")))
+    reader = FileReader(json_path, internal_path=INTERNAL_PATH)
+    key = cache.key(reader)
+    assert cache.key(FileReader(json_path, internal_path=INTERNAL_PATH, offset=OFFSET)) != key
+    assert cache.key(FileReader(json_path, internal_path=INTERNAL_PATH, dtype="uint16")) != key
+
+    stat = os.stat(json_path)
+    os.utime(json_path, (stat.st_atime, stat.st_mtime + 10))
+    assert cache.key(reader) != key
+
+
+def test_not_cached_for_mapped_formats(tmpdir, padded_array):
+    path = str(tmpdir.join("data.npy"))
+    np.save(path, padded_array)
+    cache = DiskCache(str(tmpdir.join("cache")))
+    FileReader(path, disk_cache=cache).read()
+    assert cache.entries() == []
+
+
+def test_lru_eviction(tmpdir):
+    arrays = [np.full((10, 10), i, dtype=np.uint8) for i in range(4)]
+    entry_bytes = 228  # 100 bytes of data, and the npy header
+    cache = DiskCache(str(tmpdir), max_bytes=3 * entry_bytes)
+    for i, arr in enumerate(arrays[:3]):
+        assert cache.put(str(i), arr)
+        os.utime(cache._path(str(i)), (0, time.time() - 100 + i))
+
+    # use the oldest, so that the second oldest is evicted
+    assert np.array_equal(cache.get("0"), arrays[0])
+    cache.put("3", arrays[3])
+
+    assert cache.get("1") is None
+    for key in ("0", "2", "3"):
+        assert cache.get(key) is not None
+    assert cache.nbytes() <= cache.max_bytes
+
+
+def test_too_large_not_cached(tmpdir):
+    cache = DiskCache(str(tmpdir), max_bytes=10)
+    assert not cache.put("big", np.zeros(100))
+    assert cache.get("big") is None
@@ -0,0 +1,81 @@
+import json
+import logging
+import os
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from smalldataviewer.export import export, main, PNG_PATTERN
+from smalldataviewer.ext import imageio
+from smalldataviewer.render import LUTRenderer
+
+
+@pytest.fixture
+def npy_path(tmpdir, array):
+    path = str(tmpdir.join("data.npy"))
+    np.save(path, array)
+    return path
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_export_png(tmpdir, npy_path, array, workers):
+    png_dir = str(tmpdir.join("png"))
+    count = export(
+        dict(path=npy_path),
+        start=2,
+        stop=12,
+        step=3,
+        png_dir=png_dir,
+        workers=workers,
+    )
+    assert count == 4
+    assert sorted(os.listdir(png_dir)) == [PNG_PATTERN.format(i) for i in (2, 5, 8, 11)]
+
+    expected = LUTRenderer(plt.get_cmap("gray"))(array[5])
+    written = plt.imread(os.path.join(png_dir, PNG_PATTERN.format(5)))
+    assert np.array_equal((written * 255).round().astype(np.uint8), expected)
+
+
+def test_export_sheet_and_gif(tmpdir, npy_path, array):
+    if not imageio:
+        pytest.skip("imageio not installed")
+    sheet = str(tmpdir.join("sheet.png"))
+    gif = str(tmpdir.join("anim.gif"))
+    count = export(
+        dict(path=npy_path), step=4, gif=gif, sheet=sheet, columns=2, scale=2
+    )
+    assert count == 5
+
+    h, w = array.shape[1] // 2, array.shape[2] // 2
+    assert plt.imread(sheet).shape[:2] == (3 * h, 2 * w)
+    assert len(imageio.mimread(gif)) == 5
+
+
+def test_export_not_lazy_in_process(tmpdir, array, caplog):
+    path = str(tmpdir.join("data.json"))
+    with open(path, "w") as f:
+        json.dump(array.tolist(), f)
+    png_dir = str(tmpdir.join("png"))
+    with caplog.at_level(logging.WARNING):
+        count = export(dict(path=path), stop=3, png_dir=png_dir, workers=2)
+    assert count == 3
+    assert "cannot be read lazily" in caplog.text
+    assert len(os.listdir(png_dir)) == 3
+
+
+def test_export_requires_output(npy_path):
+    with pytest.raises(ValueError, match="No output"):
+        export(dict(path=npy_path))
+
+
+def test_export_cli(tmpdir, npy_path):
+    png_dir = str(tmpdir.join("png"))
+    main([npy_path, "--png", png_dir, "--stop", "3", "--contrast", "minmax"])
+    assert len(os.listdir(png_dir)) == 3
+
+
+def test_export_cli_every(tmpdir, npy_path):
+    png_dir = str(tmpdir.join("png"))
+    main([npy_path, "--png", png_dir, "--every", "5", "--workers", "2"])
+    assert sorted(os.listdir(png_dir)) == [PNG_PATTERN.format(i) for i in (0, 5, 10, 15)]
@@ -1,3 +1,4 @@
+import json
 import os
 
 import numpy as np
@@ -9,9 +10,21 @@ except ImportError:
     import mock
 
 from smalldataviewer import DataViewer
-from smalldataviewer.files import offset_shape_to_slicing, FileReader, NORMALISED_TYPES
+from smalldataviewer.files import (
+    offset_shape_to_slicing,
+    FileReader,
+    ImageioStack,
+    ImageSequence,
+    NORMALISED_TYPES,
+    StridedDataset,
+    natural_key,
+    stream_npz_member,
+)
 
 from .constants import OFFSET, SHAPE, INTERNAL_PATH
+from .file_helpers import imageio_mim_file
+from smalldataviewer import files
+from smalldataviewer.ext import h5py, imageio
 
 
 @pytest.mark.parametrize(
@@ -32,6 +45,15 @@ def test_offset_shape_to_slicing(offset, shape, expected):
     assert offset_shape_to_slicing(offset, shape) == expected
 
 
+def test_offset_shape_to_slicing_step():
+    assert offset_shape_to_slicing((1, 1, 1), (4, 4, 4), (1, 2, 3)) == (
+        slice(1, 5),
+        slice(1, 5, 2),
+        slice(1, 5, 3),
+    )
+    assert offset_shape_to_slicing(step=(2, 2, 2)) == (slice(None, None, 2),) * 3
+
+
 def test_read_file(data_file, array):
     path, has_ipath = data_file
 
@@ -99,3 +121,336 @@ def test_dataviewer_from_file(data_file, array, subplots_patch):
         pytest.xfail("swf comparison is hard due to compression and dimensions")
 
     assert np.allclose(dv.volume, array)
+
+
+def test_open_file(data_file, array):
+    path, has_ipath = data_file
+
+    ipath = INTERNAL_PATH if has_ipath else None
+
+    with FileReader(path, internal_path=ipath, offset=OFFSET, shape=SHAPE).open() as arr:
+        if path.endswith("swf"):
+            pytest.xfail("swf comparison is hard due to compression and dimensions")
+
+        assert arr.shape == array.shape
+        assert np.allclose(arr[5], array[5])
+        assert np.allclose(arr[:, 3:-3:2, -1], array[:, 3:-3:2, -1])
+        assert np.allclose(arr, array)
+
+
+def test_dataviewer_from_file_lazy(data_file, array, subplots_patch):
+    path, has_ipath = data_file
+
+    dv = DataViewer.from_file(
+        path,
+        internal_path=INTERNAL_PATH if has_ipath else None,
+        offset=OFFSET,
+        shape=SHAPE,
+        lazy=True,
+    )
+
+    if path.endswith("swf"):
+        pytest.xfail("swf comparison is hard due to compression and dimensions")
+
+    assert np.allclose(dv._slice, array[0])
+    dv.close()
+    assert dv.volume.closed
+
+
+def test_read_npy_is_memory_mapped(tmpdir, padded_array, array):
+    path = str(tmpdir.join("data.npy"))
+    np.save(path, padded_array)
+
+    data = FileReader(path, offset=OFFSET, shape=SHAPE).read()
+
+    assert isinstance(data.base, np.memmap)
+    assert np.array_equal(data, array)
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+@pytest.mark.parametrize("order", ["C", "F"])
+def test_read_npz_member(tmpdir, padded_array, array, compressed, order):
+    path = str(tmpdir.join("data.npz"))
+    save = np.savez_compressed if compressed else np.savez
+    save(path, other=np.zeros(3), **{INTERNAL_PATH: np.asarray(padded_array, order=order)})
+
+    data = FileReader(path, offset=OFFSET, shape=SHAPE, internal_path=INTERNAL_PATH).read()
+
+    assert isinstance(data.base, np.memmap) != compressed
+    assert np.array_equal(data, array)
+
+
+def test_imageio_reads_only_roi_frames(tmpdir, padded_array, array):
+    path = str(tmpdir.join("data.tiff"))
+    imageio_mim_file(path, padded_array)
+
+    decoded = []
+    original = ImageioStack.frame
+
+    def frame(self, idx):
+        decoded.append(idx)
+        return original(self, idx)
+
+    with mock.patch.object(ImageioStack, "frame", frame):
+        with FileReader(path, offset=OFFSET, shape=SHAPE).open() as arr:
+            assert np.array_equal(arr[3], array[3])
+            assert decoded[-1] == OFFSET[0] + 3
+            assert np.array_equal(arr[...], array)
+
+    assert sorted(set(decoded)) == list(range(OFFSET[0], OFFSET[0] + SHAPE[0]))
+
+
+@pytest.mark.parametrize("ext", ["tiff", "bsdf"])
+def test_imageio_parallel_decode(tmpdir, padded_array, array, ext):
+    path = str(tmpdir.join("data." + ext))
+    imageio_mim_file(path, padded_array)
+
+    data = FileReader(path, offset=OFFSET, shape=SHAPE, workers=3).read()
+
+    assert np.array_equal(data, array)
+
+
+def test_open_multiscale(tmpdir, padded_array, array):
+    if not h5py:
+        pytest.skip("h5py not installed")
+    path = str(tmpdir.join("data.hdf5"))
+    with h5py.File(path, "w") as f:
+        f.create_dataset(INTERNAL_PATH + "/s0", data=padded_array)
+        f.create_dataset(INTERNAL_PATH + "/s1", data=padded_array[::2, ::2, ::2])
+
+    reader = FileReader(path, internal_path=INTERNAL_PATH, offset=OFFSET, shape=SHAPE)
+    pyramid = reader.open_multiscale()
+    try:
+        assert pyramid.factors == [(1, 1, 1), (2, 2, 2)]
+        assert np.array_equal(pyramid[0][...], array)
+        assert np.array_equal(pyramid[1][...], array[::2, ::2, ::2])
+    finally:
+        pyramid.close()
+    assert pyramid[0].closed
+
+    assert np.array_equal(reader.read(), array)
+
+
+def test_open_chunked_hdf5(tmpdir, padded_array, array):
+    if not h5py:
+        pytest.skip("h5py not installed")
+    path = str(tmpdir.join("data.hdf5"))
+    with h5py.File(path, "w") as f:
+        f.create_dataset(INTERNAL_PATH, data=padded_array, chunks=(4, 5, 5))
+
+    reader = FileReader(
+        path,
+        internal_path=INTERNAL_PATH,
+        offset=OFFSET,
+        shape=SHAPE,
+        hdf5_cache_bytes=4 * 1024 ** 2,
+    )
+    with reader.open() as arr:
+        for z in range(len(array)):
+            assert np.array_equal(arr[z], array[z])
+        info = reader.chunk_cache.info()
+    assert info.misses == -(-(OFFSET[0] + SHAPE[0]) // 4) - OFFSET[0] // 4
+    assert info.hits == len(array) - info.misses
+
+
+@pytest.mark.parametrize("byte_order", ["little", "big"])
+@pytest.mark.parametrize("header_bytes", [0, 17])
+def test_read_raw(tmpdir, padded_array, array, byte_order, header_bytes):
+    path = str(tmpdir.join("data.raw"))
+    data = padded_array.astype({"little": "<u2", "big": ">u2"}[byte_order]) * 257
+    with open(path, "wb") as f:
+        f.write(b"\0" * header_bytes)
+        f.write(data.tobytes())
+
+    reader = FileReader(
+        path,
+        offset=OFFSET,
+        shape=SHAPE,
+        dtype="uint16",
+        volume_shape=(-1,) + padded_array.shape[1:],
+        byte_order=byte_order,
+        header_bytes=header_bytes,
+    )
+    with reader.open() as arr:
+        assert isinstance(arr.source, np.memmap)
+        assert arr.shape == array.shape
+        assert arr.dtype.isnative
+        assert np.array_equal(arr[3], array[3].astype(np.uint16) * 257)
+    assert np.array_equal(reader.read(), array.astype(np.uint16) * 257)
+
+
+def test_raw_requires_dtype_and_shape(tmpdir, padded_array):
+    path = str(tmpdir.join("data.bin"))
+    padded_array.tofile(path)
+    with pytest.raises(ValueError, match="required"):
+        FileReader(path, dtype="uint8").read()
+    with pytest.raises(ValueError, match="needs"):
+        FileReader(path, dtype="uint16", volume_shape=padded_array.shape).read()
+
+
+def image_sequence(tmpdir, padded_array):
+    if not imageio:
+        pytest.skip("imageio not installed")
+    dpath = tmpdir.mkdir("slices")
+    for idx, plane in enumerate(padded_array):
+        imageio.imwrite(str(dpath.join("slice_{}.png".format(idx))), plane)
+    dpath.join("notes.txt").write("not an image")
+    return str(dpath)
+
+
+def test_natural_key():
+    names = ["s10.png", "s2.png", "s1.png"]
+    assert sorted(names, key=natural_key) == ["s1.png", "s2.png", "s10.png"]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+@pytest.mark.parametrize("use_glob", [False, True])
+def test_read_sequence(tmpdir, padded_array, array, workers, use_glob):
+    path = image_sequence(tmpdir, padded_array)
+    if use_glob:
+        path = os.path.join(path, "slice_*.png")
+    reader = FileReader(path, offset=OFFSET, shape=SHAPE, workers=workers)
+    assert reader.ftype == "sequence"
+    assert np.array_equal(reader.read(), array)
+
+
+def test_open_sequence_decodes_on_demand(tmpdir, padded_array, array):
+    path = image_sequence(tmpdir, padded_array)
+    with mock.patch(
+        "smalldataviewer.files.decode_image", wraps=files.decode_image
+    ) as decode:
+        with FileReader(path, offset=OFFSET, shape=SHAPE).open() as arr:
+            assert isinstance(arr.source, ImageSequence)
+            assert arr.shape == array.shape
+            assert decode.call_count == 1
+            assert np.array_equal(arr[5], array[5])
+            assert decode.call_count == 2
+
+
+def test_existing_file_with_wildcards_not_glob(tmpdir, padded_array):
+    path = str(tmpdir.join("scan[1].tiff"))
+    imageio_mim_file(path, padded_array)
+    reader = FileReader(path)
+    assert reader.ftype != "sequence"
+    assert np.array_equal(reader.read(), padded_array)
+
+
+def test_sequence_shape_mismatch(tmpdir, padded_array):
+    path = image_sequence(tmpdir, padded_array)
+    imageio.imwrite(os.path.join(path, "slice_3.png"), padded_array[3, :5])
+    with pytest.raises(ValueError, match="shape"):
+        FileReader(path).read()
+
+
+class FrameReader:
+    """Stands in for an imageio reader which can only be iterated, recording how many frames were decoded"""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.decoded = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def __iter__(self):
+        for frame in self.frames:
+            self.decoded += 1
+            yield frame
+
+
+def test_read_imageio_sequential_stops_at_roi(array):
+    frames = FrameReader(list(array))
+    reader = FileReader("data.gif", offset=(0, 0, 0), shape=(5, 20, 20), step=(4, 1, 1))
+    with mock.patch("smalldataviewer.files.imageio") as imageio_mock:
+        imageio_mock.get_reader.return_value = frames
+        data = reader._read_imageio_sequential()
+    assert np.array_equal(data, array[:5:4])
+    assert frames.decoded == 6
+
+
+STEP = (2, 3, 1)
+
+
+def test_read_file_step(data_file, array):
+    path, has_ipath = data_file
+    if path.endswith("swf"):
+        pytest.xfail("swf comparison is hard due to compression and dimensions")
+    if path.endswith("gif"):
+        pytest.xfail("recent imageio versions decode gif frames as RGB")
+
+    ipath = INTERNAL_PATH if has_ipath else None
+    reader = FileReader(
+        path, internal_path=ipath, offset=OFFSET, shape=SHAPE, step=STEP
+    )
+    expected = array[::2, ::3, ::1]
+    assert np.allclose(reader.read(), expected)
+    with reader.open() as arr:
+        assert arr.shape == expected.shape
+        assert np.allclose(arr[1], expected[1])
+
+
+def test_stream_npz_member_step(tmpdir, padded_array):
+    path = str(tmpdir.join("data.npz"))
+    np.savez_compressed(path, **{INTERNAL_PATH: padded_array})
+    slicing = (slice(1, 20, 3), slice(2, 10, 2), slice(None))
+    data = stream_npz_member(path, INTERNAL_PATH + ".npy", slicing)
+    assert np.array_equal(data, padded_array[slicing])
+
+
+class ContiguousDataset:
+    def __init__(self, arr):
+        self.arr = arr
+        self.shape = arr.shape
+        self.dtype = arr.dtype
+        self.reads = []
+
+    def __getitem__(self, key):
+        for item in key:
+            assert not isinstance(item, slice) or item.step in (None, 1)
+        self.reads.append(key)
+        return self.arr[key]
+
+
+def test_strided_dataset(padded_array):
+    ds = ContiguousDataset(padded_array)
+    strided = StridedDataset(ds)
+    key = (slice(1, 20, 4), slice(2, 11, 3), 5)
+    assert np.array_equal(strided[key], padded_array[key])
+    assert len(ds.reads) == len(range(1, 20, 4))
+    assert np.array_equal(strided[3, ::2], padded_array[3, ::2])
+
+
+def test_max_memory_strides(tmpdir, padded_array, array):
+    path = str(tmpdir.join("data.npy"))
+    np.save(path, padded_array)
+    reader = FileReader(
+        path, offset=OFFSET, shape=SHAPE, max_memory=array.nbytes // 8
+    )
+    assert not reader.fits_in_memory()
+    assert reader.estimate_nbytes() == array.nbytes
+    data = reader.read()
+    assert data.nbytes <= array.nbytes // 8
+    assert np.array_equal(data, array[::2, ::2, ::2])
+
+
+def test_max_memory_unknown_size(tmpdir, padded_array, array):
+    path = str(tmpdir.join("data.json"))
+    with open(path, "w") as f:
+        json.dump(padded_array.tolist(), f)
+    reader = FileReader(path, offset=OFFSET, shape=SHAPE, max_memory=1)
+    assert reader.estimate_roi() is None
+    assert np.array_equal(reader.read(), array)
+
+
+def test_max_memory_opens_lazily(tmpdir, padded_array, array, subplots_patch):
+    path = str(tmpdir.join("data.npy"))
+    np.save(path, padded_array)
+    dv = DataViewer.from_file(
+        path, offset=OFFSET, shape=SHAPE, max_memory=array.nbytes // 8
+    )
+    assert dv.owns_volume
+    assert dv.volume.shape == array.shape
+    dv.close()
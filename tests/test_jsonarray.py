@@ -0,0 +1,81 @@
+import json
+
+import numpy as np
+import pytest
+
+from smalldataviewer.jsonarray import read_json_array, find_array
+
+from .constants import OFFSET, SHAPE, INTERNAL_PATH
+
+
+def dump(tmpdir, obj, **kwargs):
+    path = str(tmpdir.join("data.json"))
+    with open(path, "w") as f:
+        json.dump(obj, f, **kwargs)
+    return path
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_reads_roi(tmpdir, padded_array, array, indent):
+    path = dump(
+        tmpdir,
+        {"before": "[{]", INTERNAL_PATH: padded_array.tolist(), "after": [1]},
+        indent=indent,
+    )
+    slicing = tuple(slice(o, o + s) for o, s in zip(OFFSET, SHAPE))
+    data = read_json_array(path, INTERNAL_PATH, slicing)
+    assert data.dtype == np.int64
+    assert np.array_equal(data, array)
+
+
+@pytest.mark.parametrize(
+    "values,expected_dtype",
+    [
+        [[[[1.5, float("nan")], [float("inf"), -2e-3]]], np.float64],
+        [[[[1, None]]], np.float64],
+        [[[[True, False]]], np.bool_],
+        [[[[1, 2], [3, 4]]], np.int64],
+    ],
+)
+def test_infers_dtype(tmpdir, values, expected_dtype):
+    path = dump(tmpdir, values)
+    data = read_json_array(path)
+    assert data.dtype == expected_dtype
+    expected = np.array(values, dtype=np.float64 if expected_dtype == np.float64 else None)
+    assert np.array_equal(data, expected, equal_nan=data.dtype.kind == "f")
+
+
+def test_dtype_hint(tmpdir, array):
+    data = read_json_array(dump(tmpdir, array.tolist()), dtype=np.uint8)
+    assert data.dtype == np.uint8
+    assert np.array_equal(data, array)
+
+
+
+@pytest.mark.parametrize(
+    "values,dtype",
+    [
+        [[[[1.5, -2.0], [3.0, 4.25]]], np.int32],
+        [[[[True, False]]], np.uint8],
+        [[[[1, 2], [3, 4]]], np.float32],
+    ],
+)
+def test_dtype_hint_casts_values(tmpdir, values, dtype):
+    data = read_json_array(dump(tmpdir, values), dtype=dtype)
+    assert data.dtype == dtype
+    assert np.array_equal(data, np.array(values).astype(dtype))
+
+
+def test_ragged_raises(tmpdir):
+    with pytest.raises(ValueError, match="rectangular"):
+        read_json_array(dump(tmpdir, [[1, 2], [3]]))
+
+
+def test_missing_key_raises(tmpdir):
+    with pytest.raises(KeyError):
+        read_json_array(dump(tmpdir, {"a": [1]}), "b")
+
+
+def test_find_array_skips_nested_values():
+    buf = b'{"a": {"volume": [0]}, "b\\"": "volume", "volume": [[1]]}'
+    assert buf[find_array(buf, "volume") :] == b"[[1]]}"
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from smalldataviewer.lazy import LazyArray, roi_to_ranges
+
+
+class Handle(object):
+    def __init__(self):
+        self.close_count = 0
+
+    def close(self):
+        self.close_count += 1
+
+
+@pytest.fixture
+def padded():
+    return np.arange(10 * 12 * 14).reshape((10, 12, 14))
+
+
+@pytest.fixture
+def roi():
+    return slice(2, 8), slice(1, None), slice(None, 10)
+
+
+@pytest.mark.parametrize(
+    "key",
+    [
+        Ellipsis,
+        0,
+        -1,
+        (slice(None), 3),
+        (Ellipsis, 2),
+        (1, Ellipsis, slice(2, 5)),
+        (slice(None, None, 2), slice(1, -1, 3)),
+        (slice(None, None, -1), 0, slice(5, 1, -2)),
+        (slice(100, 200),),
+    ],
+)
+def test_indexing_matches_numpy(padded, roi, key):
+    expected = padded[roi][key]
+    actual = LazyArray(padded, roi)[key]
+    assert actual.shape == expected.shape
+    assert np.array_equal(actual, expected)
+
+
+def test_metadata(padded, roi):
+    arr = LazyArray(padded, roi)
+    assert arr.shape == padded[roi].shape
+    assert arr.ndim == 3
+    assert arr.dtype == padded.dtype
+    assert arr.nbytes == padded[roi].nbytes
+    assert np.array_equal(np.asarray(arr), padded[roi])
+
+
+def test_extra_dims_taken_whole():
+    assert roi_to_ranges((slice(1, 2),), (3, 4)) == (range(1, 2), range(0, 4))
+
+
+@pytest.mark.parametrize("key", [6, -7, (0, 11)])
+def test_out_of_bounds(padded, roi, key):
+    with pytest.raises(IndexError):
+        LazyArray(padded, roi)[key]
+
+
+def test_too_many_indices(padded):
+    with pytest.raises(IndexError):
+        LazyArray(padded)[0, 0, 0, 0]
+
+
+def test_close(padded):
+    handle = Handle()
+    with LazyArray(padded, handle=handle) as arr:
+        arr[0]
+    assert arr.closed
+    arr.close()
+    assert handle.close_count == 1
+    with pytest.raises(ValueError):
+        arr[0]
+
+
+def test_native_byte_order(padded, roi):
+    lazy = LazyArray(padded.astype(">i4"), roi)
+    assert lazy.dtype == np.dtype("int32")
+    assert lazy[0].dtype.isnative
+    assert np.array_equal(lazy[0], padded[roi][0])
@@ -1,6 +1,18 @@
+import os
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import numpy as np
 import pytest
 
-from smalldataviewer.__main__ import str_to_ints
+from smalldataviewer.__main__ import _main, add_raw_arguments, str_to_ints
+from smalldataviewer.export import main as export_main
 
 
 @pytest.mark.parametrize(
@@ -8,3 +20,65 @@ from smalldataviewer.__main__ import str_to_ints
 )
 def test_str_to_ints(s, expected):
     assert str_to_ints(s) == expected
+
+
+@pytest.mark.parametrize(
+    "args", [["--volume-shape", "?,40,50"], ["--volume-shape=-1,40,50"]]
+)
+def test_volume_shape_inferred_dimension(args):
+    parser = ArgumentParser()
+    add_raw_arguments(parser)
+    assert parser.parse_args(args).volume_shape == (-1, 40, 50)
+
+
+def test_volume_shape_cli(tmpdir, array):
+    path = str(tmpdir.join("data.raw"))
+    array.astype(np.uint16).tofile(path)
+    png_dir = str(tmpdir.join("png"))
+    export_main(
+        [path, "--dtype", "uint16", "--volume-shape", "?,20,20", "--png", png_dir]
+    )
+    assert len(os.listdir(png_dir)) == len(array)
+
+
+def test_export_subcommand(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    monkeypatch.setattr(sys, "argv", ["smalldataviewer", "export", "data.npy"])
+    with mock.patch("smalldataviewer.export.main") as export_main_mock:
+        _main()
+    export_main_mock.assert_called_once_with(["data.npy"])
+
+
+def test_file_named_export(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join("export").write("")
+    monkeypatch.setattr(sys, "argv", ["smalldataviewer", "export", "-t", "npy"])
+    with mock.patch("smalldataviewer.__main__._show") as show:
+        _main()
+    assert show.call_args[0][0].path == "export"
+
+
+STARTUP_SCRIPT = """
+import sys
+sys.argv = ["smalldataviewer", "{}"]
+from smalldataviewer.__main__ import _main
+try:
+    _main()
+except SystemExit:
+    pass
+print(",".join(sorted(name for name in {} if name in sys.modules)))
+"""
+
+HEAVY_MODULES = ("matplotlib", "mpl_colors", "h5py", "z5py", "pyn5", "PIL", "imageio")
+
+
+@pytest.mark.parametrize("flag", ["--version", "--help"])
+def test_startup_imports_no_backends(flag):
+    """Regression test for CLI startup time: nothing heavy should be imported before it is needed"""
+    result = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT.format(flag, HEAVY_MODULES)],
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    )
+    assert result.stdout.splitlines()[-1] == ""
@@ -0,0 +1,159 @@
+import threading
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from smalldataviewer.cache import Prefetcher
+from smalldataviewer.lazy import LazyArray
+from smalldataviewer.multi import MultiViewer
+from smalldataviewer.render import LabelRenderer, LUTRenderer
+
+
+class ScrollEvent(object):
+    def __init__(self, button):
+        self.button = button
+
+
+class BarrierVolume:
+    """Volume whose reads each wait until ``parties`` reads are in progress at once"""
+
+    def __init__(self, arr, barrier):
+        self.arr = arr
+        self.shape = arr.shape
+        self.dtype = arr.dtype
+        self.ndim = arr.ndim
+        self.barrier = barrier
+
+    def __getitem__(self, key):
+        self.barrier.wait(timeout=5)
+        return self.arr[key]
+
+
+def grey(plane):
+    return LUTRenderer(plt.get_cmap("gray"))(plane)[..., 0]
+
+
+@pytest.fixture
+def closing():
+    viewers = []
+    yield viewers.append
+    for viewer in viewers:
+        viewer.close()
+        plt.close(viewer.fig)
+
+
+def test_overlay_first_volume_opaque(array, closing):
+    mv = MultiViewer([array, array], alphas=[1.0, 0.0])
+    closing(mv)
+    image = mv.images[0].get_array()
+    assert image.shape == array.shape[1:] + (4,)
+    assert np.array_equal(image[..., 0], grey(array[0]))
+
+
+def test_overlay_blends(array, closing):
+    zeros = np.zeros_like(array)
+    mv = MultiViewer([array, zeros], alphas=[1.0, 0.5])
+    closing(mv)
+    image = mv.images[0].get_array()
+    assert np.allclose(image[..., 0], grey(array[0]) * 0.5, atol=1)
+
+
+def test_overlay_label_background_transparent(array, closing):
+    labels = np.zeros(array.shape, dtype=np.uint32)
+    labels[:, :5] = 7
+    mv = MultiViewer(
+        [array, labels], cmaps=[None, LabelRenderer()], alphas=[1.0, 1.0]
+    )
+    closing(mv)
+    image = mv.images[0].get_array()
+    assert np.array_equal(image[5:, :, 0], grey(array[0])[5:])
+    expected = LabelRenderer().colours(np.array([7]))[0]
+    assert np.array_equal(image[0, 0], expected)
+
+
+def test_tile_panels(array, closing):
+    mv = MultiViewer([array, 255 - array], layout="tile", names=["a", "b"])
+    closing(mv)
+    assert len(mv.axes) == 2
+    assert mv.axes[0].get_title().startswith("a: ")
+    mv._onscroll(ScrollEvent("up"))
+    assert np.array_equal(mv.images[1].get_array()[..., 0], grey(255 - array[1]))
+
+
+def test_scroll_in_lockstep(array, closing):
+    mv = MultiViewer([LazyArray(array), LazyArray(array * 0)], alphas=[1.0, 0.0])
+    closing(mv)
+    for _ in range(3):
+        mv._onscroll(ScrollEvent("up"))
+    assert mv.idx == 3
+    assert np.array_equal(mv.images[0].get_array()[..., 0], grey(array[3]))
+
+
+def test_shared_cache(array, closing):
+    mv = MultiViewer([LazyArray(array), LazyArray(array)], prefetch=0)
+    closing(mv)
+    info = mv.cache_info()
+    assert info.currsize == 2
+
+
+def test_reads_concurrently(array, closing):
+    barrier = threading.Barrier(2)
+    volumes = [BarrierVolume(array, barrier) for _ in range(2)]
+    # would time out if the volumes were read one after the other
+    mv = MultiViewer(volumes, prefetch=0)
+    closing(mv)
+    assert not barrier.broken
+
+
+def test_mismatched_shapes(array):
+    with pytest.raises(ValueError):
+        MultiViewer([array, array[:, :5]])
+
+
+def test_shared_executor_not_shut_down(array):
+    prefetcher = Prefetcher(array.__getitem__, len(array))
+    shared = Prefetcher(
+        array.__getitem__, len(array), executor=prefetcher._executor
+    )
+    shared.close()
+    assert np.array_equal(prefetcher.request(1).result(), array[1])
+    prefetcher.close()
+
+
+def test_from_files_options_per_file(tmpdir, array, closing):
+    raw = str(tmpdir.join("data.raw"))
+    array.astype(np.uint16).tofile(raw)
+    npy = str(tmpdir.join("overlay.npy"))
+    np.save(npy, array)
+    mv = MultiViewer.from_files(
+        [raw, npy],
+        file_kwargs=[dict(dtype="uint16", volume_shape=(-1,) + array.shape[1:]), dict()],
+    )
+    closing(mv)
+    assert mv.volumes[0].dtype == np.uint16
+    assert mv.volumes[1].dtype == array.dtype
+    assert np.array_equal(mv.volumes[1], array)
+
+
+def test_from_files_max_memory_opens_lazily(tmpdir, array, closing):
+    paths = [str(tmpdir.join("small.npy")), str(tmpdir.join("large.npy"))]
+    np.save(paths[0], array)
+    np.save(paths[1], array.astype(np.uint64))
+    mv = MultiViewer.from_files(paths, max_memory=array.nbytes // 2)
+    closing(mv)
+    assert isinstance(mv.volumes[1], LazyArray)
+    assert all(volume.shape == array.shape for volume in mv.volumes)
+
+
+def test_from_files_max_memory_common_step(tmpdir, array, closing):
+    paths = [str(tmpdir.join("small.npz")), str(tmpdir.join("large.npz"))]
+    np.savez_compressed(paths[0], data=array)
+    np.savez_compressed(paths[1], data=array.astype(np.uint64))
+    mv = MultiViewer.from_files(
+        paths, internal_paths=["data", "data"], max_memory=array.nbytes // 2
+    )
+    closing(mv)
+    # the smallest step with which the uint64 volume fits applies to both
+    assert np.array_equal(mv.volumes[0], array[::3, ::3, ::3])
+    assert np.array_equal(mv.volumes[1], array[::3, ::3, ::3])
@@ -0,0 +1,125 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from smalldataviewer.lazy import LazyArray
+from smalldataviewer.ortho import AccessPlanner, OrthoViewer
+from smalldataviewer.render import LabelRenderer
+
+
+class CountingDataset:
+    def __init__(self, arr, chunks):
+        self.arr = arr
+        self.shape = arr.shape
+        self.dtype = arr.dtype
+        self.chunks = chunks
+        self.reads = []
+
+    def __getitem__(self, key):
+        self.reads.append(key)
+        return self.arr[key]
+
+
+class DummyEvent(object):
+    def __init__(self, inaxes, button, xdata=None, ydata=None):
+        self.inaxes = inaxes
+        self.button = button
+        self.xdata = xdata
+        self.ydata = ydata
+
+
+@pytest.mark.parametrize("axis", [0, 1, 2])
+def test_planner_reads_planes(padded_array, axis):
+    ds = CountingDataset(padded_array, (4, 8, 8))
+    volume = LazyArray(ds, (slice(3, 20), slice(5, 30), slice(2, 40)))
+    expected = padded_array[3:20, 5:30, 2:40]
+    planner = AccessPlanner(volume)
+
+    for idx in range(expected.shape[axis]):
+        key = [slice(None)] * 3
+        key[axis] = idx
+        assert np.array_equal(planner.read_plane(axis, idx), expected[tuple(key)])
+
+    # one read per chunk-aligned slab
+    depth = ds.chunks[axis]
+    offset = volume.offset[axis]
+    assert len(ds.reads) == len(
+        {(offset + idx) // depth for idx in range(expected.shape[axis])}
+    )
+
+
+@pytest.mark.parametrize("axis", [0, 1, 2])
+def test_planner_strided_roi_aligned_to_chunks(padded_array, axis):
+    ds = CountingDataset(padded_array, (4, 8, 8))
+    volume = LazyArray(ds, (slice(3, 20, 3), slice(5, 30, 2), slice(2, 40, 5)))
+    expected = padded_array[3:20:3, 5:30:2, 2:40:5]
+    planner = AccessPlanner(volume)
+
+    for idx in range(expected.shape[axis]):
+        key = [slice(None)] * 3
+        key[axis] = idx
+        assert np.array_equal(planner.read_plane(axis, idx), expected[tuple(key)])
+
+    # one read per chunk holding planes of the ROI, each within that chunk
+    depth = ds.chunks[axis]
+    start, step = volume.offset[axis], volume.step[axis]
+    chunks = {(start + idx * step) // depth for idx in range(expected.shape[axis])}
+    assert len(ds.reads) == len(chunks)
+    for key in ds.reads:
+        read = range(*key[axis].indices(padded_array.shape[axis]))
+        assert read[0] // depth == read[-1] // depth
+
+
+def test_planner_memmap_reads_along_contiguous_axis(tmpdir, array):
+    path = str(tmpdir.join("data.npy"))
+    np.save(path, array)
+    planner = AccessPlanner(LazyArray(np.load(path, mmap_mode="r")))
+    assert planner.depths == [1, 1, array.shape[2]]
+    assert np.array_equal(planner.read_plane(2, 7), array[:, :, 7])
+    assert planner.cache_info()[2].misses == 1
+
+
+def test_planner_in_memory_not_cached(array):
+    planner = AccessPlanner(array)
+    assert planner.cache_info() == [None, None, None]
+    assert np.array_equal(planner.read_plane(1, 3), array[:, 3, :])
+
+
+def displays(ov, axis, expected):
+    return np.array_equal(ov.images[axis].get_array(), ov._renderers[axis](expected))
+
+
+def test_ortho_scroll_and_click(array):
+    plt.switch_backend("agg")
+    ov = OrthoViewer(array)
+    try:
+        assert ov.cursor == [n // 2 for n in array.shape]
+        assert displays(ov, 2, array[:, :, 10].T)
+
+        ov._onscroll(DummyEvent(ov.axes[1], "up"))
+        assert ov.cursor[1] == 11
+        assert displays(ov, 1, array[:, 11, :])
+
+        ov._onclick(DummyEvent(ov.axes[0], 1, xdata=3.2, ydata=4.7))
+        assert ov.cursor == [10, 5, 3]
+        assert displays(ov, 2, array[:, :, 3].T)
+    finally:
+        plt.close(ov.fig)
+
+
+def test_ortho_label_hover(array):
+    plt.switch_backend("agg")
+    labels = array.astype(np.uint64) * 2 ** 40
+    ov = OrthoViewer(labels, cmap=LabelRenderer())
+    try:
+        assert len({id(r) for r in ov._renderers}) == 3
+        x, y = ov.cursor[2], ov.cursor[1]
+        assert ov.axes[0].format_coord(x, y).endswith(
+            "label={}".format(labels[ov.cursor[0], y, x])
+        )
+        # the panel normal to dimension 2 is transposed: rows are y, columns are z
+        assert ov.axes[2].format_coord(ov.cursor[0], y).endswith(
+            "label={}".format(labels[ov.cursor[0], y, x])
+        )
+    finally:
+        plt.close(ov.fig)
@@ -0,0 +1,50 @@
+
+from smalldataviewer.lazy import LazyArray
+from smalldataviewer.profiling import Profiler, add_hook, remove_hook, timed
+from smalldataviewer.viewer import DataViewer
+
+
+def test_no_hooks_no_timing():
+    with timed("stage") as timing:
+        pass
+    assert timing._start is None
+
+
+def test_hook_receives_stage():
+    calls = []
+
+    def hook(*args):
+        calls.append(args)
+
+    add_hook(hook)
+    try:
+        with timed("stage", 10):
+            pass
+        with timed("failing"):
+            try:
+                raise ValueError()
+            except ValueError:
+                pass
+    finally:
+        remove_hook(hook)
+    with timed("after"):
+        pass
+
+    assert [(stage, nbytes) for stage, _, nbytes in calls] == [
+        ("stage", 10),
+        ("failing", 0),
+    ]
+
+
+def test_profiler_summary(array, subplots_patch):
+    with Profiler() as profiler:
+        dv = DataViewer(LazyArray(array), prefetch=0, blit=False, coalesce=False)
+        dv.idx = 1
+        dv._update()
+
+    summary = profiler.summary()
+    for stage in ("viewer.slice", "viewer.render", "viewer.draw", "viewer.update"):
+        assert summary[stage]["count"] == 2
+        assert summary[stage]["p50"] <= summary[stage]["p99"]
+    assert summary["lazy.read"]["bytes"] == 2 * array[0].nbytes
+    assert "viewer.render" in profiler.report()
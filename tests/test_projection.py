@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from smalldataviewer.files import FileReader
+from smalldataviewer.projection import (
+    block_shape,
+    iter_blocks,
+    project,
+    project_slab,
+)
+
+from .constants import OFFSET, SHAPE
+
+REDUCERS = {"max": np.max, "min": np.min, "mean": np.mean, "sum": np.sum}
+
+
+@pytest.mark.parametrize("method", sorted(REDUCERS))
+@pytest.mark.parametrize("axis", [0, 1, 2])
+@pytest.mark.parametrize("workers", [1, 3])
+def test_project_matches_numpy(array, method, axis, workers):
+    result = project(array, method, axis, workers=workers, block_bytes=100)
+    expected = REDUCERS[method](array, axis=axis)
+    assert result.shape == expected.shape
+    assert np.allclose(result, expected)
+
+
+def test_project_keeps_type_of_extrema(array):
+    assert project(array, "max").dtype == array.dtype
+    assert project(array.astype(np.float32), "min").dtype == np.float32
+
+
+def test_sum_does_not_overflow(array):
+    assert project(array, "sum").max() > 255
+
+
+def test_project_colour_channels():
+    data = np.random.RandomState(1).rand(4, 5, 6, 3)
+    assert np.allclose(project(data, "max", 1, block_bytes=50), data.max(axis=1))
+
+
+def test_bad_projection(array):
+    with pytest.raises(ValueError, match="projection"):
+        project(array, "median")
+    with pytest.raises(ValueError, match="dimension"):
+        project(array, axis=3)
+
+
+def test_block_shape():
+    assert block_shape((10, 20, 30), 1, None, 100) == (1, 3, 30)
+    assert block_shape((10, 20, 30), 1, (2, 4, 8), 2 * 8 * 30) == (2, 8, 30)
+    assert block_shape((10, 20, 30), 1, None, 10 ** 6) == (10, 20, 30)
+
+
+def test_blocks_aligned_to_offset():
+    blocks = list(iter_blocks((7,), (4,), (2,)))
+    assert blocks == [(slice(0, 2),), (slice(2, 6),), (slice(6, 7),)]
+
+
+def test_project_lazy_roi(tmpdir, padded_array, array):
+    path = str(tmpdir.join("data.npy"))
+    np.save(path, padded_array)
+    with FileReader(path, offset=OFFSET, shape=SHAPE).open() as volume:
+        assert np.array_equal(project(volume, "max", 0, block_bytes=100), array.max(0))
+
+
+def test_project_slab(array):
+    assert np.array_equal(project_slab(array[:3], "max"), array[:3].max(0))
+    mean = project_slab(array[:3], "mean", array.dtype)
+    assert mean.dtype == array.dtype
+    assert np.array_equal(mean, np.rint(array[:3].mean(0)).astype(array.dtype))
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from smalldataviewer.pyramid import (
+    Pyramid,
+    DownsampledVolume,
+    downsample_plane,
+    infer_factors,
+)
+
+
+def test_downsample_mean():
+    plane = np.arange(20, dtype=np.uint8).reshape(4, 5)
+    expected = np.array([[3, 5, 6], [13, 15, 16]], dtype=np.uint8)
+    out = downsample_plane(plane, 2, "mean")
+    assert out.dtype == plane.dtype
+    assert np.array_equal(out, expected)
+
+
+def test_downsample_mean_colour():
+    plane = np.ones((4, 4, 3), dtype=np.float32)
+    assert downsample_plane(plane, 2).shape == (2, 2, 3)
+
+
+def test_downsample_mode():
+    plane = np.array(
+        [[1, 1, 2, 3, 7], [1, 5, 3, 3, 7], [4, 4, 6, 6, 8], [9, 4, 6, 6, 8]],
+        dtype=np.uint64,
+    )
+    expected = np.array([[1, 3, 7], [4, 6, 8]], dtype=np.uint64)
+    assert np.array_equal(downsample_plane(plane, 2, "mode"), expected)
+
+
+def test_downsample_unknown_method():
+    with pytest.raises(ValueError, match="Unknown"):
+        downsample_plane(np.zeros((4, 4)), 2, "median")
+
+
+def test_downsampled_volume():
+    volume = np.random.random((3, 10, 9))
+    down = DownsampledVolume(volume, 4)
+    assert down.shape == (3, 3, 3)
+    assert np.allclose(down[1], downsample_plane(volume[1], 4))
+    assert down[:, 0, 0].shape == (3,)
+
+
+def test_infer_factors():
+    shapes = [(64, 100, 100), (32, 50, 50), (32, 25, 25)]
+    assert infer_factors(shapes) == [(1, 1, 1), (2, 2, 2), (2, 4, 4)]
+
+
+def test_on_the_fly_levels():
+    pyramid = Pyramid.on_the_fly(np.zeros((2, 3000, 1000)), min_size=512)
+    assert [f[1] for f in pyramid.factors] == [1, 2, 4, 8]
+    assert pyramid[-1].shape == (2, 375, 125)
+
+
+@pytest.mark.parametrize("factor,expected", [(1, 0), (3, 1), (4, 2), (100, 3)])
+def test_choose(factor, expected):
+    pyramid = Pyramid.on_the_fly(np.zeros((2, 3000, 1000)), min_size=512)
+    assert pyramid.choose(factor) == expected
@@ -0,0 +1,111 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+from matplotlib.colors import Normalize
+
+from smalldataviewer.render import (
+    BOUNDARY_RGBA,
+    LabelRenderer,
+    LUTRenderer,
+    is_lookup_colormap,
+    label_colours,
+    relabel,
+)
+
+
+def random_data(dtype):
+    np.random.seed(1)
+    if dtype == "float":
+        return np.random.uniform(-0.2, 1.2, (20, 30))
+    if dtype == "float-special":
+        return np.array([[0, 0.5, 1, 1.0001, -0.0001, np.nan, np.inf, -np.inf]])
+    info = np.iinfo(dtype)
+    low = max(info.min, -(2 ** 20))
+    high = min(info.max, 2 ** 20)
+    return np.random.randint(low, high, (20, 30)).astype(dtype)
+
+
+@pytest.mark.parametrize("cmap_name", ["gray", "viridis"])
+@pytest.mark.parametrize(
+    "dtype", ["uint8", "int8", "uint16", "int16", "int32", "uint64", "float", "float-special"]
+)
+def test_matches_colormap(cmap_name, dtype):
+    cmap = plt.get_cmap(cmap_name)
+    data = random_data(dtype)
+    assert np.array_equal(LUTRenderer(cmap)(data), cmap(data, bytes=True))
+
+
+@pytest.mark.parametrize("dtype", ["uint16", "int32", "float"])
+def test_clim_matches_normalize(dtype):
+    cmap = plt.get_cmap("viridis")
+    data = random_data(dtype)
+    vmin, vmax = np.percentile(data, [10, 90])
+
+    renderer = LUTRenderer(cmap)
+    renderer(data)
+    renderer.set_clim(vmin, vmax)
+
+    expected = cmap(Normalize(vmin, vmax)(data), bytes=True)
+    assert np.abs(renderer(data).astype(int) - expected).max() <= 1
+
+
+def test_reuses_output_buffer():
+    renderer = LUTRenderer(plt.get_cmap("gray"))
+    first = renderer(random_data("uint8"))
+    second = renderer(random_data("float"))
+    assert first is second
+
+
+def test_label_colormap_not_lookup():
+    # a test requirement only (see requirements.txt), as LabelRenderer replaced it
+    mpl_colors = pytest.importorskip("mpl_colors")
+    assert is_lookup_colormap(plt.get_cmap("gray"))
+    assert not is_lookup_colormap(mpl_colors.LabelColorMap(1))
+
+
+def label_data(dtype):
+    np.random.seed(1)
+    ids = np.random.randint(0, 2 ** 40, (5, 6)).astype(np.uint64).astype(dtype)
+    return np.kron(ids, np.ones((3, 4), dtype=dtype))
+
+
+@pytest.mark.parametrize("dtype", ["uint64", "int64", "uint32"])
+def test_relabel(dtype):
+    data = label_data(dtype)
+    ids, dense = relabel(data)
+    assert np.array_equal(ids, np.unique(data))
+    assert np.array_equal(ids[dense], data)
+
+
+@pytest.mark.parametrize("dtype", ["uint8", "int16", "uint64", "int64"])
+def test_label_renderer_colours(dtype):
+    data = label_data(dtype)
+    data[0, 0] = 0
+    rgba = LabelRenderer()(data)
+    assert np.array_equal(rgba, LabelRenderer().colours(data))
+    assert tuple(rgba[0, 0]) == (0, 0, 0, 255)
+
+
+def test_label_colours_deterministic():
+    ids = np.array([1, 2, 2 ** 60])
+    assert np.array_equal(label_colours(ids), label_colours(ids[::-1])[::-1])
+    assert not np.array_equal(label_colours(ids), label_colours(ids, seed=1))
+
+
+@pytest.mark.parametrize("dtype", ["int8", "uint64"])
+def test_label_at(dtype):
+    data = label_data(dtype)
+    renderer = LabelRenderer()
+    assert renderer.label_at(0, 0) is None
+    renderer(data)
+    assert renderer.label_at(7, 9) == data[7, 9]
+    assert renderer.label_at(100, 0) is None
+
+
+def test_label_boundaries():
+    data = np.array([[1, 1, 2], [1, 1, 2], [3, 3, 3]], dtype=np.uint64)
+    rgba = LabelRenderer(boundaries=True)(data)
+    edges = np.all(rgba == BOUNDARY_RGBA, axis=-1)
+    assert np.array_equal(
+        edges, [[False, False, True], [False, False, True], [True, True, True]]
+    )
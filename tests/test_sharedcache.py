@@ -0,0 +1,231 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import smalldataviewer
+from smalldataviewer import DataViewer
+from smalldataviewer.files import FileReader
+from smalldataviewer.sharedcache import (
+    SharedPlanes,
+    SharedSliceCache,
+    shared_cache_available,
+)
+
+from .constants import OFFSET, SHAPE, INTERNAL_PATH
+from .file_helpers import hdf5_file, json_file
+
+pytestmark = pytest.mark.skipif(
+    not shared_cache_available(), reason="shared memory not supported"
+)
+
+# run subprocesses from here, so that they import this smalldataviewer
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(smalldataviewer.__file__)))
+
+
+@pytest.fixture
+def cache(tmpdir):
+    cache = SharedSliceCache(10 * 1024 ** 2, str(tmpdir.join("shm")))
+    yield cache
+    cache.clear()
+    cache.close()
+
+
+def test_put_get(cache):
+    arr = np.arange(60, dtype=">u2").reshape(3, 4, 5)
+    key = cache.key("volume", 1)
+    assert cache.get(key) is None
+    assert cache.put(key, arr)
+    cached = cache.get(key)
+    assert np.array_equal(cached, arr)
+    assert not cached.flags.writeable
+    assert cache.nbytes() > arr.nbytes
+
+
+def test_shared_between_processes(cache):
+    key = cache.key("volume", 2)
+    code = (
+        "import numpy as np; from smalldataviewer.sharedcache import SharedSliceCache; "
+        "assert SharedSliceCache(10 * 1024 ** 2, {!r}).put({!r}, np.full((4, 4), 7, dtype=np.uint8))"
+    ).format(cache.directory, key)
+    subprocess.check_call([sys.executable, "-c", code], cwd=ROOT)
+    # outlives the process which created it
+    assert np.array_equal(cache.get(key), np.full((4, 4), 7, dtype=np.uint8))
+
+
+def test_abandoned_block_replaced(cache):
+    key = cache.key("volume", 3)
+    # dies after creating the block, before it is ready
+    code = (
+        "import os; from smalldataviewer.sharedcache import SharedSliceCache; "
+        "cache = SharedSliceCache(10 * 1024 ** 2, {!r}); lock = cache._lock(); lock.__enter__(); "
+        "cache._create({!r}, 1024); open(cache._marker({!r}), 'w').write('1024 %d' % os.getpid()); "
+        "os._exit(0)"
+    ).format(cache.directory, key, key)
+    subprocess.check_call([sys.executable, "-c", code], cwd=ROOT)
+    assert cache.get(key) is None
+    arr = np.full((4, 4), 8, dtype=np.uint8)
+    assert cache.put(key, arr)
+    assert np.array_equal(cache.get(key), arr)
+
+
+def test_mapped_blocks_bounded(tmpdir):
+    cache = SharedSliceCache(3 * 1024, str(tmpdir.join("shm")))
+    try:
+        held = None
+        for i in range(10):
+            key = cache.key(i)
+            cache.put(key, np.full(1000, i, dtype=np.uint8))
+            if i == 0:
+                held = cache.get(key)
+            assert cache.mapped_bytes() <= 3 * 1024 + 1256
+        # still viewed by an array, so mapped until that is released
+        assert held[0] == 0
+        del held
+        cache.put(cache.key(10), np.zeros(1000, dtype=np.uint8))
+        assert cache.mapped_bytes() <= 3 * 1024
+    finally:
+        cache.clear()
+        cache.close()
+
+
+THREADED_SCRIPT = """
+import threading
+import numpy as np
+from smalldataviewer.sharedcache import SharedSliceCache
+
+cache = SharedSliceCache(16 * 1024, {!r})
+errors = []
+
+def work(seed):
+    rng = np.random.RandomState(seed)
+    try:
+        for _ in range(300):
+            i = int(rng.randint(40))
+            key = cache.key(i)
+            arr = cache.get(key)
+            if arr is None:
+                cache.put(key, np.full(1000, i, dtype=np.uint8))
+            else:
+                assert arr[0] == i
+    except Exception as e:
+        errors.append(e)
+
+threads = [threading.Thread(target=work, args=(seed,)) for seed in range(4)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+cache.clear()
+cache.close()
+assert not errors, errors
+"""
+
+
+def test_threaded_get_put(tmpdir):
+    result = subprocess.run(
+        [sys.executable, "-c", THREADED_SCRIPT.format(str(tmpdir.join("shm")))],
+        cwd=ROOT,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stderr == ""
+
+
+def test_viewer_close_releases_views(tmpdir, cache, padded_array, subplots_patch):
+    path = str(tmpdir.join("data.hdf5"))
+    hdf5_file(path, padded_array)
+    dv = DataViewer.from_file(
+        path,
+        offset=OFFSET,
+        shape=SHAPE,
+        internal_path=INTERNAL_PATH,
+        lazy=True,
+        shared_cache=cache,
+    )
+    assert cache.mapped_bytes()
+    dv.close()
+    # not closed by the viewer, which does not own it, but no longer viewed by its slice cache
+    assert cache._blocks
+    cache.close()
+    assert cache.mapped_bytes() == 0
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_cli_exits_cleanly(tmpdir, padded_array, lazy):
+    path = str(tmpdir.join("data.hdf5"))
+    hdf5_file(path, padded_array)
+    args = [path, "-i", INTERNAL_PATH, "--shared-cache", "64"]
+    args += ["--overlay", path, INTERNAL_PATH] + (["--lazy"] if lazy else [])
+    env = dict(os.environ, MPLBACKEND="agg", TMPDIR=str(tmpdir))
+    try:
+        result = subprocess.run(
+            [sys.executable, "-m", "smalldataviewer"] + args,
+            cwd=ROOT,
+            env=env,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+    finally:
+        shm_dir = tmpdir.join("smalldataviewer-shm-{}".format(os.getuid()))
+        SharedSliceCache(directory=shm_dir).clear()
+    assert result.returncode == 0
+    assert result.stderr == ""
+
+
+def test_lru_eviction(tmpdir):
+    cache = SharedSliceCache(3 * 1024, str(tmpdir.join("shm")))
+    keys = [cache.key(i) for i in range(4)]
+    try:
+        for i, key in enumerate(keys[:2]):
+            cache.put(key, np.full(1000, i, dtype=np.uint8))
+            os.utime(cache._marker(key), (i, i))
+        cache.get(keys[0])
+        cache.put(keys[2], np.full(1000, 2, dtype=np.uint8))
+        assert [key for _, _, key in cache.entries()] == [keys[0], keys[2]]
+        assert SharedSliceCache(3 * 1024, cache.directory).get(keys[1]) is None
+    finally:
+        cache.clear()
+        cache.close()
+
+
+def test_read_through_cache(tmpdir, cache, padded_array, array):
+    path = str(tmpdir.join("data.json"))
+    json_file(path, padded_array)
+    reader = FileReader(
+        path, offset=OFFSET, shape=SHAPE, internal_path=INTERNAL_PATH, shared_cache=cache
+    )
+    assert np.array_equal(reader.read(), array)
+    assert len(cache.entries()) == 1
+    second = FileReader(
+        path, offset=OFFSET, shape=SHAPE, internal_path=INTERNAL_PATH, shared_cache=cache
+    ).read()
+    assert np.array_equal(second, array)
+    assert not second.flags.writeable
+
+
+def test_open_shares_planes(tmpdir, cache, padded_array, array):
+    path = str(tmpdir.join("data.hdf5"))
+    hdf5_file(path, padded_array)
+    reader = FileReader(
+        path, offset=OFFSET, shape=SHAPE, internal_path=INTERNAL_PATH, shared_cache=cache
+    )
+    with reader.open() as arr:
+        assert isinstance(arr.source, SharedPlanes)
+        assert np.array_equal(arr[3], array[3])
+        assert np.array_equal(arr[3], array[3])
+        assert np.array_equal(arr[2:5], array[2:5])
+    assert len(cache.entries()) == 1
+
+
+def test_mapped_formats_not_cached(tmpdir, cache, padded_array):
+    path = str(tmpdir.join("data.npy"))
+    np.save(path, padded_array)
+    reader = FileReader(path, shared_cache=cache)
+    reader.read()
+    with reader.open() as arr:
+        arr[0]
+    assert cache.entries() == []
@@ -0,0 +1,131 @@
+import logging
+import os
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from smalldataviewer import DataViewer
+from smalldataviewer.files import FileReader
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from smalldataviewer.stats import (
+    compute_statistics,
+    load_statistics,
+    save_statistics,
+    stats_path,
+)
+
+
+@pytest.mark.parametrize("dtype", ["uint8", "int8", "int16", "bool"])
+def test_exact_integer_stats(dtype):
+    np.random.seed(1)
+    data = np.random.randint(-100, 100, (7, 20, 30)).astype(dtype)
+    stats = compute_statistics(data, slab_bytes=1000)
+
+    assert stats.exact
+    assert stats.min == data.min()
+    assert stats.max == data.max()
+    assert stats.count == data.size
+    assert stats.hist_counts.sum() == data.size
+    assert stats.percentile(50) == np.percentile(data, 50, method="lower")
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float64", "int64"])
+def test_sampled_stats(dtype):
+    np.random.seed(1)
+    data = (np.random.normal(size=(20, 100, 100)) * 1000).astype(dtype)
+    data[0, 0, 0] = -100000
+    stats = compute_statistics(data, slab_bytes=50000, sample_size=50000)
+
+    assert not stats.exact
+    assert stats.min == -100000
+    assert stats.max == data.max()
+    assert abs(stats.percentile(50) - np.median(data)) < 50
+    assert abs(stats.percentile(99) - np.percentile(data, 99)) < 100
+
+
+def test_no_finite_values():
+    assert compute_statistics(np.full((2, 2, 2), np.nan)) is None
+
+
+def test_save_load_statistics(tmpdir, padded_array):
+    path = str(tmpdir.join("data.npy"))
+    np.save(path, padded_array)
+    reader = FileReader(path, offset=(1, 1, 1))
+    assert load_statistics(reader) is None
+
+    stats = compute_statistics(reader.open())
+    assert save_statistics(reader, stats)
+    assert stats_path(path).endswith(".npy.sdvstats.json")
+
+    loaded = load_statistics(reader)
+    assert (loaded.min, loaded.max, loaded.count) == (stats.min, stats.max, stats.count)
+    assert np.array_equal(loaded.quantiles, stats.quantiles)
+
+    assert load_statistics(FileReader(path)) is None
+
+    np.save(path, padded_array[1:])
+    assert load_statistics(reader) is None
+
+
+def test_dataviewer_saves_and_reuses_statistics(tmpdir, padded_array):
+    plt.switch_backend("agg")
+    path = str(tmpdir.join("data.npy"))
+    np.save(path, padded_array)
+
+    dv = DataViewer.from_file(path, contrast="minmax", save_stats=True)
+    for future, _ in list(dv._tasks):
+        future.result()
+    dv._update()
+    plt.close(dv.fig)
+    assert load_statistics(FileReader(path)) is not None
+
+    dv2 = DataViewer.from_file(path, contrast="minmax")
+    assert not dv2._tasks
+    assert dv2.statistics.max == padded_array.max()
+    plt.close(dv2.fig)
+
+
+def test_dataviewer_does_not_save_statistics_by_default(tmpdir, padded_array):
+    plt.switch_backend("agg")
+    path = str(tmpdir.join("data.npy"))
+    np.save(path, padded_array)
+
+    dv = DataViewer.from_file(path, contrast="minmax")
+    for future, _ in list(dv._tasks):
+        future.result()
+    dv._update()
+    plt.close(dv.fig)
+    assert dv.statistics is not None
+    assert not os.path.exists(stats_path(path))
+
+
+def test_save_statistics_read_only_directory(tmpdir, padded_array, caplog):
+    path = str(tmpdir.join("data.npy"))
+    np.save(path, padded_array)
+    reader = FileReader(path)
+    stats = compute_statistics(reader.open())
+
+    tmpdir.chmod(0o555)
+    try:
+        with caplog.at_level(logging.WARNING):
+            if os.access(str(tmpdir), os.W_OK):
+                # e.g. running as root, which ignores permissions
+                with mock.patch(
+                    "smalldataviewer.stats.open",
+                    side_effect=PermissionError(13, "Permission denied"),
+                    create=True,
+                ):
+                    saved = save_statistics(reader, stats)
+            else:
+                saved = save_statistics(reader, stats)
+    finally:
+        tmpdir.chmod(0o755)
+
+    assert not saved
+    assert not caplog.records
+    assert not os.path.exists(stats_path(path))
@@ -1,6 +1,16 @@
+import threading
+
+import matplotlib.pyplot as plt
 import numpy as np
 import pytest
 
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from smalldataviewer.lazy import LazyArray
+from smalldataviewer.render import LabelRenderer
 from smalldataviewer.viewer import DataViewer
 
 
@@ -22,6 +32,12 @@ class DummyEvent(object):
         self.button = button
 
 
+def flush_pending(dv):
+    """Fire the coalescing timer, which never runs with a mocked canvas"""
+    if dv._update_pending:
+        dv._flush_update()
+
+
 @pytest.mark.parametrize(
     "button,should_draw", [("up", True), ("down", True), ("other", False)]
 )
@@ -32,6 +48,7 @@ def test_onscroll_event_updates(button, should_draw, array, subplots_patch):
     dv.im.axes.figure.canvas.draw.reset_mock()
     starting_idx = dv.idx
     dv._onscroll(event)
+    flush_pending(dv)
     assert dv.im.axes.figure.canvas.draw.call_count == int(should_draw)
     if should_draw:
         assert starting_idx != dv.idx
@@ -50,4 +67,239 @@ def test_onscroll_event_has_limits(
     dv.idx = starting_idx
     dv.im.axes.figure.canvas.draw.reset_mock()
     dv._onscroll(event)
+    flush_pending(dv)
     assert dv.idx == finishing_idx
+
+
+class Volume(object):
+    """Array-like which is not a numpy array, and so gets cached by default"""
+
+    def __init__(self, array):
+        self.array = array
+        self.shape = array.shape
+        self.ndim = array.ndim
+        self.dtype = array.dtype
+
+    def __getitem__(self, item):
+        return self.array[item]
+
+
+def test_slices_cached_for_non_numpy(array, subplots_patch):
+    dv = DataViewer(Volume(array), prefetch=0)
+    dv._update()
+    info = dv.cache_info()
+    assert info.hits >= 1
+    assert info.currsize == 1
+    dv.close()
+
+
+def test_numpy_not_cached(array, subplots_patch):
+    dv = DataViewer(array)
+    assert dv.cache_info() is None
+
+
+def test_scroll_events_coalesced(array, subplots_patch):
+    dv = DataViewer(array)
+    canvas = dv.im.axes.figure.canvas
+    canvas.draw.reset_mock()
+    for _ in range(5):
+        dv._onscroll(DummyEvent("up"))
+
+    assert canvas.draw.call_count == 0
+    assert dv._timer.start.call_count == 1
+
+    dv._flush_update()
+    assert canvas.draw.call_count == 1
+    assert dv.idx == 5
+    dv.ax.set_title.assert_called_with(dv.title_formatstr.format(5))
+
+
+def test_blit_after_full_draw(array):
+    plt.switch_backend("agg")
+    dv = DataViewer(array)
+    try:
+        assert dv._timer is None  # agg has no event loop, so does not coalesce
+        with mock.patch.object(
+            dv.fig, "draw", wraps=dv.fig.draw
+        ) as fig_draw, mock.patch.object(dv.im, "draw", wraps=dv.im.draw) as im_draw:
+            dv.fig.canvas.draw()
+        assert fig_draw.call_count == 1  # the background is captured in the same draw
+        assert im_draw.call_count == 1
+        assert dv._background is not None
+
+        with mock.patch.object(dv.fig.canvas, "draw") as draw, mock.patch.object(
+            dv.fig.canvas, "blit"
+        ) as blit:
+            dv._onscroll(DummyEvent("up"))
+        assert draw.call_count == 0
+        assert blit.call_count == 1
+    finally:
+        plt.close(dv.fig)
+
+
+def test_blit_savefig_includes_image(tmpdir):
+    plt.switch_backend("agg")
+    dv = DataViewer(np.zeros((2, 10, 10), dtype=np.uint8), cmap="viridis", vmin=0, vmax=255)
+    try:
+        dv.fig.canvas.draw()
+        path = str(tmpdir.join("view.png"))
+        dv.fig.savefig(path, dpi=dv.fig.dpi * 2)
+        saved = plt.imread(path)
+        centre = saved[saved.shape[0] // 2, saved.shape[1] // 2]
+        assert np.allclose(centre[:3], plt.get_cmap("viridis")(0.0)[:3], atol=0.02)
+
+        with mock.patch.object(dv.fig.canvas, "draw") as draw:
+            dv._onscroll(DummyEvent("up"))
+        assert draw.call_count == 1  # the background was captured at a different size
+    finally:
+        plt.close(dv.fig)
+
+
+def test_level_of_detail_follows_zoom():
+    plt.switch_backend("agg")
+    volume = np.random.randint(0, 255, (2, 1000, 1000), dtype=np.uint8)
+    dv = DataViewer(volume, lod=True)
+    try:
+        assert dv.level == 1
+        assert dv._slice.shape == (500, 500)
+        assert dv.im.get_extent() == [-0.5, 999.5, 999.5, -0.5]
+
+        dv.ax.set_xlim(0, 100)
+        dv.ax.set_ylim(100, 0)
+        assert dv.level == 0
+        assert dv._slice.shape == (1000, 1000)
+    finally:
+        plt.close(dv.fig)
+
+
+def test_lod_auto_disabled_for_small(array, subplots_patch):
+    dv = DataViewer(array)
+    assert len(dv.pyramid) == 1
+
+
+@pytest.mark.parametrize(
+    "contrast,expected", [("minmax", (10, 200)), ("percentile", (10, 200))]
+)
+def test_contrast_from_background_statistics(contrast, expected):
+    plt.switch_backend("agg")
+    volume = np.full((3, 10, 10), 100, dtype=np.uint8)
+    volume[0, 0, 0] = 10
+    volume[2, 9, 9] = 200
+    dv = DataViewer(volume, contrast=contrast, contrast_percentiles=(0, 100))
+    try:
+        for future, _ in list(dv._tasks):
+            future.result()
+        dv._update()
+        assert dv.statistics.min == 10
+        assert (dv._render.vmin, dv._render.vmax) == expected
+    finally:
+        plt.close(dv.fig)
+
+
+def test_bad_contrast(array, subplots_patch):
+    with pytest.raises(ValueError, match="contrast"):
+        DataViewer(array, contrast="nonsense")
+
+
+class DummyKeyEvent(object):
+    def __init__(self, key):
+        self.key = key
+
+
+@pytest.mark.parametrize("volume_type", [np.asarray, Volume])
+def test_slab_projection(array, volume_type, subplots_patch):
+    dv = DataViewer(volume_type(array), slab=3, prefetch=0)
+    dv.idx = 5
+    assert np.array_equal(dv._slice, array[4:7].max(0))
+    dv.idx = 0
+    assert np.array_equal(dv._slice, array[0:3].max(0))
+    dv.close()
+
+
+def test_slab_keys(array, subplots_patch):
+    dv = DataViewer(array)
+    dv.idx = 5
+    dv._onkey(DummyKeyEvent("]"))
+    flush_pending(dv)
+    assert dv.slab == 3
+    dv._onkey(DummyKeyEvent("]"))
+    dv._onkey(DummyKeyEvent("m"))
+    flush_pending(dv)
+    assert dv.slab == 5
+    assert dv.projection == "min"
+    assert np.array_equal(dv._slice, array[3:8].min(0))
+    dv.ax.set_title.assert_called_with(dv.title_formatstr.format(5) + " (min of 3-7)")
+    for _ in range(3):
+        dv._onkey(DummyKeyEvent("["))
+    assert dv.slab == 1
+
+
+def test_bad_slab_projection(array, subplots_patch):
+    with pytest.raises(ValueError, match="projection"):
+        DataViewer(array, slab=3, projection="sum")
+
+
+def test_label_hover(subplots_patch):
+    labels = np.arange(3 * 4 * 5, dtype=np.uint64).reshape(3, 4, 5) * 2 ** 40
+    dv = DataViewer(labels, cmap=LabelRenderer())
+    dv.idx = 1
+    dv._update()
+    assert dv._format_label_coord(3.2, 1.9) == "x=3, y=2, label={}".format(labels[1, 2, 3])
+
+
+class BlockingVolume(Volume):
+    """Volume whose reads of slices other than 0 wait until released"""
+
+    def __init__(self, array):
+        super(BlockingVolume, self).__init__(array)
+        self.release = threading.Event()
+
+    def __getitem__(self, item):
+        if item[0] != 0:
+            self.release.wait(5)
+        return super(BlockingVolume, self).__getitem__(item)
+
+
+def test_async_load_does_not_block(array, subplots_patch):
+    volume = BlockingVolume(array)
+    dv = DataViewer(volume, prefetch=0, coalesce=False, async_load=True)
+    try:
+        dv.im.set_data.reset_mock()
+        dv._onscroll(DummyEvent("up"))
+        # no cheap preview of this volume: the previous slice stays on screen
+        assert dv.im.set_data.call_count == 0
+        assert dv.ax.set_title.call_args[0][0].endswith("(loading)")
+
+        (target, future) = dv._loading
+        volume.release.set()
+        future.result(5)
+        dv._poll_tasks()
+        assert np.array_equal(dv.im.set_data.call_args[0][0], dv._render(array[1]))
+        assert dv._loading is None
+    finally:
+        volume.release.set()
+        dv.close()
+
+
+def test_async_load_discards_passed_slices(array, subplots_patch):
+    volume = BlockingVolume(array)
+    dv = DataViewer(volume, prefetch=0, coalesce=False, async_load=True)
+    try:
+        dv._onscroll(DummyEvent("up"))
+        first = dv._loading
+        dv._onscroll(DummyEvent("up"))
+        assert dv._loading[0] != first[0]
+        volume.release.set()
+        first[1].result(5)
+        dv._onloaded(first[0], None)
+        assert dv._loading[0] == (0, 2)
+    finally:
+        volume.release.set()
+        dv.close()
+
+
+def test_preview_strided(array, subplots_patch, monkeypatch):
+    monkeypatch.setattr("smalldataviewer.viewer.PREVIEW_PIXELS", 20)
+    dv = DataViewer(LazyArray(array), async_load=True)
+    assert np.array_equal(dv._preview(3), array[3, ::5, ::5])
+    dv.close()